@@ -0,0 +1,61 @@
+# bench_title_index.py - Times fuzzy TitleIndex lookups as the index grows
+#
+# Usage (from the repository root):
+#   python bench/bench_title_index.py --sizes 5000 50000 200000
+#
+# The lookup cost should stay flat across sizes (see the TitleIndex docstring);
+# tests/test_title_index.py checks the bound on postings counted, not the time.
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))  # Repository root, for handlers
+
+from handlers.title_index import TitleIndex
+from title_pool import build_pool
+
+
+def with_typo(rng: random.Random, title: str) -> str:
+    position = rng.randrange(len(title))
+    return title[:position] + "x" + title[position + 1:]
+
+
+def time_lookups(size: int, queries: int, seed: int) -> dict:
+    pool = build_pool(size, seed=seed)
+    index = TitleIndex()
+    index.add_many((entry["title"], entry["score"], entry["type"]) for entry in pool)
+    rng = random.Random(seed)
+    sample = [with_typo(rng, entry["title"]) for entry in rng.sample(pool, min(queries, size))]
+    index.lookup(sample[0]) # Warm up the matching engine
+    timings = []
+    for query in sample:
+        start = time.perf_counter()
+        index.lookup(query)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {
+        "size": size,
+        "p50_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(timings[int(0.95 * (len(timings) - 1))] * 1000, 3),
+    }
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Times TitleIndex lookups at several index sizes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 50000], help="Index sizes to time.")
+    parser.add_argument("--queries", type=int, default=500, help="Near-miss lookups per size.")
+    parser.add_argument("--seed", type=int, default=3, help="Seed for the catalog and the typos.")
+    args = parser.parse_args()
+    print(f"{'titles':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for size in args.sizes:
+        row = time_lookups(size, args.queries, args.seed)
+        print(f"{row['size']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8}")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,165 @@
+# mock_jikan.py - Local stand-in for the Jikan v4 API with configurable latency, rate limits and 429s
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from title_pool import build_pool
+
+# Jikan spells types like this; the game shows them upper-cased
+API_TYPES = {"TV": "TV", "MOVIE": "Movie", "OVA": "OVA", "ONA": "ONA", "SPECIAL": "Special"}
+PAGE_SIZE = 25
+
+
+def _tokens(text: str) -> set[str]:
+    return set(re.findall(r"\w+", text.lower()))
+
+
+class MockJikan:
+    """Search/listing logic and counters of the mock API, independent of the HTTP layer."""
+
+    def __init__(self, pool: list[dict], latency_ms: float = 0, jitter_ms: float = 0,
+                 rate_limits: tuple[tuple[int, float], ...] = ((3, 1.0), (60, 60.0)),
+                 error_rate: float = 0.0, seed: int = 1):
+        self.pool = pool
+        self.by_id = {entry["mal_id"]: entry for entry in pool}
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limits = rate_limits
+        self.error_rate = error_rate
+        self.stats = Counter()
+        self._history = deque()
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+
+    def _entry_json(self, entry: dict) -> dict:
+        return {
+            "mal_id": entry["mal_id"],
+            "title": entry["api_title"],
+            "title_english": entry["title_english"],
+            "title_synonyms": [],
+            "type": API_TYPES.get(entry["type"], entry["type"]),
+            "score": entry["score"],
+        }
+
+    def admit(self) -> bool:
+        """Applies the rate limits and random 429s; False means answer 429."""
+        with self._lock:
+            now = time.monotonic()
+            longest = max(window for _, window in self.rate_limits)
+            while self._history and self._history[0] <= now - longest:
+                self._history.popleft()
+            for count, window in self.rate_limits:
+                if sum(1 for t in self._history if t > now - window) >= count:
+                    return False
+            if self._rng.random() < self.error_rate:
+                return False
+            self._history.append(now)
+            return True
+
+    def delay(self):
+        """Sleeps for the configured latency (plus jitter)."""
+        extra = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0
+        time.sleep(max(self.latency_ms + extra, 0) / 1000)
+
+    def search(self, query: str, limit: int) -> list[dict]:
+        """Token-overlap search over the catalog, best matches first."""
+        wanted = _tokens(query)
+        scored = []
+        for entry in self.pool:
+            overlap = len(wanted & _tokens(entry["api_title"] + " " + entry["title_english"]))
+            if overlap:
+                scored.append((overlap, -abs(len(entry["api_title"]) - len(query)), entry["mal_id"]))
+        scored.sort(reverse=True)
+        return [self._entry_json(self.by_id[mal_id]) for _, _, mal_id in scored[:limit]]
+
+    def page(self, page: int) -> dict:
+        """One page of the /top/anime listing (highest score first)."""
+        ranked = sorted(self.pool, key=lambda e: e["score"], reverse=True)
+        start = (page - 1) * PAGE_SIZE
+        return {
+            "data": [self._entry_json(e) for e in ranked[start:start + PAGE_SIZE]],
+            "pagination": {"current_page": page, "has_next_page": start + PAGE_SIZE < len(ranked)},
+        }
+
+
+def make_handler(api: MockJikan):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # Keep-alive, like the real API
+
+        def _send(self, status: int, body: dict, headers: dict | None = None):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = parse_qs(url.query)
+            path = url.path.removeprefix("/v4")
+            if path == "/stats":
+                self._send(200, dict(api.stats))
+                return
+
+            api.stats["requests"] += 1
+            if not api.admit():
+                api.stats["rate_limited"] += 1
+                self._send(429, {"status": 429, "message": "Too Many Requests"}, {"Retry-After": "1"})
+                return
+            api.delay()
+
+            if path == "/anime":
+                api.stats["search"] += 1
+                limit = int(query.get("limit", ["10"])[0])
+                self._send(200, {"data": api.search(query.get("q", [""])[0], limit)})
+            elif path.startswith("/anime/") and path.split("/")[2].isdigit():
+                api.stats["by_id"] += 1
+                entry = api.by_id.get(int(path.split("/")[2]))
+                if entry is None:
+                    self._send(404, {"status": 404, "message": "Not Found"})
+                else:
+                    self._send(200, {"data": api._entry_json(entry)})
+            elif path in ("/top/anime", "/seasons/now"):
+                api.stats["listing"] += 1
+                self._send(200, api.page(int(query.get("page", ["1"])[0])))
+            else:
+                self._send(404, {"status": 404, "message": "Not Found"})
+
+        def log_message(self, format, *args):
+            pass  # Keep benchmark output readable
+
+    return Handler
+
+
+def start_server(api: MockJikan, port: int = 0) -> ThreadingHTTPServer:
+    """Starts the mock API on a background thread. Its base URL is http://127.0.0.1:<port>/v4."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(api))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the mock Jikan API.")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--pool-size", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered 429.")
+    args = parser.parse_args()
+    api = MockJikan(build_pool(args.pool_size), latency_ms=args.latency_ms, error_rate=args.error_rate)
+    server = start_server(api, args.port)
+    print(f"Mock Jikan listening on http://127.0.0.1:{server.server_port}/v4")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
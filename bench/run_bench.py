@@ -0,0 +1,150 @@
+# run_bench.py - Offline benchmark: drives main.run_bot against the stand-in game page and mock Jikan
+#
+# Usage (from the repository root):
+#   python bench/run_bench.py --games 2 --browser /usr/bin/chromium --chromedriver /usr/bin/chromedriver
+#
+# Everything is served from 127.0.0.1, so the run needs no network access. Each benchmark
+# plays a "cold" phase (empty score DB) and then a "warm" phase (same DB, same title order).
+
+import argparse
+import functools
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))  # Repository root, for main and handlers
+
+import handlers.browser_handler as browser_handler
+import handlers.database_handler as database_handler
+import handlers.history_store as history_store
+import handlers.jikan_api as jikan_api
+import main
+from handlers.title_index import TitleIndex
+from handlers.wait_tuner import WaitTuner
+from mock_jikan import MockJikan, start_server
+from title_pool import build_pool, write_pool_json
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_directory(directory: str) -> ThreadingHTTPServer:
+    """Serves the stand-in game page and its pool.json on a background thread."""
+    handler = functools.partial(QuietHandler, directory=directory)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+
+def run_phase(name: str, games: int, api: MockJikan) -> dict:
+    """Plays `games` games in one browser and summarises throughput, latency and API use."""
+    print(f"\n===== Benchmark phase: {name} =====")
+    api_before = dict(api.stats)
+    results = []
+    started = time.monotonic()
+    main.run_bot(continuous=True, max_games=games, report_result=results.append)
+    wall = time.monotonic() - started
+
+    rounds = sum(result["rounds"] for result in results)
+    play_time = sum(result["duration_s"] for result in results)
+    round_times = [t for result in results for t in result["round_times"]]
+    api_delta = {key: api.stats[key] - api_before.get(key, 0) for key in api.stats}
+    return {
+        "phase": name,
+        "games": len(results),
+        "rounds": rounds,
+        "wall_s": round(wall, 2),
+        "rounds_per_min": round(rounds / play_time * 60, 1) if play_time else 0.0,
+        "round_p50_ms": round(percentile(round_times, 0.50) * 1000, 1),
+        "round_p95_ms": round(percentile(round_times, 0.95) * 1000, 1),
+        "first_decision_s": round(results[0].get("time_to_first_decision_s", 0.0), 2) if results else 0.0,
+        "api_requests": api_delta.get("requests", 0),
+        "api_searches": api_delta.get("search", 0),
+        "api_rate_limited": api_delta.get("rate_limited", 0),
+    }
+
+
+def print_report(rows: list[dict]):
+    columns = ["phase", "games", "rounds", "wall_s", "rounds_per_min", "round_p50_ms",
+               "round_p95_ms", "first_decision_s", "api_requests", "api_searches", "api_rate_limited"]
+    print("\n===== Benchmark results =====")
+    print("  ".join(f"{column:>16}" for column in columns))
+    for row in rows:
+        print("  ".join(f"{str(row[column]):>16}" for column in columns))
+
+
+def main_bench():
+    parser = argparse.ArgumentParser(description="Offline benchmark of the bot.")
+    parser.add_argument("--games", type=int, default=2, help="Games per phase.")
+    parser.add_argument("--pool-size", type=int, default=60, help="Titles in the stand-in catalog.")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the catalog and title order.")
+    parser.add_argument("--transition-ms", type=int, default=400, help="Round animation time of the page.")
+    parser.add_argument("--latency-ms", type=float, default=150, help="Mock Jikan response latency.")
+    parser.add_argument("--jitter-ms", type=float, default=50, help="Random +/- latency jitter.")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Fraction of API requests answered 429.")
+    parser.add_argument("--browser", default=browser_handler.BRAVE_PATH, help="Chromium-based browser binary.")
+    parser.add_argument("--chromedriver", default=browser_handler.CHROMEDRIVER_PATH, help="chromedriver binary.")
+    parser.add_argument("--visible", action="store_true", help="Use the default (windowed) browser profile.")
+    parser.add_argument("--backend", default=browser_handler.SELENIUM_BACKEND,
+                        choices=[browser_handler.SELENIUM_BACKEND, browser_handler.CDP_BACKEND],
+                        help="Browser backend (cdp does not need --chromedriver).")
+    parser.add_argument("--harvest", action="store_true", help="Warm the cache from the page's title pool.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="hol-bench-")
+    try:
+        pool = build_pool(args.pool_size, args.seed)
+        shutil.copy(os.path.join(BENCH_DIR, "game_page.html"), workdir)
+        write_pool_json(os.path.join(workdir, "pool.json"), pool)
+        page_server = serve_directory(workdir)
+        api = MockJikan(pool, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                        error_rate=args.error_rate, seed=args.seed)
+        api_server = start_server(api)
+
+        # Point the bot at the local servers and a throwaway database
+        main.GAME_URL = (
+            f"http://127.0.0.1:{page_server.server_port}/game_page.html"
+            f"?seed={args.seed}&transition={args.transition_ms}"
+        )
+        jikan_api.JIKAN_API_BASE_URL = f"http://127.0.0.1:{api_server.server_port}/v4"
+        database_handler.DATABASE_DIR = os.path.join(workdir, "data")
+        database_handler.DATABASE_PATH = os.path.join(database_handler.DATABASE_DIR, "anime_scores.db")
+        database_handler.SNAPSHOT_PATH = os.path.join(database_handler.DATABASE_DIR, "anime_scores.snap")
+        history_store.HISTORY_PATH = os.path.join(database_handler.DATABASE_DIR, "history.db")
+        main.RESULTS_FILE = os.path.join(workdir, "results.txt")
+        main.title_index = TitleIndex()
+        main.wait_tuner = WaitTuner(os.path.join(database_handler.DATABASE_DIR, "wait_timings.json"))
+        browser_handler.BRAVE_PATH = args.browser
+        browser_handler.CHROMEDRIVER_PATH = args.chromedriver
+        main.HARVEST_TITLE_POOL = args.harvest
+        main.DRIVER_BACKEND = args.backend
+        if not args.visible:
+            main.BROWSER_PROFILE = browser_handler.PERFORMANCE_PROFILE
+
+        rows = [run_phase("cold", args.games, api), run_phase("warm", args.games, api)]
+        print_report(rows)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(rows, f, indent=2)
+            print(f"Results written to {args.json}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,66 @@
+# title_pool.py - Deterministic synthetic anime catalog shared by the stand-in game page and mock Jikan
+
+import json
+import random
+
+SYLLABLES = [
+    "ka", "ki", "ku", "ko", "sa", "shi", "su", "to", "na", "no", "ha", "hi", "mi",
+    "mo", "ra", "ri", "ru", "yo", "yu", "ta", "te", "ne", "ma", "ga", "ze", "ji",
+]
+ENGLISH_WORDS = [
+    "Blade", "Sky", "Academy", "Hero", "Moon", "Dragon", "Spirit", "Garden", "Storm",
+    "Knight", "Code", "Melody", "Night", "Quest", "Shadow", "Summer", "Titan", "Witch",
+]
+TYPES = ["TV", "TV", "TV", "MOVIE", "OVA", "ONA", "SPECIAL"]
+
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+
+
+def _game_variant(rng: random.Random, api_title: str) -> str:
+    """How the game might show a title: usually identical, sometimes with small differences."""
+    roll = rng.random()
+    if roll < 0.15:
+        return api_title.replace(":", "")  # Punctuation dropped
+    if roll < 0.25:
+        return api_title.replace("Season 2", "2nd Season")  # Season wording
+    return api_title
+
+
+def build_pool(size: int = 300, seed: int = 1) -> list[dict]:
+    """Builds `size` catalog entries.
+
+    Each entry has the MAL-side "api_title", the "title" the game displays, "title_english",
+    "type", "score" and "mal_id". Titles are unique; sequels share a stem so fuzzy
+    matching has realistic near-duplicates to tell apart.
+    """
+    rng = random.Random(seed)
+    pool, seen = [], set()
+    while len(pool) < size:
+        stem = " ".join(_word(rng) for _ in range(rng.randint(1, 3)))
+        variants = [stem]
+        if rng.random() < 0.3:
+            variants.append(f"{stem} Season 2")
+        if rng.random() < 0.2:
+            variants.append(f"{stem}: {rng.choice(ENGLISH_WORDS)} {rng.choice(ENGLISH_WORDS)}")
+        for api_title in variants:
+            if api_title in seen or len(pool) >= size:
+                continue
+            seen.add(api_title)
+            pool.append({
+                "mal_id": len(pool) + 1,
+                "api_title": api_title,
+                "title": _game_variant(rng, api_title),
+                "title_english": f"{rng.choice(ENGLISH_WORDS)} {rng.choice(ENGLISH_WORDS)} {len(pool) + 1}",
+                "type": rng.choice(TYPES),
+                "score": round(rng.uniform(5.0, 9.2), 2),
+            })
+    return pool
+
+
+def write_pool_json(path: str, pool: list[dict]):
+    """Writes the pool the way the stand-in game page loads it: {"pool": [{title, type, score}, ...]}."""
+    game_view = [{"title": e["title"], "type": e["type"], "score": e["score"]} for e in pool]
+    with open(path, "w") as f:
+        json.dump({"pool": game_view}, f)
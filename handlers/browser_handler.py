@@ -1,38 +1,131 @@
-# browser_handler.py - Manages Selenium browser interactions
+# browser_handler.py - Starts and manages the browser (Selenium or DevTools backend)
 
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from selenium.webdriver.chrome.options import Options
+import base64
+import json
+import os
+from handlers import cdp_driver
+from handlers.lazy_import import lazy_import
+from handlers.page_driver import PageDriver, SeleniumPageDriver
+
+# selenium.webdriver takes a noticeable share of startup to import; it loads on first use
+webdriver = lazy_import("selenium.webdriver")
 
 # TODO: Specify path to Brave browser executable and ChromeDriver
 BRAVE_PATH = "/usr/bin/brave"
 CHROMEDRIVER_PATH = "/usr/bin/chromedriver"  # Linux chromedriver path
 
+# Browser profiles: "default" is a full, maximized window that loads everything;
+# "performance" is headless, uses a small fixed window, does not wait for the full
+# `load` event and blocks images, media, fonts and ad/tracker requests.
+DEFAULT_PROFILE = "default"
+PERFORMANCE_PROFILE = "performance"
+PERFORMANCE_WINDOW_SIZE = "1024,768"
+# Browser backends: Selenium WebDriver (through chromedriver), or the DevTools protocol
+# spoken directly over one websocket, which skips the chromedriver hop on every command
+# and wakes transition waits on DOM mutations instead of polling
+SELENIUM_BACKEND = "selenium"
+CDP_BACKEND = "cdp"
+# URL patterns blocked through DevTools (Network.setBlockedURLs) in the performance profile
+BLOCKED_URL_PATTERNS = [
+    # Images and media
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico",
+    "*.mp4", "*.webm", "*.mp3", "*.m3u8",
+    # Fonts
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    # Third-party ads, analytics and trackers
+    "*doubleclick.net*", "*googlesyndication.com*", "*googletagmanager.com*",
+    "*google-analytics.com*", "*googleadservices.com*", "*adservice.google.*",
+    "*amazon-adsystem.com*", "*adnxs.com*", "*criteo.*", "*taboola.com*",
+    "*outbrain.com*", "*facebook.net*", "*hotjar.com*", "*quantserve.com*",
+    "*scorecardresearch.com*", "*pubmatic.com*", "*rubiconproject.com*",
+]
+
+# Title pool harvesting: with network capture on, the JSON responses the game page loads
+# are read back from the DevTools performance log and searched for its anime pool.
+TITLE_KEYS = ("title", "name") # Keys that hold a title in a pool entry
+TYPE_KEYS = ("type", "format", "media_type") # Keys that hold the type (TV, MOVIE, ...)
+MIN_POOL_SIZE = 10 # A JSON list needs this many title entries to count as a pool
+
 # TODO: Implement functions for initialization, navigation, element interaction, and closing
 
-def initialize_driver():
-    """Initializes and returns a Selenium WebDriver instance for Brave."""
-    options = Options()
+def _browser_arguments(profile: str) -> list[str]:
+    """Command-line switches for the browser, shared by both backends."""
+    arguments = [
+        # Disable proxy and add connection options
+        '--no-proxy-server',
+        '--disable-gpu',
+        '--disable-dev-shm-usage',
+        '--disable-software-rasterizer',
+        '--ignore-certificate-errors',
+        '--ignore-ssl-errors',
+        '--disable-web-security',
+        '--allow-running-insecure-content',
+    ]
+    if profile == PERFORMANCE_PROFILE:
+        arguments += [
+            "--headless=new",
+            f"--window-size={PERFORMANCE_WINDOW_SIZE}",
+            "--blink-settings=imagesEnabled=false",
+            "--mute-audio",
+            "--disable-extensions",
+            "--disable-background-networking",
+        ]
+    else:
+        arguments.append("--start-maximized")
+    return arguments
+
+def _start_selenium(profile: str, capture_network: bool) -> SeleniumPageDriver:
+    """Starts Brave through chromedriver."""
+    options = webdriver.ChromeOptions()
     options.binary_location = BRAVE_PATH
-    
-    # Disable proxy and add connection options
-    options.add_argument('--no-proxy-server')
-    options.add_argument('--disable-gpu')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_argument('--disable-software-rasterizer')
-    options.add_argument('--ignore-certificate-errors')
-    options.add_argument('--ignore-ssl-errors')
-    options.add_argument('--disable-web-security')
-    options.add_argument('--allow-running-insecure-content')
-    options.add_argument("--start-maximized")
+    for argument in _browser_arguments(profile):
+        options.add_argument(argument)
+    if profile == PERFORMANCE_PROFILE:
+        # Return from navigation once the DOM is ready instead of waiting for every subresource
+        options.page_load_strategy = "eager"
     options.add_experimental_option('excludeSwitches', ['enable-logging']) # Suppress unnecessary logs
+    if capture_network:
+        options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
 
-    service = ChromeService(executable_path=CHROMEDRIVER_PATH)
+    service = webdriver.ChromeService(executable_path=CHROMEDRIVER_PATH)
+    return SeleniumPageDriver(webdriver.Chrome(service=service, options=options))
 
+def _block_requests(driver):
+    """Blocks BLOCKED_URL_PATTERNS for this browser session through DevTools."""
     try:
-        driver = webdriver.Chrome(service=service, options=options)
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+        print(f"Blocking {len(BLOCKED_URL_PATTERNS)} URL patterns (images, media, fonts, ads).")
+    except Exception as e:
+        print(f"Warning: Could not enable request blocking: {e}")
+
+def initialize_driver(profile: str = DEFAULT_PROFILE, capture_network: bool = False,
+                      backend: str = SELENIUM_BACKEND) -> PageDriver | None:
+    """Starts Brave and returns a PageDriver for it.
+
+    Args:
+        profile: DEFAULT_PROFILE for a full windowed browser, or PERFORMANCE_PROFILE for a
+            headless, resource-blocking one with a smaller footprint.
+        capture_network: Record network events in the DevTools performance log, so
+            harvest_title_pool() can read the page's responses.
+        backend: SELENIUM_BACKEND (WebDriver through chromedriver) or CDP_BACKEND
+            (DevTools protocol over one websocket, no chromedriver).
+
+    Returns:
+        The driver, or None if the browser could not be started.
+    """
+    try:
+        if backend == CDP_BACKEND:
+            driver = cdp_driver.launch(
+                BRAVE_PATH, _browser_arguments(profile), capture_network,
+                eager=profile == PERFORMANCE_PROFILE,
+            )
+        else:
+            driver = _start_selenium(profile, capture_network)
         driver.set_page_load_timeout(30)  # Set page load timeout to 30 seconds
-        print("Browser initialized successfully.")
+        if profile == PERFORMANCE_PROFILE:
+            _block_requests(driver)
+        print(f"Browser initialized successfully ({profile} profile, {backend} backend).")
         return driver
     except Exception as e:
         print(f"Error initializing browser: {e}")
@@ -64,4 +157,114 @@ def close_driver(driver):
             driver.quit()
             print("Browser closed.")
         except Exception as e:
-            print(f"Error closing browser: {e}") 
\ No newline at end of file
+            print(f"Error closing browser: {e}")
+
+def _child_pids(parent_pid: int) -> list[int]:
+    """Returns all descendant process IDs of a process (Linux /proc only)."""
+    children: dict[int, list[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # Field 4 is the parent PID; split after the ")" that closes the command name
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+    descendants, stack = [], [parent_pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            descendants.append(child)
+            stack.append(child)
+    return descendants
+
+def get_browser_memory_mb(driver) -> float | None:
+    """Returns the resident memory (MB) of the browser processes started for this driver.
+
+    Sums the RSS of every process below the driver's owner process (chromedriver, or this
+    process for the CDP backend). Returns None where that is not
+    available (e.g. not on Linux).
+    """
+    try:
+        driver_pid = driver.owner_pid()
+        page_size = os.sysconf("SC_PAGE_SIZE")
+        total_pages = 0
+        for pid in _child_pids(driver_pid):
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    total_pages += int(f.read().split()[1]) # Resident pages
+            except (OSError, IndexError, ValueError):
+                continue # Process exited while we were reading
+        return total_pages * page_size / (1024 * 1024)
+    except Exception as e:
+        print(f"Could not measure browser memory: {e}")
+        return None
+
+def is_driver_alive(driver) -> bool:
+    """Checks that the browser still answers WebDriver commands."""
+    try:
+        driver.execute_script("return 1")
+        return True
+    except Exception:
+        return False
+
+def _pool_entries(data) -> list[tuple[str, str | None]]:
+    """Finds (title, type) pairs in decoded JSON: every list of at least MIN_POOL_SIZE title entries."""
+    found = []
+    if isinstance(data, dict):
+        for value in data.values():
+            found.extend(_pool_entries(value))
+    elif isinstance(data, list):
+        entries = []
+        for item in data:
+            if not isinstance(item, dict):
+                continue
+            title = next((item[key] for key in TITLE_KEYS if isinstance(item.get(key), str)), None)
+            if title:
+                anime_type = next((item[key] for key in TYPE_KEYS if isinstance(item.get(key), str)), None)
+                entries.append((title.strip(), anime_type.upper() if anime_type else None))
+            else:
+                found.extend(_pool_entries(item))
+        if len(entries) >= MIN_POOL_SIZE:
+            found.extend(entries)
+    return found
+
+def harvest_title_pool(driver) -> list[tuple[str, str | None]]:
+    """Extracts the game's title pool from the JSON responses the page has loaded so far.
+
+    Needs a driver started with capture_network=True. Reading the performance log
+    drains it, so each response is only looked at once.
+
+    Returns:
+        Unique (title, type) pairs, in the order they were found (empty if nothing was captured).
+    """
+    try:
+        log = driver.get_log("performance")
+    except Exception as e:
+        print(f"Could not read the performance log: {e}")
+        return []
+
+    pool, seen = [], set()
+    for record in log:
+        try:
+            message = json.loads(record["message"])["message"]
+        except (KeyError, TypeError, ValueError):
+            continue
+        if message.get("method") != "Network.responseReceived":
+            continue
+        params = message.get("params", {})
+        response = params.get("response", {})
+        if "json" not in response.get("mimeType", ""):
+            continue
+        try:
+            body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": params["requestId"]})
+            text = base64.b64decode(body["body"]) if body.get("base64Encoded") else body["body"]
+            data = json.loads(text)
+        except Exception:
+            continue # Body no longer available, or not valid JSON
+        for entry in _pool_entries(data):
+            if entry not in seen:
+                seen.add(entry)
+                pool.append(entry)
+    return pool
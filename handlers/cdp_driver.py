@@ -0,0 +1,278 @@
+# cdp_driver.py - PageDriver that talks to Brave/Chromium directly over one DevTools websocket
+
+import itertools
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.request
+
+from handlers.lazy_import import lazy_import
+from handlers.page_driver import PageDriver
+
+websocket = lazy_import("websocket") # websocket-client
+
+LAUNCH_TIMEOUT = 20 # Seconds to wait for the browser to open its DevTools port
+COMMAND_TIMEOUT = 30 # Seconds to wait for the answer to a single DevTools command
+CLICK_POLL_INTERVAL = 0.05 # Seconds between checks while waiting for an element to click
+MUTATION_BINDING = "__holDomChanged" # Page-to-bot binding called by the mutation observer
+
+# Installed in every document: reports DOM changes through the binding, at most once per task
+MUTATION_OBSERVER_SCRIPT = f"""
+(() => {{
+    if (window.__holObserver || typeof {MUTATION_BINDING} !== "function") return;
+    let pending = false;
+    window.__holObserver = new MutationObserver(() => {{
+        if (pending) return;
+        pending = true;
+        setTimeout(() => {{ pending = false; {MUTATION_BINDING}(""); }}, 0);
+    }});
+    window.__holObserver.observe(document, {{
+        childList: true, subtree: true, characterData: true, attributes: true
+    }});
+}})();
+"""
+
+# Scrolls the element at arguments[0] into view and returns the centre of its box (null if absent)
+ELEMENT_CENTER_SCRIPT = """
+const node = document.evaluate(arguments[0], document, null,
+    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (!node) return null;
+node.scrollIntoView({block: "center", inline: "center"});
+const box = node.getBoundingClientRect();
+if (box.width === 0 && box.height === 0) return null;
+return [box.left + box.width / 2, box.top + box.height / 2];
+"""
+
+class CdpError(Exception):
+    """Raised when the browser cannot be launched or a DevTools command fails."""
+
+class CdpPageDriver(PageDriver):
+    """Drives one page target over a persistent DevTools websocket.
+
+    Every command is a single websocket message to the browser (no chromedriver hop).
+    A reader thread matches answers to commands and turns events into state: page
+    loads, captured network responses and the mutation-observer binding, which
+    lets wait_for_dom_change() return the moment the page changes instead of polling.
+    """
+
+    def __init__(self, process: subprocess.Popen, user_data_dir: str, websocket_url: str,
+                 capture_network: bool = False, load_event: str = "Page.loadEventFired"):
+        """Use launch() rather than calling this directly.
+
+        Args:
+            process: The browser process (terminated by quit()).
+            user_data_dir: Temporary profile directory (deleted by quit()).
+            websocket_url: DevTools websocket URL of the page target.
+            capture_network: Buffer Network.responseReceived events for get_log("performance").
+            load_event: The event get() waits for ("Page.loadEventFired" or
+                "Page.domContentEventFired" for an eager page load strategy).
+        """
+        self._process = process
+        self._user_data_dir = user_data_dir
+        self._load_event = load_event
+        self._page_load_timeout = COMMAND_TIMEOUT
+        self._ids = itertools.count(1)
+        self._pending: dict[int, list] = {} # command id -> [threading.Event, response]
+        self._pending_lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._dom_changed = threading.Event()
+        self._loaded = threading.Event()
+        self._capture_network = capture_network
+        self._network_log: list[dict] = []
+        self._closed = False
+
+        self._socket = websocket.create_connection(websocket_url, suppress_origin=True)
+        self._reader = threading.Thread(target=self._read_loop, name="cdp-reader", daemon=True)
+        self._reader.start()
+
+        self.execute_cdp_cmd("Page.enable", {})
+        self.execute_cdp_cmd("Runtime.enable", {})
+        self.execute_cdp_cmd("Runtime.addBinding", {"name": MUTATION_BINDING})
+        self.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": MUTATION_OBSERVER_SCRIPT})
+        if capture_network:
+            self.execute_cdp_cmd("Network.enable", {})
+
+    def _read_loop(self):
+        while not self._closed:
+            try:
+                message = json.loads(self._socket.recv())
+            except Exception:
+                break # Socket closed (quit() or the browser went away)
+            if "id" in message:
+                with self._pending_lock:
+                    waiter = self._pending.pop(message["id"], None)
+                if waiter is not None:
+                    waiter[1] = message
+                    waiter[0].set()
+                continue
+            method = message.get("method")
+            if method == "Runtime.bindingCalled":
+                if message.get("params", {}).get("name") == MUTATION_BINDING:
+                    self._dom_changed.set()
+            elif method == self._load_event:
+                self._loaded.set()
+            elif method == "Network.responseReceived" and self._capture_network:
+                # Same shape as a chromedriver performance log entry
+                self._network_log.append({"message": json.dumps({"message": message})})
+        # Wake every waiter so nothing blocks on a dead connection
+        with self._pending_lock:
+            for waiter in self._pending.values():
+                waiter[0].set()
+            self._pending.clear()
+
+    def execute_cdp_cmd(self, cmd: str, params: dict, timeout: float = COMMAND_TIMEOUT) -> dict:
+        command_id = next(self._ids)
+        waiter = [threading.Event(), None]
+        with self._pending_lock:
+            self._pending[command_id] = waiter
+        try:
+            with self._send_lock:
+                self._socket.send(json.dumps({"id": command_id, "method": cmd, "params": params}))
+        except Exception as e:
+            with self._pending_lock:
+                self._pending.pop(command_id, None)
+            raise CdpError(f"{cmd} could not be sent: {e}") from e
+        if not waiter[0].wait(timeout):
+            with self._pending_lock:
+                self._pending.pop(command_id, None)
+            raise CdpError(f"{cmd} timed out after {timeout}s")
+        response = waiter[1]
+        if response is None:
+            raise CdpError(f"{cmd} failed: connection closed")
+        if "error" in response:
+            raise CdpError(f"{cmd} failed: {response['error'].get('message')}")
+        return response.get("result", {})
+
+    def _navigate(self, command: str, params: dict):
+        self._loaded.clear()
+        self._dom_changed.clear()
+        self.execute_cdp_cmd(command, params)
+        if not self._loaded.wait(self._page_load_timeout):
+            raise CdpError(f"Page did not load within {self._page_load_timeout}s")
+
+    def get(self, url: str):
+        self._navigate("Page.navigate", {"url": url})
+
+    def refresh(self):
+        self._navigate("Page.reload", {})
+
+    def set_page_load_timeout(self, seconds: float):
+        self._page_load_timeout = seconds
+
+    def execute_script(self, script: str, *args):
+        expression = f"(function() {{ {script} \n}}).apply(null, {json.dumps(list(args))})"
+        result = self.execute_cdp_cmd(
+            "Runtime.evaluate", {"expression": expression, "returnByValue": True, "awaitPromise": False}
+        )
+        if "exceptionDetails" in result:
+            details = result["exceptionDetails"]
+            description = details.get("exception", {}).get("description") or details.get("text")
+            raise CdpError(f"Script failed: {description}")
+        return result.get("result", {}).get("value")
+
+    def get_log(self, log_type: str) -> list[dict]:
+        if log_type != "performance":
+            return []
+        entries, self._network_log = self._network_log, []
+        return entries
+
+    def click_xpath(self, xpath: str, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while True:
+            center = self.execute_script(ELEMENT_CENTER_SCRIPT, xpath)
+            if center is not None:
+                break
+            if time.monotonic() >= deadline:
+                return False
+            self.wait_for_dom_change(CLICK_POLL_INTERVAL)
+        x, y = center
+        # A real (trusted) mouse click, as WebDriver would send
+        for event_type in ("mousePressed", "mouseReleased"):
+            self.execute_cdp_cmd("Input.dispatchMouseEvent", {
+                "type": event_type, "x": x, "y": y, "button": "left", "clickCount": 1,
+            })
+        return True
+
+    def wait_for_dom_change(self, timeout: float) -> bool:
+        changed = self._dom_changed.wait(timeout)
+        self._dom_changed.clear()
+        return changed
+
+    def owner_pid(self) -> int:
+        # The browser is started directly by this process, not by a chromedriver
+        return os.getpid()
+
+    def quit(self):
+        if self._closed:
+            return
+        try:
+            self.execute_cdp_cmd("Browser.close", {}, timeout=5)
+        except CdpError:
+            pass # Terminated below anyway
+        self._closed = True
+        try:
+            self._socket.close()
+        except Exception:
+            pass
+        try:
+            self._process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+        shutil.rmtree(self._user_data_dir, ignore_errors=True)
+
+def _read_devtools_port(process: subprocess.Popen, user_data_dir: str) -> int:
+    """Waits for the browser to write the DevTools port it picked to its profile directory."""
+    port_file = os.path.join(user_data_dir, "DevToolsActivePort")
+    deadline = time.monotonic() + LAUNCH_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CdpError(f"Browser exited during startup (code {process.returncode})")
+        try:
+            with open(port_file) as f:
+                port = f.readline().strip()
+            if port:
+                return int(port)
+        except (OSError, ValueError):
+            pass
+        time.sleep(0.05)
+    raise CdpError(f"Browser did not open a DevTools port within {LAUNCH_TIMEOUT}s")
+
+def _page_websocket_url(port: int) -> str:
+    """Returns the websocket URL of the browser's first page target."""
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/json/list", timeout=COMMAND_TIMEOUT) as response:
+        targets = json.load(response)
+    for target in targets:
+        if target.get("type") == "page" and target.get("webSocketDebuggerUrl"):
+            return target["webSocketDebuggerUrl"]
+    raise CdpError("Browser has no page target")
+
+def launch(browser_path: str, arguments: list[str], capture_network: bool = False,
+           eager: bool = False) -> CdpPageDriver:
+    """Starts a browser with remote debugging on a free port and connects to its page.
+
+    Args:
+        browser_path: Brave/Chromium executable.
+        arguments: Extra command-line switches (the same ones the Selenium backend uses).
+        capture_network: See CdpPageDriver.
+        eager: Let get() return at DOMContentLoaded instead of the load event.
+
+    Raises:
+        CdpError: If the browser does not start or cannot be connected to.
+    """
+    user_data_dir = tempfile.mkdtemp(prefix="hol-cdp-")
+    command = [browser_path, "--remote-debugging-port=0", f"--user-data-dir={user_data_dir}",
+               "--no-first-run", "--no-default-browser-check", *arguments, "about:blank"]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        port = _read_devtools_port(process, user_data_dir)
+        load_event = "Page.domContentEventFired" if eager else "Page.loadEventFired"
+        return CdpPageDriver(process, user_data_dir, _page_websocket_url(port), capture_network, load_event)
+    except Exception:
+        process.kill()
+        process.wait()
+        shutil.rmtree(user_data_dir, ignore_errors=True)
+        raise
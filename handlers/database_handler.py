@@ -2,93 +2,795 @@
 
 import sqlite3
 import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from handlers import dataset_ingest, tracing
+from handlers.jikan_api import type_matches
+from handlers.matching import normalize_title
+from handlers.score_snapshot import ScoreSnapshot, SnapshotError, write_snapshot
 
 # Define the directory and the full path for the database
 DATABASE_DIR = "data"
 DATABASE_PATH = os.path.join(DATABASE_DIR, "anime_scores.db")
-TABLE_NAME = "anime_scores"
+ANIME_TABLE_NAME = "anime" # One row per anime (MAL entry when mal_id is known)
+ALIAS_TABLE_NAME = "anime_aliases" # Normalized title (as shown in the game or by MAL) -> anime rows
+LEGACY_TABLE_NAME = "anime_scores" # Title-keyed table of older databases, migrated by setup_database()
+MISS_TABLE_NAME = "anime_misses" # Titles the API could not resolve (negative cache)
+CHECKPOINT_TABLE_NAME = "prewarm_checkpoints" # Resume points for the catalog prewarm crawl
+# Read-only snapshot consulted after SQLite misses (see handlers/score_snapshot.py);
+# SQLite stays the write overlay on top of it
+SNAPSHOT_PATH = os.path.join(DATABASE_DIR, "anime_scores.snap")
+
+CACHE_SIZE = 2048 # Max titles kept in the in-memory LRU cache (0 disables it)
+STATEMENT_CACHE_SIZE = 64 # Prepared statements kept per connection
+BUSY_TIMEOUT = 30 # Seconds to wait for a lock held by another connection/process before failing
+MISS_TTL = 6 * 3600 # Seconds a first miss is trusted before the title is retried
+MISS_TTL_MAX = 7 * 24 * 3600 # TTL cap; the TTL doubles with every repeated miss
+INGEST_BATCH_SIZE = 50000 # Rows per transaction when ingesting a dataset
+REFRESH_AGE = 14 * 24 * 3600 # Seconds after which a score fetched by MAL ID counts as stale
+
+# SQL used on the hot path. Keeping these as fixed strings lets sqlite3 reuse
+# the prepared statement from its per-connection cache on every call.
+# Every anime an alias may stand for; _pick_candidate() chooses among them
+SELECT_CANDIDATES_SQL = f"""
+    SELECT a.id, a.score, a.anime_type, al.canonical, a.fetched_at
+    FROM {ALIAS_TABLE_NAME} al JOIN {ANIME_TABLE_NAME} a ON a.id = al.anime_id
+    WHERE al.alias = ?
+"""
+UPSERT_ANIME_BY_ID_SQL = f"""
+    INSERT INTO {ANIME_TABLE_NAME} (mal_id, title, anime_type, score, fetched_at) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(mal_id) DO UPDATE SET
+        title = excluded.title, anime_type = excluded.anime_type,
+        score = excluded.score, fetched_at = excluded.fetched_at
+"""
+INSERT_ANIME_SQL = f"INSERT INTO {ANIME_TABLE_NAME} (title, anime_type, score, fetched_at) VALUES (?, ?, ?, ?)"
+UPDATE_ANIME_SQL = f"""
+    UPDATE {ANIME_TABLE_NAME} SET score = ?, anime_type = COALESCE(?, anime_type), fetched_at = ?
+    WHERE id = ?
+"""
+# An alias may belong to several anime (a synonym of one can be another's title). A link
+# keeps the spelling the alias was first seen with; `canonical` marks the anime's own title.
+UPSERT_ALIAS_SQL = f"""
+    INSERT INTO {ALIAS_TABLE_NAME} (alias, title, anime_id, canonical) VALUES (?, ?, ?, ?)
+    ON CONFLICT(alias, anime_id) DO UPDATE SET canonical = excluded.canonical
+"""
+UPSERT_ALIAS_BY_MAL_ID_SQL = f"""
+    INSERT INTO {ALIAS_TABLE_NAME} (alias, title, anime_id, canonical)
+    SELECT ?, ?, id, ? FROM {ANIME_TABLE_NAME} WHERE mal_id = ?
+    ON CONFLICT(alias, anime_id) DO UPDATE SET canonical = excluded.canonical
+"""
+# Anime without a MAL ID are stand-ins for a title the API had not resolved yet; once
+# the title is linked to another anime, it is unlinked from them (orphans are dropped)
+DELETE_SUPERSEDED_SQL = f"""
+    DELETE FROM {ALIAS_TABLE_NAME} WHERE alias = ? AND anime_id != ?
+        AND anime_id IN (SELECT id FROM {ANIME_TABLE_NAME} WHERE mal_id IS NULL)
+"""
+DELETE_SUPERSEDED_BY_MAL_ID_SQL = f"""
+    DELETE FROM {ALIAS_TABLE_NAME} WHERE alias = ?
+        AND anime_id IN (SELECT id FROM {ANIME_TABLE_NAME} WHERE mal_id IS NULL)
+"""
+SELECT_MISS_SQL = f"SELECT reason, failed_at, attempts FROM {MISS_TABLE_NAME} WHERE title = ?"
+UPSERT_MISS_SQL = f"""
+    INSERT INTO {MISS_TABLE_NAME} (title, reason, failed_at, attempts) VALUES (?, ?, ?, 1)
+    ON CONFLICT(title) DO UPDATE SET
+        reason = excluded.reason, failed_at = excluded.failed_at, attempts = attempts + 1
+"""
+DELETE_MISS_SQL = f"DELETE FROM {MISS_TABLE_NAME} WHERE title = ?"
+ALIAS_TABLE_SQL = f"""
+    CREATE TABLE IF NOT EXISTS {{table}} (
+        alias TEXT NOT NULL,
+        title TEXT NOT NULL,
+        anime_id INTEGER NOT NULL REFERENCES {ANIME_TABLE_NAME} (id),
+        canonical INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (alias, anime_id)
+    )
+"""
+
+# One long-lived connection per thread (sqlite3 connections must not be shared across threads)
+_local = threading.local()
+_all_connections: list[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+_connection_generation = 0 # Bumped by close_connections() so every thread reconnects
+
+# alias -> its candidates (see SELECT_CANDIDATES_SQL), most recently used last. Guarded by _cache_lock.
+_score_cache: OrderedDict[str, tuple[tuple, ...]] = OrderedDict()
+_cache_lock = threading.Lock()
+
+# title -> (reason, expires_at) for known misses. Guarded by _cache_lock.
+_miss_cache: dict[str, tuple[str, float]] = {}
+
+_snapshot: ScoreSnapshot | None = None
+
+def _get_connection() -> sqlite3.Connection:
+    """Returns this thread's database connection, opening it on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "generation", None) != _connection_generation:
+        # Each connection is only used by its own thread, but close_connections() closes
+        # them all from the main thread, which the default same-thread check rejects
+        conn = sqlite3.connect(
+            DATABASE_PATH, timeout=BUSY_TIMEOUT, cached_statements=STATEMENT_CACHE_SIZE,
+            check_same_thread=False,
+        )
+        # WAL lets readers and the writer work at the same time and avoids an fsync per insert
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        # Lets SQL (migration, miss cleanup) compute alias keys exactly like Python does
+        conn.create_function("normalize_title", 1, normalize_title, deterministic=True)
+        _local.conn = conn
+        _local.generation = _connection_generation
+        with _connections_lock:
+            _all_connections.append(conn)
+    return conn
+
+def close_connections():
+    """Closes every connection opened by this module (call once at shutdown)."""
+    global _connection_generation
+    with _connections_lock:
+        _connection_generation += 1
+        for conn in _all_connections:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"Database error while closing connection: {e}")
+        _all_connections.clear()
+    close_snapshot()
+
+def _cache_get(alias: str) -> tuple[tuple, ...] | None:
+    """Returns the cached candidates of an alias and marks them as recently used."""
+    with _cache_lock:
+        candidates = _score_cache.get(alias)
+        if candidates is not None:
+            _score_cache.move_to_end(alias)
+        return candidates
+
+def _cache_put(alias: str, candidates: tuple[tuple, ...]):
+    """Adds or refreshes cached candidates, evicting the least recently used alias when full."""
+    if CACHE_SIZE <= 0:
+        return
+    with _cache_lock:
+        _score_cache[alias] = candidates
+        _score_cache.move_to_end(alias)
+        while len(_score_cache) > CACHE_SIZE:
+            _score_cache.popitem(last=False)
+
+def clear_cache():
+    """Empties the in-memory score cache."""
+    with _cache_lock:
+        _score_cache.clear()
+        _miss_cache.clear()
+
+def _miss_ttl(attempts: int) -> float:
+    """TTL for a title that has missed `attempts` times: MISS_TTL doubled per repeat, capped."""
+    return min(MISS_TTL * 2 ** max(attempts - 1, 0), MISS_TTL_MAX)
 
 def setup_database():
     """Sets up the database: creates the directory, connects, and creates the table if it doesn't exist."""
-    conn = None
     try:
         # Ensure the database directory exists
         os.makedirs(DATABASE_DIR, exist_ok=True)
         print(f"Ensured database directory '{DATABASE_DIR}' exists.")
 
         # Connect to the database (creates the file if it doesn't exist in the specified path)
-        conn = sqlite3.connect(DATABASE_PATH)
+        conn = _get_connection()
         cursor = conn.cursor()
 
-        # Create table if it doesn't exist
+        # Create tables if they don't exist. Scores belong to an anime (identified by its
+        # MAL ID when known); every title it goes by is an alias pointing at it.
         cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
+            CREATE TABLE IF NOT EXISTS {ANIME_TABLE_NAME} (
+                id INTEGER PRIMARY KEY,
+                mal_id INTEGER UNIQUE,
+                title TEXT NOT NULL,
+                anime_type TEXT,
+                score REAL NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {ANIME_TABLE_NAME}_fetched_at ON {ANIME_TABLE_NAME} (fetched_at)"
+        )
+        cursor.execute(ALIAS_TABLE_SQL.format(table=ALIAS_TABLE_NAME))
+        alias_columns = {row[1] for row in cursor.execute(f"PRAGMA table_info({ALIAS_TABLE_NAME})")}
+        if "canonical" not in alias_columns:
+            _migrate_alias_table(conn)
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS {ALIAS_TABLE_NAME}_anime_id ON {ALIAS_TABLE_NAME} (anime_id)"
+        )
+        # An anime whose last alias was unlinked can no longer be reached
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {ALIAS_TABLE_NAME}_drop_orphans
+            AFTER DELETE ON {ALIAS_TABLE_NAME}
+            BEGIN
+                DELETE FROM {ANIME_TABLE_NAME} WHERE id = OLD.anime_id
+                    AND NOT EXISTS (SELECT 1 FROM {ALIAS_TABLE_NAME} WHERE anime_id = OLD.anime_id);
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {MISS_TABLE_NAME} (
                 title TEXT PRIMARY KEY,
-                score REAL NOT NULL
+                reason TEXT NOT NULL,
+                failed_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 1
+            )
+        """)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {CHECKPOINT_TABLE_NAME} (
+                source TEXT PRIMARY KEY,
+                next_page INTEGER NOT NULL,
+                finished INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
             )
         """)
         conn.commit()
-        print(f"Database '{DATABASE_PATH}' setup complete. Table '{TABLE_NAME}' is ready.")
+        legacy = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (LEGACY_TABLE_NAME,)
+        ).fetchone()
+        if legacy:
+            _migrate_legacy_scores(conn)
+        print(
+            f"Database '{DATABASE_PATH}' setup complete. "
+            f"Tables '{ANIME_TABLE_NAME}', '{ALIAS_TABLE_NAME}' and '{MISS_TABLE_NAME}' are ready."
+        )
+        if os.path.exists(SNAPSHOT_PATH):
+            open_snapshot(SNAPSHOT_PATH)
 
     except sqlite3.Error as e:
         print(f"Database error during setup: {e}")
     except OSError as e:
         print(f"Error creating directory '{DATABASE_DIR}': {e}")
-    finally:
-        if conn:
-            conn.close()
 
-def get_score_from_db(title: str) -> float | None:
-    """Retrieves the score for a given title from the database.
+def _migrate_alias_table(conn: sqlite3.Connection):
+    """Rebuilds an alias table keyed by alias alone (one anime per alias) as (alias, anime_id) pairs."""
+    with conn:
+        conn.execute(ALIAS_TABLE_SQL.format(table=f"{ALIAS_TABLE_NAME}_new"))
+        conn.execute(f"""
+            INSERT INTO {ALIAS_TABLE_NAME}_new (alias, title, anime_id, canonical)
+            SELECT al.alias, al.title, al.anime_id, normalize_title(a.title) = al.alias
+            FROM {ALIAS_TABLE_NAME} al JOIN {ANIME_TABLE_NAME} a ON a.id = al.anime_id
+        """)
+        conn.execute(f"DROP TABLE {ALIAS_TABLE_NAME}") # Also drops its index and trigger
+        conn.execute(f"ALTER TABLE {ALIAS_TABLE_NAME}_new RENAME TO {ALIAS_TABLE_NAME}")
+    print(f"Migrated '{ALIAS_TABLE_NAME}' to one row per (alias, anime).")
+
+def _migrate_legacy_scores(conn: sqlite3.Connection):
+    """Moves a title-keyed anime_scores table into the anime/alias tables, in one transaction.
+
+    Old rows have no MAL ID, so each becomes its own anime (with an unknown fetch time)
+    and its title the only alias; titles that normalize to the same key keep the first row.
+    """
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({LEGACY_TABLE_NAME})")}
+    # Databases created before anime_type existed have no type column (NULL = unknown type)
+    type_column = "anime_type" if "anime_type" in columns else "NULL"
+    with conn:
+        first_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {ANIME_TABLE_NAME}").fetchone()[0]
+        conn.execute(f"""
+            INSERT INTO {ANIME_TABLE_NAME} (title, anime_type, score, fetched_at)
+            SELECT title, UPPER({type_column}), score, 0 FROM {LEGACY_TABLE_NAME}
+            WHERE normalize_title(title) != '' ORDER BY rowid
+        """)
+        # One alias per key: the first row, unless the key is already an alias
+        conn.execute(f"""
+            INSERT INTO {ALIAS_TABLE_NAME} (alias, title, anime_id, canonical)
+            SELECT key, title, MIN(id), 1 FROM (
+                SELECT normalize_title(title) AS key, title, id FROM {ANIME_TABLE_NAME} WHERE id >= ?
+            )
+            WHERE key NOT IN (SELECT alias FROM {ALIAS_TABLE_NAME})
+            GROUP BY key
+        """, (first_id,))
+        conn.execute(f"""
+            DELETE FROM {ANIME_TABLE_NAME} WHERE id >= ?
+                AND NOT EXISTS (SELECT 1 FROM {ALIAS_TABLE_NAME} WHERE anime_id = {ANIME_TABLE_NAME}.id)
+        """, (first_id,))
+        migrated = conn.execute(
+            f"SELECT COUNT(*) FROM {ANIME_TABLE_NAME} WHERE id >= ?", (first_id,)
+        ).fetchone()[0]
+        conn.execute(f"DROP TABLE {LEGACY_TABLE_NAME}")
+    print(f"Migrated {migrated} titles from '{LEGACY_TABLE_NAME}' to '{ANIME_TABLE_NAME}'/'{ALIAS_TABLE_NAME}'.")
+
+def _pick_candidate(candidates, expected_type: str | None) -> tuple | None:
+    """Chooses the anime an alias stands for among its (id, score, anime_type, canonical, fetched_at) rows.
+
+    Ranked like jikan_api.pick_best_match(): type match first, then an anime whose own
+    title the alias is over one that only lists it as a synonym, then the freshest score.
+    """
+    return max(
+        candidates, default=None,
+        key=lambda c: (type_matches(c[2], expected_type), c[3], c[4], c[0]),
+    )
+
+def _find_anime(conn: sqlite3.Connection, title: str, anime_type: str | None = None) -> int | None:
+    """Returns the id of the anime `title` stands for (see _pick_candidate()), or None."""
+    best = _pick_candidate(conn.execute(SELECT_CANDIDATES_SQL, (normalize_title(title),)), anime_type)
+    return best[0] if best else None
+
+def get_score_from_db(title: str, expected_type: str | None = None) -> float | None:
+    """Retrieves the score for a given title, from the in-memory cache or the database.
 
     Args:
         title: The anime title to search for.
+        expected_type: The type shown in the game, if any. When the title is a name of
+            several anime, one of this type is preferred (see _pick_candidate()).
 
     Returns:
         The score as a float if found, otherwise None.
     """
-    conn = None
-    score = None
-    try:
-        # Connect using the full path
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        # Use parameterized query to prevent SQL injection
-        cursor.execute(f"SELECT score FROM {TABLE_NAME} WHERE title = ?", (title,))
-        result = cursor.fetchone()
-        if result:
-            score = result[0]
-            # print(f"DEBUG DB: Found score {score} for '{title}' in database.") # Removed debug print
-            # print(f"Found score {score} for '{title}' in database.") # Optional: uncomment for debugging
-        # else:
-            # print(f"Title '{title}' not found in database.") # Optional: uncomment for debugging
-    except sqlite3.Error as e:
-        print(f"Database error retrieving score for '{title}': {e}")
-    finally:
-        if conn:
-            conn.close()
-    return score
+    key = normalize_title(title)
+    candidates = _cache_get(key)
+    if candidates is not None:
+        tracing.count("cache.lru_hit")
+    else:
+        try:
+            # Use parameterized query to prevent SQL injection
+            with tracing.span("db.lookup"):
+                candidates = tuple(_get_connection().execute(SELECT_CANDIDATES_SQL, (key,)))
+            if candidates:
+                _cache_put(key, candidates)
+                tracing.count("cache.db_hit")
+            else:
+                tracing.count("cache.db_miss")
+        except sqlite3.Error as e:
+            print(f"Database error retrieving score for '{title}': {e}")
+    best = _pick_candidate(candidates or (), expected_type)
+    if best is not None:
+        return best[1]
+    if _snapshot is not None:
+        entry = _snapshot.lookup(title)
+        if entry is not None:
+            tracing.count("cache.snapshot_hit")
+            return entry[0]
+    return None
 
-def save_score_to_db(title: str, score: float):
-    """Saves or updates a title and score in the database.
+def _upsert_anime(conn: sqlite3.Connection, mal_id: int | None, title: str, score: float,
+                  anime_type: str | None, now: float) -> int:
+    """Inserts or updates one anime row and returns its id. Caller holds the transaction.
 
-    Uses INSERT OR REPLACE to handle cases where the title might already exist.
+    With a MAL ID the row is found by ID; without one, by the anime `title` is already an alias of.
+    """
+    if mal_id is not None:
+        conn.execute(UPSERT_ANIME_BY_ID_SQL, (mal_id, title, anime_type, score, now))
+        return conn.execute(f"SELECT id FROM {ANIME_TABLE_NAME} WHERE mal_id = ?", (mal_id,)).fetchone()[0]
+    existing = _find_anime(conn, title, anime_type)
+    if existing is not None:
+        conn.execute(UPDATE_ANIME_SQL, (score, anime_type, now, existing))
+        return existing
+    return conn.execute(INSERT_ANIME_SQL, (title, anime_type, score, now)).lastrowid
+
+def _link_aliases(conn: sqlite3.Connection, anime_id: int, titles) -> list[str]:
+    """Links every title to an anime row, next to any other anime it already names.
+
+    Links to anime without a MAL ID are replaced (see DELETE_SUPERSEDED_SQL). Caller
+    holds the transaction.
+
+    Returns:
+        The titles that were linked (empty or punctuation-only titles are skipped).
+    """
+    anime_title = conn.execute(f"SELECT title FROM {ANIME_TABLE_NAME} WHERE id = ?", (anime_id,)).fetchone()[0]
+    canonical_key = normalize_title(anime_title)
+    linked = []
+    for title in titles:
+        key = normalize_title(title) if title else ""
+        if key:
+            conn.execute(UPSERT_ALIAS_SQL, (key, title, anime_id, key == canonical_key))
+            conn.execute(DELETE_SUPERSEDED_SQL, (key, anime_id))
+            conn.execute(DELETE_MISS_SQL, (title,)) # A resolved title is no longer a miss
+            linked.append(title)
+    return linked
+
+def _forget_cached(titles):
+    """Drops the cached candidates and misses of titles whose links were just written."""
+    with _cache_lock:
+        for title in titles:
+            _score_cache.pop(normalize_title(title), None)
+            _miss_cache.pop(title, None)
+
+def save_score_to_db(title: str, score: float, anime_type: str | None = None):
+    """Saves or updates the score of a title whose MAL entry is unknown (and the in-memory cache).
+
+    If the title is already an alias, the anime it points to is updated; otherwise a
+    new anime without a MAL ID is created for it. Prefer save_anime() when the entry is known.
 
     Args:
         title: The anime title.
         score: The corresponding score.
+        anime_type: The type of the matched entry (e.g. "TV", "MOVIE"), if known.
     """
-    conn = None
     try:
-        # Connect using the full path
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        # Use INSERT OR REPLACE to add new entries or update existing ones based on the PRIMARY KEY (title)
-        cursor.execute(f"INSERT OR REPLACE INTO {TABLE_NAME} (title, score) VALUES (?, ?)", (title, score))
-        conn.commit()
-        # print(f"Saved/Updated '{title}' with score {score} to database.") # Optional: uncomment for debugging
+        conn = _get_connection()
+        with tracing.span("db.save"), conn:
+            anime_id = _upsert_anime(conn, None, title, score, anime_type.upper() if anime_type else None, time.time())
+            linked = _link_aliases(conn, anime_id, [title])
+        _forget_cached(linked)
     except sqlite3.Error as e:
         print(f"Database error saving score for '{title}': {e}")
+
+def save_anime(mal_id: int | None, title: str, score: float, anime_type: str | None, aliases) -> int | None:
+    """Saves a resolved anime entry and points all of its aliases at it.
+
+    Args:
+        mal_id: The entry's MAL ID (None if the source did not say).
+        title: Its canonical (MAL) title.
+        score: Its score.
+        anime_type: Its type (e.g. "TV", "MOVIE"), if known.
+        aliases: Other titles it goes by, e.g. the title shown in the game, its English
+            title and synonyms. The canonical title is always an alias too. A name that is
+            also another anime's name stays linked to both.
+
+    Returns:
+        The anime's row id, or None on a database error.
+    """
+    try:
+        conn = _get_connection()
+        with tracing.span("db.save"), conn:
+            anime_id = _upsert_anime(conn, mal_id, title, score, anime_type.upper() if anime_type else None, time.time())
+            linked = _link_aliases(conn, anime_id, [title, *aliases])
+        _forget_cached(linked)
+        return anime_id
+    except sqlite3.Error as e:
+        print(f"Database error saving '{title}' (MAL ID {mal_id}): {e}")
+        return None
+
+def link_alias(title: str, known_title: str, anime_type: str | None = None) -> bool:
+    """Makes `title` an alias of the anime `known_title` already belongs to, e.g. after a fuzzy match.
+
+    Args:
+        anime_type: The type of the matched anime, if known, to pick it when
+            `known_title` names several.
+
+    Returns:
+        True if linked, False if `known_title` is not in the database.
+    """
+    try:
+        conn = _get_connection()
+        with tracing.span("db.save"), conn:
+            known = _find_anime(conn, known_title, anime_type)
+            if known is None:
+                return False
+            linked = _link_aliases(conn, known, [title])
+        _forget_cached(linked)
+        return True
+    except sqlite3.Error as e:
+        print(f"Database error linking '{title}' to '{known_title}': {e}")
+        return False
+
+def _write_rows(conn: sqlite3.Connection, rows: list[tuple[str, float, str | None, int | None]],
+                now: float):
+    """Writes (title, score, anime_type, mal_id) rows. Caller holds the transaction.
+
+    Rows with a MAL ID are written in bulk; the first row of each ID gives the canonical
+    title and the others become its aliases. Rows without one go through _upsert_anime().
+    """
+    anime, canonical_keys, aliases = {}, {}, []
+    for title, score, anime_type, mal_id in rows:
+        key = normalize_title(title)
+        if not key:
+            continue
+        if mal_id is None:
+            anime_id = _upsert_anime(conn, None, title, score, anime_type, now)
+            _link_aliases(conn, anime_id, [title])
+            continue
+        if mal_id not in anime:
+            anime[mal_id] = (mal_id, title, anime_type, score, now)
+            canonical_keys[mal_id] = key
+        aliases.append((key, title, key == canonical_keys[mal_id], mal_id))
+    conn.executemany(UPSERT_ANIME_BY_ID_SQL, anime.values())
+    conn.executemany(UPSERT_ALIAS_BY_MAL_ID_SQL, aliases)
+    conn.executemany(DELETE_SUPERSEDED_BY_MAL_ID_SQL, [(key,) for key, _, _, _ in aliases])
+
+def save_scores_batch(rows: list[tuple[str, float, str | None, int | None]],
+                      checkpoint: tuple[str, int, bool] | None = None):
+    """Saves many (title, score, anime_type, mal_id) rows in a single transaction.
+
+    Args:
+        rows: The rows to write; mal_id may be None (see _write_rows()).
+        checkpoint: Optional (source, next_page, finished) prewarm checkpoint, committed
+            in the same transaction so a resumed crawl never skips or loses a page.
+
+    Raises:
+        sqlite3.Error: If the transaction fails (nothing is written in that case).
+    """
+    rows = [(title, score, anime_type.upper() if anime_type else None, mal_id)
+            for title, score, anime_type, mal_id in rows]
+    conn = _get_connection()
+    with conn:
+        _write_rows(conn, rows, time.time())
+        conn.executemany(DELETE_MISS_SQL, [(title,) for title, _, _, _ in rows])
+        if checkpoint is not None:
+            source, next_page, finished = checkpoint
+            conn.execute(
+                f"INSERT OR REPLACE INTO {CHECKPOINT_TABLE_NAME} (source, next_page, finished, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (source, next_page, int(finished), time.time()),
+            )
+    _forget_cached(title for title, _, _, _ in rows)
+
+def get_stale_anime(limit: int, max_age: float = REFRESH_AGE) -> list[tuple[int, str]]:
+    """Returns up to `limit` (mal_id, title) pairs whose score is older than `max_age` seconds, oldest first."""
+    try:
+        return _get_connection().execute(
+            f"SELECT mal_id, title FROM {ANIME_TABLE_NAME} WHERE mal_id IS NOT NULL AND fetched_at < ? "
+            "ORDER BY fetched_at LIMIT ?",
+            (time.time() - max_age, limit),
+        ).fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error reading stale entries: {e}")
+        return []
+
+def save_refreshed_scores(updates: list[tuple[int, float | None, str | None]]) -> list[tuple[int, float, str | None]]:
+    """Stores the result of refreshing entries by MAL ID, in one transaction.
+
+    Args:
+        updates: (mal_id, score, anime_type) per refreshed entry. A None score (the entry
+            was removed or lost its score) keeps the old score but still counts as refreshed.
+
+    Returns:
+        The stored (anime_id, score, anime_type) of each refreshed entry, e.g. for
+        TitleIndex.set_scores(); empty on a database error.
+    """
+    now = time.time()
+    rows = [(score, anime_type.upper() if anime_type else None, now, mal_id)
+            for mal_id, score, anime_type in updates]
+    try:
+        conn = _get_connection()
+        with conn:
+            conn.executemany(f"""
+                UPDATE {ANIME_TABLE_NAME} SET score = COALESCE(?, score),
+                    anime_type = COALESCE(?, anime_type), fetched_at = ?
+                WHERE mal_id = ?
+            """, rows)
+            refreshed = [
+                row for mal_id, _, _ in updates
+                for row in conn.execute(
+                    f"SELECT id, score, anime_type FROM {ANIME_TABLE_NAME} WHERE mal_id = ?", (mal_id,)
+                )
+            ]
+            aliases = [
+                alias for anime_id, _, _ in refreshed
+                for (alias,) in conn.execute(f"SELECT alias FROM {ALIAS_TABLE_NAME} WHERE anime_id = ?", (anime_id,))
+            ]
+    except sqlite3.Error as e:
+        print(f"Database error saving refreshed scores: {e}")
+        return []
+    with _cache_lock:
+        for alias in aliases:
+            _score_cache.pop(alias, None)
+    return refreshed
+
+def get_prewarm_checkpoint(source: str) -> tuple[int, bool] | None:
+    """Returns the saved (next_page, finished) for a prewarm source, or None if it was never crawled."""
+    try:
+        result = _get_connection().execute(
+            f"SELECT next_page, finished FROM {CHECKPOINT_TABLE_NAME} WHERE source = ?", (source,)
+        ).fetchone()
+    except sqlite3.Error as e:
+        print(f"Database error reading checkpoint for '{source}': {e}")
+        return None
+    return (result[0], bool(result[1])) if result else None
+
+def clear_prewarm_checkpoint(source: str):
+    """Forgets the checkpoint of a prewarm source so the next crawl starts from page 1."""
+    try:
+        conn = _get_connection()
+        with conn:
+            conn.execute(f"DELETE FROM {CHECKPOINT_TABLE_NAME} WHERE source = ?", (source,))
+    except sqlite3.Error as e:
+        print(f"Database error clearing checkpoint for '{source}': {e}")
+
+def get_all_scores(limit: int | None = None) -> list[tuple[str, float, str | None, int, bool]]:
+    """Returns a (title, score, anime_type, anime_id, canonical) row per alias, e.g. to build a title index.
+
+    Args:
+        limit: Return at most this many rows, from the most recently fetched anime (None = all).
+    """
+    try:
+        return _get_connection().execute(f"""
+            SELECT al.title, a.score, a.anime_type, a.id, al.canonical = 1
+            FROM {ANIME_TABLE_NAME} a JOIN {ALIAS_TABLE_NAME} al ON al.anime_id = a.id
+            ORDER BY a.fetched_at DESC
+            LIMIT ?
+        """, (-1 if limit is None else limit,)).fetchall()
+    except sqlite3.Error as e:
+        print(f"Database error reading all scores: {e}")
+        return []
+
+def get_miss_from_db(title: str) -> str | None:
+    """Checks whether a title is a known miss that should not be looked up again yet.
+
+    Args:
+        title: The anime title to check.
+
+    Returns:
+        The recorded failure reason while the miss is still within its TTL, otherwise None.
+    """
+    now = time.time()
+    with _cache_lock:
+        cached = _miss_cache.get(title)
+    if cached is not None:
+        reason, expires_at = cached
+        return reason if now < expires_at else None
+    try:
+        result = _get_connection().execute(SELECT_MISS_SQL, (title,)).fetchone()
+    except sqlite3.Error as e:
+        print(f"Database error retrieving miss for '{title}': {e}")
+        return None
+    if not result:
+        return None
+    reason, failed_at, attempts = result
+    expires_at = failed_at + _miss_ttl(attempts)
+    with _cache_lock:
+        _miss_cache[title] = (reason, expires_at)
+    return reason if now < expires_at else None
+
+def save_miss_to_db(title: str, reason: str):
+    """Records that a title could not be resolved, extending its TTL if it missed before.
+
+    Args:
+        title: The anime title.
+        reason: Why the lookup failed (e.g. one of jikan_api's MISS_* constants).
+    """
+    now = time.time()
+    try:
+        conn = _get_connection()
+        with conn:
+            conn.execute(UPSERT_MISS_SQL, (title, reason, now))
+            attempts = conn.execute(SELECT_MISS_SQL, (title,)).fetchone()[2]
+        with _cache_lock:
+            _miss_cache[title] = (reason, now + _miss_ttl(attempts))
+    except sqlite3.Error as e:
+        print(f"Database error saving miss for '{title}': {e}")
+
+def open_snapshot(path: str = SNAPSHOT_PATH) -> bool:
+    """Opens a score snapshot read-only and consults it after SQLite misses (replacing any open one).
+
+    Returns:
+        True if the snapshot was opened.
+    """
+    global _snapshot
+    try:
+        snapshot = ScoreSnapshot(path)
+    except SnapshotError as e:
+        print(f"Snapshot error: {e}")
+        return False
+    close_snapshot()
+    _snapshot = snapshot
+    print(f"Opened score snapshot '{path}' with {len(snapshot)} titles.")
+    return True
+
+def close_snapshot():
+    """Stops consulting the score snapshot and unmaps it."""
+    global _snapshot
+    snapshot, _snapshot = _snapshot, None
+    if snapshot is not None:
+        snapshot.close()
+
+def export_snapshot(path: str) -> int:
+    """Writes every cached score (SQLite and the open snapshot, SQLite winning) to a snapshot file.
+
+    Returns:
+        The number of titles written.
+    """
+    # One entry per title: of the anime sharing a name, the one whose own title it is
+    rows = [row[:3] for row in sorted(get_all_scores(), key=lambda row: not row[4])]
+    if _snapshot is not None:
+        rows.extend(_snapshot.rows())
+    return write_snapshot(path, rows)
+
+def import_snapshot(path: str, merge: bool = False) -> int:
+    """Installs a snapshot file as SNAPSHOT_PATH and opens it.
+
+    Args:
+        path: The snapshot to install (it is validated first).
+        merge: Also copy its rows into SQLite, keyed by normalized title, without
+            overwriting scores that are already there.
+
+    Returns:
+        The number of titles in the snapshot.
+
+    Raises:
+        SnapshotError: If the file is not a valid snapshot.
+    """
+    snapshot = ScoreSnapshot(path)
+    try:
+        count = len(snapshot)
+        if merge:
+            rows = [(title, score, anime_type, None) for title, score, anime_type in snapshot.rows()
+                    if get_score_from_db(title) is None]
+            save_scores_batch(rows)
+            print(f"Merged {len(rows)} new titles into '{DATABASE_PATH}'.")
+    finally:
+        snapshot.close()
+    if os.path.abspath(path) != os.path.abspath(SNAPSHOT_PATH):
+        directory = os.path.dirname(SNAPSHOT_PATH) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as target, open(path, "rb") as source:
+                while chunk := source.read(1024 * 1024):
+                    target.write(chunk)
+            os.replace(temp_path, SNAPSHOT_PATH)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+    open_snapshot(SNAPSHOT_PATH)
+    return count
+
+def ingest_dataset(path: str, file_format: str | None = None,
+                   batch_size: int = INGEST_BATCH_SIZE) -> int:
+    """Loads an offline anime dataset (see handlers/dataset_ingest.py) into the anime and alias tables.
+
+    The file is streamed and written about batch_size rows per transaction, so memory
+    use does not grow with the file. Entries with a MAL ID update the existing anime;
+    scores already stored for the same titles are replaced by the dataset's. Titles it
+    resolves are removed from the miss table.
+
+    Returns:
+        The number of rows written.
+
+    Raises:
+        sqlite3.Error, OSError, ValueError: On database, file or format errors; batches
+            committed before the error are kept.
+    """
+    conn = _get_connection()
+    started = time.monotonic()
+    now = time.time()
+    written = 0
+    batch = []
+
+    def write_batch():
+        nonlocal written
+        with conn:
+            _write_rows(conn, batch, now)
+        written += len(batch)
+        batch.clear()
+        elapsed = time.monotonic() - started
+        print(f"Ingested {written} rows ({written / elapsed:,.0f} rows/s).")
+
+    for row in dataset_ingest.iter_rows(path, file_format):
+        # Keep the rows of one MAL ID together so its first row stays the canonical title
+        if len(batch) >= batch_size and (row[3] is None or row[3] != batch[-1][3]):
+            write_batch()
+        batch.append(row)
+    if batch:
+        write_batch()
+
+    with conn:
+        conn.execute(
+            f"DELETE FROM {MISS_TABLE_NAME} WHERE normalize_title(title) IN (SELECT alias FROM {ALIAS_TABLE_NAME})"
+        )
+    clear_cache() # Cached scores may have been replaced
+    elapsed = time.monotonic() - started
+    print(f"Ingest of '{path}' done: {written} rows in {elapsed:.1f}s ({written / max(elapsed, 1e-9):,.0f} rows/s).")
+    return written
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Snapshot export/import and offline dataset ingest.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="Write the score cache to a snapshot file.")
+    export_parser.add_argument("path", nargs="?", default=SNAPSHOT_PATH)
+    import_parser = commands.add_parser("import", help=f"Install a snapshot file as {SNAPSHOT_PATH}.")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--merge", action="store_true", help="Also copy its titles into SQLite.")
+    ingest_parser = commands.add_parser("ingest", help="Load a MAL CSV / JSON / JSON Lines dump into SQLite.")
+    ingest_parser.add_argument("path")
+    ingest_parser.add_argument("--format", choices=dataset_ingest.FORMATS, help="Default: from the extension.")
+    ingest_parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+
+    setup_database()
+    try:
+        if args.command == "export":
+            count = export_snapshot(args.path)
+            print(f"Exported {count} titles to '{args.path}'.")
+        elif args.command == "import":
+            count = import_snapshot(args.path, merge=args.merge)
+            print(f"Imported snapshot with {count} titles.")
+        else:
+            ingest_dataset(args.path, args.format, args.batch_size)
+    except (SnapshotError, sqlite3.Error, OSError, ValueError) as e:
+        print(f"Snapshot {args.command} failed: {e}")
+        raise SystemExit(1)
     finally:
-        if conn:
-            conn.close() 
\ No newline at end of file
+        close_connections()
@@ -0,0 +1,221 @@
+# dataset_ingest.py - Streams offline anime dumps (MAL CSV / JSON / JSON Lines exports) as score rows
+
+import ast
+import csv
+import json
+import os
+
+from handlers import matching
+
+READ_CHUNK_SIZE = 1024 * 1024 # Bytes read at a time from JSON files
+CSV_FIELD_SIZE_LIMIT = 16 * 1024 * 1024 # Some dumps carry long synopsis fields
+
+# Column / key names used by common MAL exports, matched case-insensitively
+TITLE_FIELDS = ("title", "name")
+ENGLISH_FIELDS = ("title_english", "english name", "english_name", "english")
+SYNONYM_FIELDS = ("title_synonyms", "synonyms", "other name", "other_name", "alternative_titles")
+TYPE_FIELDS = ("type", "media_type")
+SCORE_FIELDS = ("score", "mean")
+ID_FIELDS = ("mal_id", "anime_id", "myanimelist_id")
+
+FORMATS = ("csv", "json", "jsonl")
+ARRAY_KEYS = ("data",) # Keys a JSON dump may wrap its record array in (Jikan style)
+MISSING_VALUES = ("", "unknown", "n/a", "none", "null") # Placeholders dumps use for empty fields
+
+def detect_format(path: str) -> str:
+    """Guesses the dataset format from the file extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if extension == ".json":
+        return "json"
+    return "csv"
+
+# Column lookups resolved once per distinct set of keys (a CSV header, or a JSON record layout)
+_column_cache: dict[tuple, dict[str, tuple]] = {}
+
+def _columns(keys: tuple) -> dict[str, tuple]:
+    """Maps each field role to the record keys that can hold it, in priority order."""
+    columns = _column_cache.get(keys)
+    if columns is None:
+        by_name = {str(key).strip().lower(): key for key in keys}
+        columns = {
+            role: tuple(by_name[name] for name in names if name in by_name)
+            for role, names in (("title", TITLE_FIELDS), ("english", ENGLISH_FIELDS),
+                                ("synonyms", SYNONYM_FIELDS), ("type", TYPE_FIELDS),
+                                ("score", SCORE_FIELDS), ("mal_id", ID_FIELDS))
+        }
+        if len(_column_cache) < 64:
+            _column_cache[keys] = columns
+    return columns
+
+def _field(record: dict, keys: tuple):
+    for key in keys:
+        value = record[key]
+        if value is None or (isinstance(value, str) and value.strip().lower() in MISSING_VALUES):
+            continue
+        return value
+    return None
+
+def _parse_synonyms(value) -> list[str]:
+    """Synonyms come as a list, a list literal ("['A', 'B']") or a ";"/"|"-separated string."""
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [v for v in value if isinstance(v, str)]
+    if isinstance(value, dict): # e.g. MAL API "alternative_titles": {"synonyms": [...], "en": ..., "ja": ...}
+        names = list(value.get("synonyms") or [])
+        names.extend(v for k, v in value.items() if k != "synonyms" and isinstance(v, str))
+        return names
+    text = str(value).strip()
+    if text.startswith("["):
+        try:
+            parsed = ast.literal_eval(text)
+            return [v for v in parsed if isinstance(v, str)]
+        except (ValueError, SyntaxError):
+            pass
+    for separator in (";", "|"):
+        if separator in text:
+            return [part.strip() for part in text.split(separator) if part.strip()]
+    return [text]
+
+def _parse_mal_id(value) -> int | None:
+    try:
+        mal_id = int(value)
+    except (TypeError, ValueError):
+        return None
+    return mal_id if mal_id > 0 else None
+
+def _parse_score(value) -> float | None:
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        return None # e.g. "UNKNOWN" or empty for unaired shows
+    return score if score > 0 else None
+
+def record_to_rows(record: dict) -> list[tuple[str, float, str | None, int | None]]:
+    """Turns one dataset record into (title, score, anime_type, mal_id) rows, one per distinct name.
+
+    Names are collected like jikan_api does for API results (title, English title,
+    synonyms); names that normalize to the same key are stored once. The first row
+    carries the main title. mal_id is None if the dataset has no MAL ID column.
+    """
+    columns = _columns(tuple(record))
+    score = _parse_score(_field(record, columns["score"]))
+    title = _field(record, columns["title"])
+    if score is None or not isinstance(title, str):
+        return []
+    anime_type = _field(record, columns["type"])
+    anime_type = str(anime_type).strip().upper() if anime_type else None
+    mal_id = _parse_mal_id(_field(record, columns["mal_id"]))
+    entry = {
+        "title": title.strip(),
+        "title_english": _field(record, columns["english"]),
+        "title_synonyms": [s.strip() for s in _parse_synonyms(_field(record, columns["synonyms"]))],
+        "titles": record.get("titles") if isinstance(record.get("titles"), list) else None,
+    }
+    rows, keys = [], set()
+    for name in matching.entry_names(entry):
+        if not isinstance(name, str):
+            continue
+        key = matching.normalize_title(name)
+        if key and key not in keys:
+            keys.add(key)
+            rows.append((name, score, anime_type, mal_id))
+    return rows
+
+def _iter_csv(path: str):
+    csv.field_size_limit(CSV_FIELD_SIZE_LIMIT)
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        yield from csv.DictReader(f)
+
+def _iter_jsonl(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+def _iter_json_array(path: str):
+    """Yields the items of a JSON dump's record array without loading the whole file.
+
+    The root must be the array itself or an object holding it under one of ARRAY_KEYS
+    (e.g. `{"data": [...]}`); the object's other values are skipped.
+
+    Raises:
+        ValueError: If the root is anything else, or the file is truncated.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buffer, position, eof = "", 0, False
+
+        def peek(separators: str = " \t\r\n") -> str:
+            """Skips separators and returns the next character ("" at the end of the file)."""
+            nonlocal buffer, position, eof
+            while True:
+                while position < len(buffer) and buffer[position] in separators:
+                    position += 1
+                if position < len(buffer) or eof:
+                    return buffer[position:position + 1]
+                chunk = f.read(READ_CHUNK_SIZE)
+                eof = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+
+        def decode():
+            """Decodes the JSON value at the current position, reading more of the file as needed."""
+            nonlocal buffer, position, eof
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, position)
+                    # A number ending with the buffer may go on in the next chunk
+                    if end < len(buffer) or eof:
+                        position = end
+                        return value
+                except ValueError:
+                    if eof:
+                        raise ValueError(f"Truncated or invalid JSON in '{path}'") from None
+                chunk = f.read(READ_CHUNK_SIZE)
+                eof = not chunk
+                buffer, position = buffer[position:] + chunk, 0
+
+        root = peek()
+        if root == "{":
+            position += 1
+            while peek(" \t\r\n,") == '"':
+                key = decode()
+                if peek() != ":":
+                    raise ValueError(f"Invalid JSON object in '{path}'")
+                position += 1
+                if peek() == "[" and key in ARRAY_KEYS:
+                    break
+                decode() # Not the record array; skip the value
+            else:
+                raise ValueError(f"JSON object in '{path}' has no {' or '.join(map(repr, ARRAY_KEYS))} array")
+        elif root != "[":
+            raise ValueError(f"'{path}' is neither a JSON array nor an object holding one")
+        position += 1
+        while (char := peek(" \t\r\n,")) != "]":
+            if not char:
+                raise ValueError(f"Truncated JSON array in '{path}'")
+            yield decode()
+
+def iter_records(path: str, file_format: str | None = None):
+    """Streams the records of a dataset file as dicts, in constant memory.
+
+    Args:
+        path: The dataset file.
+        file_format: One of FORMATS; detected from the extension if None.
+    """
+    file_format = file_format or detect_format(path)
+    if file_format == "csv":
+        return _iter_csv(path)
+    if file_format == "jsonl":
+        return _iter_jsonl(path)
+    if file_format == "json":
+        return (item for item in _iter_json_array(path) if isinstance(item, dict))
+    raise ValueError(f"Unknown dataset format '{file_format}' (expected one of {', '.join(FORMATS)})")
+
+def iter_rows(path: str, file_format: str | None = None):
+    """Streams (title, score, anime_type, mal_id) rows from a dataset file (see record_to_rows())."""
+    for record in iter_records(path, file_format):
+        yield from record_to_rows(record)
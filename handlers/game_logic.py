@@ -1,12 +1,13 @@
 # game_logic.py - Contains the core game playing logic
 
-from selenium.webdriver.remote.webdriver import WebDriver
-from selenium.webdriver.remote.webelement import WebElement
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Callable, NamedTuple
 import time # Import time for delays if needed later
+from handlers import tracing
+
+if TYPE_CHECKING:
+    from handlers.page_driver import PageDriver
 
 # XPaths provided by user (Note: Absolute XPaths can be brittle)
 PLAY_BUTTON_XPATH = '//*[@id="start-game-anime-all"]'
@@ -19,100 +20,219 @@ RIGHT_CHOICE_XPATH = "/html/body/section[2]/div[2]/button[1]"
 SCORE_DISPLAY_XPATH = "/html/body/section[2]/div[4]" # Contains "Score: X High score: Y"
 
 WAIT_TIMEOUT = 10 # Increased timeout for better reliability
+PLAY_POLL_INTERVAL = 0.05 # Seconds between checks for the play button
 
-def _find_element(driver: WebDriver, by: str, value: str) -> WebElement | None:
-    """Helper function to find an element with explicit wait."""
-    try:
-        element = WebDriverWait(driver, WAIT_TIMEOUT).until(
-            EC.presence_of_element_located((by, value))
-        )
-        # Optional: Add wait for visibility/interactability if needed
-        # element = WebDriverWait(driver, WAIT_TIMEOUT).until(
-        #    EC.element_to_be_clickable((by, value))
-        #)
-        return element
-    except TimeoutException:
-        print(f"Error: Element not found or timed out ({by}={value})")
-        return None
-    except Exception as e:
-        print(f"Error finding element ({by}={value}): {e}")
-        return None
+# Transition-wait settings: instead of sleeping a fixed delay after each choice,
+# poll the page until the next round (or the game over screen) is actually shown.
+TRANSITION_TIMEOUT = 8 # Upper bound in seconds for a single round transition
+TRANSITION_POLL_INTERVAL = 0.1 # Seconds between page checks while waiting
+GAME_OVER_TIMEOUT = 1.0 # Play button visible this long over a stale round means game over
+ERROR_TIMEOUT = 3.0 # Page unreadable (or blank) this long in a row means something broke
 
-def click_play_button(driver: WebDriver):
-    """Clicks the initial play button to start the game."""
-    print("Attempting to click the play button...")
-    play_button = _find_element(driver, By.XPATH, PLAY_BUTTON_XPATH)
-    if play_button:
-        try:
-            play_button.click()
-            print("Play button clicked.")
-            # Add a small delay for the game state to update after clicking play
-            WebDriverWait(driver, WAIT_TIMEOUT).until(
-                EC.presence_of_element_located((By.XPATH, LEFT_TITLE_XPATH))
-            )
-            print("Game elements loaded after play.")
-        except Exception as e:
-            print(f"Error clicking play button: {e}")
-    else:
-        print("Play button not found.")
+# Possible outcomes of wait_for_next_state()
+ROUND_READY = "round_ready"
+GAME_OVER = "game_over"
+ERROR = "error"
+TIMED_OUT = "timeout"
+
+# Reads every piece of round state in a single WebDriver round trip.
+# Text is read with innerText and whitespace-collapsed so it matches WebElement.text;
+# like .text, elements that are not rendered (e.g. display: none) read as empty.
+# The play button only counts when it is rendered and enabled, as in CLICK_PLAY_SCRIPT.
+READ_STATE_SCRIPT = """
+const find = (xpath) => document.evaluate(xpath, document, null,
+    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+const rendered = (node) => node !== null && node.getClientRects().length > 0;
+const read = (xpath) => {
+    const node = find(xpath);
+    if (!rendered(node)) return null;
+    return node.innerText.replace(/\\s+/g, " ").trim();
+};
+const button = find(arguments[5]);
+return [
+    read(arguments[0]), read(arguments[1]), read(arguments[2]),
+    read(arguments[3]), read(arguments[4]), rendered(button) && !button.disabled
+];
+"""
+
+# Clicks the play button if it is rendered and enabled; returns whether it was clicked
+CLICK_PLAY_SCRIPT = """
+const button = document.evaluate(arguments[0], document, null,
+    XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+if (!button || button.disabled || button.getClientRects().length === 0) return false;
+button.click();
+return true;
+"""
 
 
-def get_anime_titles(driver: WebDriver) -> tuple[str | None, str | None, str | None, str | None]:
-    """Gets the text of the left/right anime titles and their types (e.g., TV, Movie)."""
-    left_title_element = _find_element(driver, By.XPATH, LEFT_TITLE_XPATH)
-    right_title_element = _find_element(driver, By.XPATH, RIGHT_TITLE_XPATH)
-    left_type_element = _find_element(driver, By.XPATH, LEFT_TYPE_XPATH)
-    right_type_element = _find_element(driver, By.XPATH, RIGHT_TYPE_XPATH)
+class GameState(NamedTuple):
+    """Snapshot of the visible game state, as returned by read_state()."""
+    left_title: str | None
+    left_type: str | None
+    right_title: str | None
+    right_type: str | None
+    score: int | None
+    play_button_present: bool
 
-    left_title = left_title_element.text.strip() if left_title_element else None
-    right_title = right_title_element.text.strip() if right_title_element else None
-    left_type = left_type_element.text.strip().upper() if left_type_element and left_type_element.text else None
-    right_type = right_type_element.text.strip().upper() if right_type_element and right_type_element.text else None
+    @property
+    def has_titles(self) -> bool:
+        """True when both anime titles are on screen."""
+        return bool(self.left_title and self.right_title)
 
-    if not left_title or not right_title:
-        print(f"Warning: Could not retrieve one or both titles (Left: {left_title}, Right: {right_title})")
-    if not left_type or not right_type:
-        print(f"Warning: Could not retrieve one or both types (Left Type: {left_type}, Right Type: {right_type})")
 
-    return left_title, left_type, right_title, right_type
+def click_play_button(driver: PageDriver, timeout: float = WAIT_TIMEOUT) -> bool:
+    """Clicks the play button the moment it is ready, polling every PLAY_POLL_INTERVAL seconds.
 
-def get_current_score(driver: WebDriver) -> int | None:
-    """Gets the current score from the score display element."""
-    score_element = _find_element(driver, By.XPATH, SCORE_DISPLAY_XPATH)
-    if score_element:
+    Check and click happen in one script call, so there is no fixed page-load sleep
+    and no separate find/click round trip. Waiting for the first round is left to
+    wait_for_next_state().
+
+    Returns:
+        True if the button was clicked within `timeout` seconds.
+    """
+    print("Attempting to click the play button...")
+    deadline = time.monotonic() + timeout
+    while True:
         try:
-            # Example text: "Score: 5 High score: 14"
-            # We need to parse out the current score.
-            score_text = score_element.text
-            score_part = score_text.split("High score:")[0] # Get the "Score: X" part
-            score_value = int(score_part.replace("Score:", "").strip())
-            return score_value
-        except (ValueError, IndexError, AttributeError) as e:
-            print(f"Error parsing score from text '{score_element.text}': {e}")
-            return None
+            with tracing.span("dom.click_play"):
+                clicked = driver.execute_script(CLICK_PLAY_SCRIPT, PLAY_BUTTON_XPATH)
         except Exception as e:
-            print(f"Unexpected error getting score: {e}")
-            return None
-    else:
-        print("Score display element not found.")
-        return None
+            print(f"Error clicking play button: {e}")
+            clicked = False
+        if clicked:
+            print("Play button clicked.")
+            return True
+        if time.monotonic() >= deadline:
+            print("Play button not found.")
+            return False
+        driver.wait_for_dom_change(PLAY_POLL_INTERVAL)
+
 
-def make_choice(driver: WebDriver, choice: str):
+def make_choice(driver: PageDriver, choice: str):
     """Clicks the button corresponding to the chosen anime ('left' or 'right')."""
     xpath = LEFT_CHOICE_XPATH if choice == "left" else RIGHT_CHOICE_XPATH
-    button_element = _find_element(driver, By.XPATH, xpath)
+    try:
+        print(f"Clicking {choice} choice.")
+        with tracing.span("dom.click"):
+            clicked = driver.click_xpath(xpath, WAIT_TIMEOUT)
+        if not clicked:
+            print(f"{choice.capitalize()} choice button not found.")
+    except Exception as e:
+        print(f"Error clicking {choice} choice ({xpath}): {e}")
+
+def _parse_score_text(score_text: str | None) -> int | None:
+    """Parses the current score out of text like "Score: 5 High score: 14"."""
+    if not score_text:
+        return None
+    try:
+        score_part = score_text.split("High score:")[0] # Get the "Score: X" part
+        return int(score_part.replace("Score:", "").strip())
+    except (ValueError, IndexError):
+        return None
+
+def read_state(driver: PageDriver) -> GameState:
+    """Reads both titles, both types, the score and the play button in one execute_script call.
 
-    if button_element:
+    Raises:
+        WebDriverException: If the script could not be run (e.g. the browser is gone).
+    """
+    with tracing.span("dom.read_state"):
+        left_title, left_type, right_title, right_type, score_text, play_present = driver.execute_script(
+            READ_STATE_SCRIPT,
+            LEFT_TITLE_XPATH, LEFT_TYPE_XPATH, RIGHT_TITLE_XPATH, RIGHT_TYPE_XPATH,
+            SCORE_DISPLAY_XPATH, PLAY_BUTTON_XPATH,
+        )
+    return GameState(
+        left_title=left_title or None,
+        left_type=left_type.upper() if left_type else None,
+        right_title=right_title or None,
+        right_type=right_type.upper() if right_type else None,
+        score=_parse_score_text(score_text),
+        play_button_present=bool(play_present),
+    )
+
+def wait_for_next_state(driver: PageDriver, previous_title: str | None, previous_score: int | None,
+                        timeout: float | None = None,
+                        on_state: Callable[[GameState], None] | None = None,
+                        poll_interval: float | None = None) -> tuple[str, GameState | None, float]:
+    """Polls the page once per interval until the next round, the game over screen or an error shows up.
+
+    All three conditions are checked together on every read_state() snapshot, so
+    whichever happens first is returned without waiting out the others:
+      * ROUND_READY: both titles are shown and the right-hand title differs from
+        ``previous_title`` (or the score went up past ``previous_score``).
+      * GAME_OVER: the play button is back. Returned at once if the titles are gone,
+        or after GAME_OVER_TIMEOUT if the old round is still rendered behind it.
+      * ERROR: the page could not be read, or shows neither titles nor the play
+        button, for ERROR_TIMEOUT seconds in a row.
+      * TIMED_OUT: nothing conclusive happened within ``timeout``.
+
+    Args:
+        driver: The PageDriver (either backend).
+        previous_title: The right-hand title shown when the choice was made (None before round 1).
+        previous_score: The score shown when the choice was made, if known.
+        timeout: Upper bound in seconds; defaults to TRANSITION_TIMEOUT.
+        on_state: Optional callback invoked with each snapshot that shows a right-hand
+            title not seen before during this wait (e.g. to start score lookups early).
+        poll_interval: Seconds between page checks; defaults to TRANSITION_POLL_INTERVAL.
+
+    Returns:
+        A tuple of (outcome, last_state, elapsed_seconds). last_state is the most recent
+        successful snapshot (None if none succeeded).
+    """
+    limit = TRANSITION_TIMEOUT if timeout is None else timeout
+    interval = TRANSITION_POLL_INTERVAL if poll_interval is None else poll_interval
+    start = time.monotonic()
+    outcome = TIMED_OUT
+    state = None
+    play_button_since = None # When the play button was first seen next to a stale round
+    bad_page_since = None # When reads started failing / the page went blank
+    notified_title = None # Right-hand title last passed to on_state
+
+    while True:
+        now = time.monotonic()
         try:
-            print(f"Clicking {choice} choice.")
-            # Scroll into view if necessary, although clicking often handles this
-            # driver.execute_script("arguments[0].scrollIntoView(true);", button_element)
-            # time.sleep(0.2) # Small delay before click if needed
-            button_element.click()
+            state = read_state(driver)
+            read_ok = True
         except Exception as e:
-            print(f"Error clicking {choice} choice ({xpath}): {e}")
-    else:
-        print(f"{choice.capitalize()} choice button not found.")
+            # The page can be mid re-render while we read it; poll again until ERROR_TIMEOUT.
+            print(f"Transient error while waiting for next round: {e}")
+            read_ok = False
+
+        if read_ok and state.has_titles:
+            bad_page_since = None
+            if on_state and state.right_title != notified_title:
+                notified_title = state.right_title
+                on_state(state)
+            title_changed = state.right_title != previous_title
+            score_went_up = (state.score is not None and previous_score is not None
+                             and state.score > previous_score)
+            if title_changed or score_went_up:
+                outcome = ROUND_READY
+                break
+            if state.play_button_present:
+                play_button_since = play_button_since or now
+                if now - play_button_since >= GAME_OVER_TIMEOUT:
+                    outcome = GAME_OVER
+                    break
+            else:
+                play_button_since = None
+        elif read_ok and state.play_button_present:
+            outcome = GAME_OVER
+            break
+        else:
+            bad_page_since = bad_page_since or now
+            if now - bad_page_since >= ERROR_TIMEOUT:
+                outcome = ERROR
+                break
+
+        if now - start >= limit:
+            break
+        # Returns early when the backend sees the DOM change (CDP); otherwise a plain poll interval
+        driver.wait_for_dom_change(interval)
 
-# TODO: Implement game state reading, decision making, and action execution
-pass 
\ No newline at end of file
+    elapsed = time.monotonic() - start
+    tracing.count(f"transition.{outcome}")
+    if outcome == TIMED_OUT:
+        print(f"Warning: Next round not detected within {limit} seconds.")
+    return outcome, state, elapsed
@@ -0,0 +1,162 @@
+# history_store.py - Records every session (game) and round in SQLite for later analysis
+
+import os
+import sqlite3
+import threading
+import time
+
+from handlers import database_handler
+
+HISTORY_PATH = os.path.join(database_handler.DATABASE_DIR, "history.db")
+SESSIONS_TABLE = "sessions"
+ROUNDS_TABLE = "rounds"
+BATCH_SIZE = 50 # Round rows buffered before they are written in one transaction
+BUSY_TIMEOUT = database_handler.BUSY_TIMEOUT
+
+# Round outcomes
+OUTCOME_CORRECT = "correct" # The next round appeared
+OUTCOME_WRONG = "wrong" # The game over screen appeared after the choice
+OUTCOME_UNRESOLVED = "unresolved" # A score could not be found, so no choice was made
+OUTCOME_ERROR = "error" # The page could not be read / never advanced after the choice
+
+INSERT_ROUND_SQL = f"""
+    INSERT OR REPLACE INTO {ROUNDS_TABLE} (
+        session_id, round_no, played_at, left_title, left_type, left_score,
+        right_title, right_type, right_score, choice, outcome,
+        resolve_ms, choice_ms, transition_ms, round_ms
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_conn: sqlite3.Connection | None = None
+_pending_rounds: list[tuple] = []
+_lock = threading.Lock()
+
+def _get_connection() -> sqlite3.Connection:
+    global _conn
+    if _conn is None:
+        directory = os.path.dirname(HISTORY_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        _conn = sqlite3.connect(HISTORY_PATH, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        _conn.execute("PRAGMA journal_mode=WAL")
+        _conn.execute("PRAGMA synchronous=NORMAL")
+    return _conn
+
+def setup_history():
+    """Creates the history database and its tables if they don't exist."""
+    try:
+        conn = _get_connection()
+        with _lock, conn:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {SESSIONS_TABLE} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    started_at REAL NOT NULL,
+                    ended_at REAL,
+                    rounds INTEGER,
+                    high_score INTEGER,
+                    duration_s REAL,
+                    worker_id INTEGER,
+                    error TEXT
+                )
+            """)
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {ROUNDS_TABLE} (
+                    session_id INTEGER NOT NULL REFERENCES {SESSIONS_TABLE}(id),
+                    round_no INTEGER NOT NULL,
+                    played_at REAL NOT NULL,
+                    left_title TEXT,
+                    left_type TEXT,
+                    left_score REAL,
+                    right_title TEXT,
+                    right_type TEXT,
+                    right_score REAL,
+                    choice TEXT,
+                    outcome TEXT NOT NULL,
+                    resolve_ms REAL,
+                    choice_ms REAL,
+                    transition_ms REAL,
+                    round_ms REAL,
+                    PRIMARY KEY (session_id, round_no)
+                )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_sessions_started ON {SESSIONS_TABLE}(started_at)")
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_rounds_outcome ON {ROUNDS_TABLE}(outcome)")
+    except sqlite3.Error as e:
+        print(f"History database error during setup: {e}")
+
+def start_session(worker_id: int | None = None) -> int | None:
+    """Creates a session row for a new game and returns its id (None if it could not be created)."""
+    try:
+        conn = _get_connection()
+        with _lock, conn:
+            cursor = conn.execute(
+                f"INSERT INTO {SESSIONS_TABLE} (started_at, worker_id) VALUES (?, ?)",
+                (time.time(), worker_id),
+            )
+            return cursor.lastrowid
+    except sqlite3.Error as e:
+        print(f"History database error starting session: {e}")
+        return None
+
+def record_round(session_id: int | None, round_no: int, left_title: str | None, left_type: str | None,
+                 left_score: float | None, right_title: str | None, right_type: str | None,
+                 right_score: float | None, choice: str | None, outcome: str,
+                 resolve_ms: float | None = None, choice_ms: float | None = None,
+                 transition_ms: float | None = None, round_ms: float | None = None):
+    """Buffers one round; rows are written BATCH_SIZE at a time and when the session ends."""
+    if session_id is None:
+        return
+    row = (session_id, round_no, time.time(), left_title, left_type, left_score,
+           right_title, right_type, right_score, choice, outcome,
+           resolve_ms, choice_ms, transition_ms, round_ms)
+    with _lock:
+        _pending_rounds.append(row)
+        if len(_pending_rounds) >= BATCH_SIZE:
+            _flush_locked()
+
+def _flush_locked():
+    if not _pending_rounds:
+        return
+    try:
+        conn = _get_connection()
+        with conn:
+            conn.executemany(INSERT_ROUND_SQL, _pending_rounds)
+    except sqlite3.Error as e:
+        print(f"History database error saving {len(_pending_rounds)} rounds: {e}")
+    _pending_rounds.clear()
+
+def flush():
+    """Writes all buffered rounds."""
+    with _lock:
+        _flush_locked()
+
+def end_session(session_id: int | None, rounds: int, high_score: int, duration_s: float,
+                error: str | None = None):
+    """Writes the session's buffered rounds and its summary."""
+    if session_id is None:
+        return
+    with _lock:
+        _flush_locked()
+        try:
+            conn = _get_connection()
+            with conn:
+                conn.execute(
+                    f"UPDATE {SESSIONS_TABLE} SET ended_at = ?, rounds = ?, high_score = ?, "
+                    "duration_s = ?, error = ? WHERE id = ?",
+                    (time.time(), rounds, high_score, duration_s, error, session_id),
+                )
+        except sqlite3.Error as e:
+            print(f"History database error ending session {session_id}: {e}")
+
+def close():
+    """Flushes pending rounds and closes the history database."""
+    global _conn
+    with _lock:
+        _flush_locked()
+        if _conn is not None:
+            _conn.close()
+            _conn = None
+
+def query(sql: str, params: tuple = ()) -> list[tuple]:
+    """Runs a read-only query against the history database (used by history.py)."""
+    return _get_connection().execute(sql, params).fetchall()
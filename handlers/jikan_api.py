@@ -1,25 +1,274 @@
 # jikan_api.py - Handles interaction with the Jikan API
 
-import requests
 import time
 import json # Added for parsing JSON response
-from thefuzz import process, fuzz # Import for fuzzy matching
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+from rapidfuzz import fuzz
+from handlers import matching, tracing
+from handlers.matching import normalize_title
+from handlers.lazy_import import lazy_import
+
+requests = lazy_import("requests") # Loaded on the first API call (or by warm_session())
 
 JIKAN_API_BASE_URL = "https://api.jikan.moe/v4"
 # Jikan API limits: 3 requests/second, 60 requests/minute
-REQUEST_DELAY = 0.5 # Seconds to wait between requests
+RATE_LIMITS = ((3, 1.0), (60, 60.0)) # (max requests, window in seconds)
+REQUEST_TIMEOUT = 10 # Seconds before an HTTP request is abandoned
+MAX_RETRIES = 3 # Retries after an HTTP 429 before giving up
+MAX_BACKOFF = 30 # Upper bound in seconds for a single 429 backoff
+CONNECTION_POOL_SIZE = 8 # Keep-alive connections kept open to the API
 SEARCH_LIMIT = 10 # Number of search results to fetch from API
 SIMILARITY_THRESHOLD = 75 # Minimum similarity score (0-100) to consider a match
 
-# TODO: Implement function to search anime and get score
-# TODO: Add error handling and respect rate limits
+# Reasons search_anime_score() gives when no score could be found
+MISS_NO_RESULTS = "no_results" # The search returned nothing usable
+MISS_BELOW_THRESHOLD = "below_threshold" # No result was similar enough to the title
+MISS_REQUEST_ERROR = "request_error" # Network / HTTP / JSON error (transient)
+MISS_TIMEOUT = "timeout" # The caller's deadline passed first (transient, see jikan_async)
+MISS_CANCELLED = "cancelled" # The lookup was cancelled, e.g. its game ended (see jikan_async.CancelScope)
+TRANSIENT_MISSES = (MISS_REQUEST_ERROR, MISS_TIMEOUT, MISS_CANCELLED) # Worth retrying, so never cached as misses
+
+class RateLimiter:
+    """Sliding-window rate limiter enforcing several (count, window) limits at once.
+
+    Requests go out immediately while every window has budget left; a caller only
+    sleeps for as long as the tightest window needs. block_for() pauses everyone,
+    e.g. after the server answered 429.
+    """
+
+    def __init__(self, limits: tuple[tuple[int, float], ...] = RATE_LIMITS, lock=None):
+        """
+        Args:
+            limits: (max requests, window in seconds) pairs.
+            lock: Lock guarding the state (defaults to a threading.Lock).
+        """
+        self.limits = limits
+        self._lock = lock if lock is not None else threading.Lock()
+        self._history = deque(maxlen=max(count for count, _ in limits)) # Recent request times
+        self._blocked_until = 0.0
+
+    def _request_time(self, back: int) -> float:
+        """Time of the request `back` places before the next one (-inf if there was none). Caller holds the lock."""
+        return self._history[-back] if len(self._history) >= back else float("-inf")
+
+    def _record(self, now: float):
+        """Remembers a request made at `now`. Caller holds the lock."""
+        self._history.append(now)
+
+    def _delay_needed(self, now: float) -> float:
+        """Seconds until a request is allowed under every limit (0 if allowed now). Caller holds the lock."""
+        delay = self._blocked_until - now
+        for count, window in self.limits:
+            # The request `count` places back must have left the window
+            delay = max(delay, self._request_time(count) + window - now)
+        return max(delay, 0.0)
+
+    def reserve(self) -> float:
+        """Claims a request slot if one is free right now.
+
+        Returns:
+            0 if the slot was claimed, otherwise the number of seconds to wait before trying again.
+        """
+        with self._lock:
+            now = time.monotonic()
+            delay = self._delay_needed(now)
+            if delay <= 0:
+                self._record(now)
+            return delay
+
+    def acquire(self):
+        """Blocks until a request is allowed, then claims the slot."""
+        while True:
+            delay = self.reserve()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def block_for(self, seconds: float):
+        """Stops all requests for the given number of seconds."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+class SharedRateLimiter(RateLimiter):
+    """RateLimiter whose state lives in shared memory, so several processes share one budget.
+
+    Create it in the parent process and pass it to each worker process as a
+    multiprocessing argument; the workers then assign it to jikan_api.rate_limiter.
+    """
+
+    def __init__(self, limits: tuple[tuple[int, float], ...] = RATE_LIMITS, context=None):
+        """
+        Args:
+            limits: (max requests, window in seconds) pairs, as for RateLimiter.
+            context: multiprocessing context used to allocate the shared state
+                (defaults to the multiprocessing module itself).
+        """
+        if context is None:
+            import multiprocessing as context
+        self._size = max(count for count, _ in limits)
+        # Layout: [blocked_until, next slot, request time * _size] (a ring of recent request times)
+        self._state = context.RawArray("d", [0.0, 0.0] + [float("-inf")] * self._size)
+        super().__init__(limits, context.Lock())
+        self._history = None # Kept in _state instead
+
+    @property
+    def _blocked_until(self) -> float:
+        return self._state[0]
+
+    @_blocked_until.setter
+    def _blocked_until(self, value: float):
+        self._state[0] = value
+
+    def _request_time(self, back: int) -> float:
+        return self._state[2 + (int(self._state[1]) - back) % self._size]
+
+    def _record(self, now: float):
+        next_slot = int(self._state[1])
+        self._state[2 + next_slot] = now
+        self._state[1] = (next_slot + 1) % self._size
+
+# Shared by every caller in this process (replaced by a SharedRateLimiter in supervisor workers)
+rate_limiter = RateLimiter()
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> "requests.Session":
+    """Returns the shared keep-alive HTTP session, creating it on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=CONNECTION_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({"Accept": "application/json"})
+            _session = session
+        return _session
+
+def warm_session():
+    """Imports requests and builds the keep-alive session ahead of the first API call (e.g. during startup)."""
+    get_session()
+
+def _retry_after_seconds(response: "requests.Response", attempt: int) -> float:
+    """Works out how long to back off after a 429, from Retry-After or exponentially."""
+    header = response.headers.get("Retry-After")
+    delay = None
+    if header:
+        try:
+            delay = float(header)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(header).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = None
+    if delay is None:
+        delay = 2 ** attempt # 1s, 2s, 4s, ...
+    return min(max(delay, 0.0), MAX_BACKOFF)
+
+def get_json(path: str, params: dict | None = None) -> dict:
+    """Performs a rate-limited GET against the Jikan API and returns the decoded JSON.
+
+    Honours HTTP 429 (and its Retry-After header) with up to MAX_RETRIES bounded backoffs.
+
+    Args:
+        path: API path below JIKAN_API_BASE_URL, e.g. "/anime".
+        params: Query string parameters.
+
+    Raises:
+        requests.exceptions.RequestException: On network errors or a non-2xx final response.
+        json.JSONDecodeError: If the response body is not valid JSON.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        with tracing.span("api.rate_wait"):
+            rate_limiter.acquire()
+        response = send_request(path, params)
+        if not back_off_if_limited(response, attempt):
+            break
+    response.raise_for_status()
+    return response.json()
+
+def send_request(path: str, params: dict | None = None) -> "requests.Response":
+    """Sends one GET on the shared session, without rate limiting or retries (see get_json())."""
+    with tracing.span("api.request", path=path):
+        response = get_session().get(f"{JIKAN_API_BASE_URL}{path}", params=params, timeout=REQUEST_TIMEOUT)
+    tracing.count("api.calls")
+    if response.status_code == 429:
+        tracing.count("api.429")
+    return response
+
+def back_off_if_limited(response: "requests.Response", attempt: int) -> bool:
+    """After an HTTP 429 with retries left, pauses the shared rate limiter as the server asked.
+
+    Returns:
+        True if the request should be retried.
+    """
+    if response.status_code != 429 or attempt == MAX_RETRIES:
+        return False
+    delay = _retry_after_seconds(response, attempt)
+    print(f"Jikan API: Rate limited (429), backing off {delay:.1f}s...")
+    rate_limiter.block_for(delay)
+    return True
+
+def title_similarity(game_title: str, candidate_title: str) -> int:
+    """Similarity (0-100) between a game title and a candidate title, as used for matching."""
+    return round(fuzz.ratio(normalize_title(game_title), normalize_title(candidate_title)))
+
+def type_matches(candidate_type: str | None, expected_type: str | None) -> bool:
+    """Whether a candidate's type agrees with the type shown in the game (any type if none shown)."""
+    if not expected_type:
+        return True # No expected type, so any type is okay initially
+    return bool(candidate_type) and candidate_type.upper() == expected_type.upper()
+
+def _collect_candidates(title: str, expected_type: str | None, results: list[dict]) -> list[dict]:
+    """Scores API results against the game title and keeps those above SIMILARITY_THRESHOLD.
+
+    Each result is compared by its best name (title, English title or synonym), and all
+    names of all results are scored in one batched call.
+    """
+    usable = [result for result in results if result.get("title") and result.get("score") is not None]
+    names = [matching.entry_names(result) for result in usable]
+    matches = matching.best_name_matches(title, names, SIMILARITY_THRESHOLD)
+
+    candidates = []
+    for index, (similarity, matched_name) in sorted(matches.items()): # Keep the API's ranking for ties
+        result = usable[index]
+        api_type = result.get("type") # e.g., "TV", "Movie", "OVA"
+        candidates.append({
+            "score": float(result["score"]),
+            "similarity": similarity,
+            "type_match": type_matches(api_type, expected_type),
+            "api_title": result["title"],
+            "api_type": api_type,
+            "matched_name": matched_name,
+            "mal_id": result.get("mal_id"),
+            "names": names[index],
+        })
+    return candidates
+
+def get_anime_by_id(mal_id: int) -> dict | None:
+    """Fetches one anime entry by its MAL ID (exact, and cheaper than a search).
+
+    Returns:
+        The entry dict ("mal_id", "title", "score", "type", ...), or None if MAL has no such entry.
+
+    Raises:
+        requests.exceptions.RequestException: On network errors or other non-2xx responses.
+        json.JSONDecodeError: If the response body is not valid JSON.
+    """
+    try:
+        data = get_json(f"/anime/{mal_id}")
+    except requests.exceptions.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return None
+        raise
+    return data.get("data") or None
 
 def get_anime_score(title: str, expected_type: str | None = None) -> float | None:
     """Fetches the score for a given anime title from the Jikan API.
 
-    Searches for the title, fetches multiple results, and selects the best match
-    based on title similarity and optionally, the expected anime type (TV, Movie, etc.).
-
     Args:
         title: The anime title to search for (from the game).
         expected_type: The expected type (e.g., "TV", "MOVIE") from the game, if available.
@@ -27,84 +276,71 @@ def get_anime_score(title: str, expected_type: str | None = None) -> float | Non
     Returns:
         The score as a float if a suitable match is found, otherwise None.
     """
-    search_url = f"{JIKAN_API_BASE_URL}/anime"
-    params = {"q": title, "limit": SEARCH_LIMIT} # Fetch multiple results
+    match, _ = search_anime_score(title, expected_type)
+    return match["score"] if match else None
 
-    print(f"Jikan API: Searching for '{title}' (Expected type: {expected_type or 'Any'})...")
+def search_params(title: str) -> dict:
+    """Query parameters of the title search (several results, so the best one can be picked)."""
+    return {"q": title, "limit": SEARCH_LIMIT}
 
-    try:
-        time.sleep(REQUEST_DELAY)
-        response = requests.get(search_url, params=params)
-        response.raise_for_status()
-        data = response.json()
+def pick_best_match(title: str, expected_type: str | None, data: dict) -> tuple[dict | None, str | None]:
+    """Picks the best candidate for a game title from a search response (see search_anime_score())."""
+    if not data or not data.get("data"):
+        print(f"Jikan API: No results found for title '{title}'.")
+        return None, MISS_NO_RESULTS
 
-        if not data or not data.get("data"):
-            print(f"Jikan API: No results found for title '{title}'.")
-            return None
+    results = data["data"]
+    print(f"Jikan API: Received {len(results)} results for '{title}'.")
 
-        results = data["data"]
-        print(f"Jikan API: Received {len(results)} results for '{title}'.")
-
-        candidates = []
-        for result in results:
-            api_title = result.get("title")
-            api_score = result.get("score")
-            api_type = result.get("type") # e.g., "TV", "Movie", "OVA"
-
-            if not api_title or api_score is None:
-                continue # Skip results without a title or score
-
-            # Calculate title similarity
-            similarity = fuzz.ratio(title.lower(), api_title.lower())
-
-            # Basic type matching (convert game type if needed, API types are usually uppercase)
-            type_match = False
-            if expected_type:
-                if api_type and api_type.upper() == expected_type.upper():
-                    type_match = True
-            else:
-                type_match = True # No expected type, so any type is okay initially
-
-            # Store candidate info: (api_score, similarity, type_match_bonus, api_title)
-            # We'll use this tuple for sorting later.
-            # Add a bonus score for matching type to prioritize them.
-            type_bonus = 100 if type_match else 0 # Add significant bonus for type match
-
-            if similarity >= SIMILARITY_THRESHOLD:
-                candidates.append({
-                    "score": float(api_score),
-                    "similarity": similarity,
-                    "type_match": type_match,
-                    "api_title": api_title,
-                    "api_type": api_type
-                })
-                # print(f"  - Candidate: '{api_title}' (Type: {api_type}, Score: {api_score}, Sim: {similarity}, TypeMatch: {type_match})")
-
-
-        if not candidates:
-            print(f"Jikan API: No results for '{title}' met the similarity threshold ({SIMILARITY_THRESHOLD}).")
-            return None
+    with tracing.span("api.fuzzy_scoring", candidates=len(results)):
+        candidates = _collect_candidates(title, expected_type, results)
+
+    if not candidates:
+        print(f"Jikan API: No results for '{title}' met the similarity threshold ({SIMILARITY_THRESHOLD}).")
+        return None, MISS_BELOW_THRESHOLD
+
+    # Sort candidates: Prioritize type match, then highest similarity
+    # If types match, higher similarity is better.
+    # If types don't match, we still consider them but rank them lower.
+    candidates.sort(key=lambda x: (x["type_match"], x["similarity"]), reverse=True)
 
-        # Sort candidates: Prioritize type match, then highest similarity
-        # If types match, higher similarity is better.
-        # If types don't match, we still consider them but rank them lower.
-        candidates.sort(key=lambda x: (x["type_match"], x["similarity"]), reverse=True)
+    best_match = candidates[0]
 
-        best_match = candidates[0]
+    print(f"Jikan API: Best match for '{title}' (Expected: {expected_type or 'Any'}) -> '{best_match['api_title']}' (Type: {best_match['api_type']}, Score: {best_match['score']}, Similarity: {best_match['similarity']}, Matched: '{best_match['matched_name']}')")
+    return best_match, None
 
-        print(f"Jikan API: Best match for '{title}' (Expected: {expected_type or 'Any'}) -> '{best_match['api_title']}' (Type: {best_match['api_type']}, Score: {best_match['score']}, Similarity: {best_match['similarity']})")
-        return best_match["score"]
+def search_anime_score(title: str, expected_type: str | None = None) -> tuple[dict | None, str | None]:
+    """Fetches the score for a given anime title from the Jikan API, explaining any failure.
 
+    Searches for the title, fetches multiple results, and selects the best match
+    based on title similarity and optionally, the expected anime type (TV, Movie, etc.).
+
+    Args:
+        title: The anime title to search for (from the game).
+        expected_type: The expected type (e.g., "TV", "MOVIE") from the game, if available.
+
+    Returns:
+        A tuple of (match, miss_reason). On success match is the best candidate, a dict with
+        "score", "similarity", "type_match", "api_title", "api_type", "matched_name" (the
+        title, English title or synonym that matched), "mal_id" (the entry's MAL ID) and
+        "names" (all names of the entry), and miss_reason is None; otherwise match is None
+        and miss_reason is one of the MISS_* constants.
+    """
+    print(f"Jikan API: Searching for '{title}' (Expected type: {expected_type or 'Any'})...")
+
+    try:
+        data = get_json("/anime", search_params(title))
+        return pick_best_match(title, expected_type, data)
 
     except requests.exceptions.RequestException as e:
         print(f"Jikan API: Error during request for '{title}': {e}")
-        return None
+        return None, MISS_REQUEST_ERROR
     except json.JSONDecodeError:
         print(f"Jikan API: Error decoding JSON response for '{title}'.")
-        return None
+        return None, MISS_REQUEST_ERROR
     except Exception as e:
         print(f"Jikan API: An unexpected error occurred for '{title}': {e}")
-        return None
+        return None, MISS_REQUEST_ERROR
 
 # Example usage (for testing)
 if __name__ == '__main__':
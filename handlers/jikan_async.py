@@ -0,0 +1,261 @@
+# jikan_async.py - asyncio Jikan client with bounded concurrency, single-flight lookups and deadlines
+
+import asyncio
+import concurrent.futures
+import contextlib
+import json
+import threading
+
+from handlers import jikan_api, tracing
+from handlers.jikan_api import requests # Lazy; loaded with the session on the first request
+from handlers.matching import normalize_title
+
+MAX_CONCURRENCY = jikan_api.CONNECTION_POOL_SIZE # Requests in flight at once (one pooled connection each)
+DEFAULT_TIMEOUT = 30 # Seconds a lookup through the sync wrappers may take before it is abandoned
+
+class AsyncJikanClient:
+    """Jikan client for asyncio code, sharing jikan_api's session, rate limiter and matching.
+
+    Concurrent lookups of the same thing share one request (single-flight): searches
+    are keyed by normalized title, so "Naruto" and "NARUTO!" asked for at the same
+    time cost one call, and each caller still picks its own best match for its type.
+    At most max_concurrency requests are in flight, and each one first waits for a
+    slot under the shared rate limits, so the client never exceeds the API budget.
+
+    A caller that is cancelled or runs past its timeout stops waiting right away. The
+    shared request is only abandoned once nobody waits for it any more; a request
+    already on the wire is bounded by jikan_api.REQUEST_TIMEOUT.
+    """
+
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY):
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._in_flight: dict[tuple, list] = {} # key -> [task, number of waiters]
+
+    async def _acquire_rate_slot(self):
+        while (delay := jikan_api.rate_limiter.reserve()) > 0:
+            await asyncio.sleep(delay)
+
+    async def get_json(self, path: str, params: dict | None = None) -> dict:
+        """Async counterpart of jikan_api.get_json(), with the same 429 handling and errors."""
+        async with self._semaphore:
+            for attempt in range(jikan_api.MAX_RETRIES + 1):
+                with tracing.span("api.rate_wait"):
+                    await self._acquire_rate_slot()
+                response = await asyncio.to_thread(jikan_api.send_request, path, params)
+                if not jikan_api.back_off_if_limited(response, attempt):
+                    break
+        response.raise_for_status()
+        return response.json()
+
+    async def _single_flight(self, key: tuple, make_request):
+        """Awaits the in-flight request for `key`, starting it with make_request() if there is none."""
+        flight = self._in_flight.get(key)
+        if flight is None:
+            flight = [asyncio.ensure_future(make_request()), 0]
+            self._in_flight[key] = flight
+            flight[0].add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            tracing.count("api.coalesced")
+        flight[1] += 1
+        try:
+            # Shielded, so one caller giving up does not cancel the request for the others
+            return await asyncio.shield(flight[0])
+        finally:
+            flight[1] -= 1
+            if flight[1] == 0 and not flight[0].done():
+                flight[0].cancel()
+                self._forget(key, flight)
+
+    def _forget(self, key: tuple, flight: list):
+        # A later request for the same key may already have replaced this one
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+
+    async def search_anime_score(self, title: str, expected_type: str | None = None,
+                                 timeout: float | None = None) -> tuple[dict | None, str | None]:
+        """Async counterpart of jikan_api.search_anime_score().
+
+        Args:
+            title: The anime title to search for (from the game).
+            expected_type: The expected type (e.g., "TV", "MOVIE") from the game, if available.
+            timeout: Seconds to wait at most (None = no deadline).
+
+        Returns:
+            (match, miss_reason) as jikan_api.search_anime_score() does; miss_reason is
+            jikan_api.MISS_TIMEOUT if the deadline passed first.
+        """
+        key = ("search", normalize_title(title))
+        print(f"Jikan API: Searching for '{title}' (Expected type: {expected_type or 'Any'})...")
+        try:
+            data = await asyncio.wait_for(
+                self._single_flight(key, lambda: self.get_json("/anime", jikan_api.search_params(title))),
+                timeout,
+            )
+            return jikan_api.pick_best_match(title, expected_type, data)
+        except asyncio.TimeoutError:
+            print(f"Jikan API: Search for '{title}' timed out after {timeout}s.")
+            return None, jikan_api.MISS_TIMEOUT
+        except requests.exceptions.RequestException as e:
+            print(f"Jikan API: Error during request for '{title}': {e}")
+            return None, jikan_api.MISS_REQUEST_ERROR
+        except json.JSONDecodeError:
+            print(f"Jikan API: Error decoding JSON response for '{title}'.")
+            return None, jikan_api.MISS_REQUEST_ERROR
+        except Exception as e:
+            # Catch any other unexpected errors (cancellation is not an Exception and passes through)
+            print(f"Jikan API: An unexpected error occurred for '{title}': {e}")
+            return None, jikan_api.MISS_REQUEST_ERROR
+
+    async def get_anime_by_id(self, mal_id: int, timeout: float | None = None) -> dict | None:
+        """Async counterpart of jikan_api.get_anime_by_id() (concurrent calls for one ID share a request).
+
+        Raises:
+            asyncio.TimeoutError: If the deadline passes first.
+            requests.exceptions.RequestException, json.JSONDecodeError: As jikan_api.get_anime_by_id().
+        """
+        try:
+            data = await asyncio.wait_for(
+                self._single_flight(("anime", mal_id), lambda: self.get_json(f"/anime/{mal_id}")), timeout
+            )
+        except requests.exceptions.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+        return data.get("data") or None
+
+class CancelScope:
+    """A group of blocking lookups that can be cancelled together, e.g. the round lookups of one game.
+
+    Lookups made through the sync wrappers inside ``with cancel_scope(scope):`` join
+    the scope. cancel() cancels every one of them that is still running, including
+    requests already waiting on the shared loop: the caller gets
+    jikan_api.MISS_CANCELLED back (or concurrent.futures.CancelledError), and a
+    request shared with other callers keeps going for them. Lookups that join a
+    scope after it was cancelled are cancelled right away.
+    """
+
+    def __init__(self):
+        self._futures: set[concurrent.futures.Future] = set()
+        self._cancelled = False
+        self._lock = threading.Lock()
+
+    def _add(self, future: concurrent.futures.Future):
+        with self._lock:
+            if not self._cancelled:
+                self._futures.add(future)
+                return
+        future.cancel()
+
+    def _discard(self, future: concurrent.futures.Future):
+        with self._lock:
+            self._futures.discard(future)
+
+    def cancel(self) -> int:
+        """Cancels the scope's running lookups and returns how many there were."""
+        with self._lock:
+            self._cancelled = True
+            futures, self._futures = self._futures, set()
+        return sum(1 for future in futures if future.cancel())
+
+_local = threading.local()
+
+@contextlib.contextmanager
+def cancel_scope(scope: CancelScope):
+    """Makes lookups of the current thread join `scope` for the duration of the block."""
+    previous = getattr(_local, "scope", None)
+    _local.scope = scope
+    try:
+        yield scope
+    finally:
+        _local.scope = previous
+
+# Sync wrappers: one event loop on a daemon thread serves every thread of the process,
+# so lookups from the resolver, warm-up and refresh threads are coalesced together.
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_thread: threading.Thread | None = None
+_client: AsyncJikanClient | None = None
+_loop_lock = threading.Lock()
+
+def _get_loop() -> tuple[asyncio.AbstractEventLoop, AsyncJikanClient]:
+    global _loop, _loop_thread, _client
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=loop.run_forever, name="jikan-async", daemon=True)
+            _loop_thread.start()
+            _client = AsyncJikanClient()
+            _loop = loop
+        return _loop, _client
+
+def _run(make_coroutine, timeout: float | None):
+    """Runs make_coroutine(client) on the shared loop and waits for its result."""
+    loop, client = _get_loop()
+    future = asyncio.run_coroutine_threadsafe(make_coroutine(client), loop)
+    scope = getattr(_local, "scope", None)
+    if scope is not None:
+        scope._add(future) # Cancelling the future cancels the coroutine on the loop
+    try:
+        # The coroutine enforces its own deadline; this only guards against a stuck loop
+        return future.result(None if timeout is None else timeout + 1)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        raise
+    except BaseException:
+        future.cancel() # e.g. KeyboardInterrupt in the waiting thread
+        raise
+    finally:
+        if scope is not None:
+            scope._discard(future)
+
+def search_anime_score(title: str, expected_type: str | None = None,
+                       timeout: float | None = DEFAULT_TIMEOUT) -> tuple[dict | None, str | None]:
+    """Blocking jikan_api.search_anime_score() through the shared async client (see AsyncJikanClient).
+
+    Returns (None, jikan_api.MISS_CANCELLED) if the lookup's CancelScope is cancelled first.
+    """
+    try:
+        return _run(lambda client: client.search_anime_score(title, expected_type, timeout), timeout)
+    except concurrent.futures.TimeoutError:
+        return None, jikan_api.MISS_TIMEOUT
+    except concurrent.futures.CancelledError:
+        print(f"Jikan API: Search for '{title}' cancelled.")
+        return None, jikan_api.MISS_CANCELLED
+
+def get_anime_by_id(mal_id: int, timeout: float | None = DEFAULT_TIMEOUT) -> dict | None:
+    """Blocking jikan_api.get_anime_by_id() through the shared async client.
+
+    Raises:
+        TimeoutError: If the deadline passes first.
+        concurrent.futures.CancelledError: If the lookup's CancelScope is cancelled first.
+        requests.exceptions.RequestException, json.JSONDecodeError: As jikan_api.get_anime_by_id().
+    """
+    return _run(lambda client: client.get_anime_by_id(mal_id, timeout), timeout)
+
+def get_json(path: str, params: dict | None = None, timeout: float | None = DEFAULT_TIMEOUT) -> dict:
+    """Blocking jikan_api.get_json() through the shared async client (same errors, plus TimeoutError)."""
+    return _run(lambda client: asyncio.wait_for(client.get_json(path, params), timeout), timeout)
+
+def close():
+    """Cancels outstanding lookups and stops the shared event loop (call once at shutdown)."""
+    global _loop
+    with _loop_lock:
+        loop, _loop = _loop, None
+        thread = _loop_thread
+    if loop is None or loop.is_closed():
+        return
+
+    async def cancel_all():
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    try:
+        asyncio.run_coroutine_threadsafe(cancel_all(), loop).result(5)
+    except concurrent.futures.TimeoutError:
+        pass
+    loop.call_soon_threadsafe(loop.stop)
+    # Closed here once stopped, rather than whenever the garbage collector gets to it
+    thread.join(5)
+    if not loop.is_running():
+        loop.close()
@@ -0,0 +1,42 @@
+# lazy_import.py - Defers importing heavy modules (selenium, requests) until they are first used
+
+import importlib
+import sys
+import threading
+import types
+
+_lock = threading.Lock()
+
+class LazyModule(types.ModuleType):
+    """Stand-in for a module that imports the real one on first attribute access.
+
+    Unlike importlib.util.LazyLoader, nothing is resolved up front, so parent packages
+    (e.g. the heavy `selenium.webdriver` package) are not imported either.
+    """
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__["_module"]
+        if module is None:
+            with _lock:
+                module = self.__dict__["_module"]
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attribute: str):
+        return getattr(self._load(), attribute)
+
+def lazy_import(name: str) -> types.ModuleType:
+    """Returns module `name`, or a LazyModule that imports it when first used if it is not loaded yet."""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
+
+def preload(*names: str):
+    """Imports modules now, e.g. from a background thread during startup."""
+    for name in names:
+        importlib.import_module(name)
@@ -0,0 +1,74 @@
+# matching.py - Batched fuzzy scoring of a game title against candidate titles and their aliases
+
+import re
+import unicodedata
+from functools import lru_cache
+
+from rapidfuzz import fuzz, process
+
+NORMALIZE_CACHE_SIZE = 16384 # Normalized titles kept in memory (game titles and API names repeat a lot)
+
+_NON_ALNUM = re.compile(r"[^\w]+")
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_title(title: str) -> str:
+    """Normalizes a title for comparison: Unicode-folded, lowercased, punctuation collapsed to spaces."""
+    title = unicodedata.normalize("NFKC", title).casefold()
+    return _NON_ALNUM.sub(" ", title).strip()
+
+def entry_names(entry: dict) -> list[str]:
+    """All names a Jikan anime entry goes by: title, English title, synonyms and alternative titles.
+
+    The main "title" always comes first; duplicates and empty names are dropped.
+    """
+    names = [entry.get("title"), entry.get("title_english")]
+    names.extend(entry.get("title_synonyms") or [])
+    names.extend(alt.get("title") for alt in entry.get("titles") or [] if isinstance(alt, dict))
+    unique = []
+    for name in names:
+        if name and name not in unique:
+            unique.append(name)
+    return unique
+
+def score_keys(query_key: str, keys: list[str], threshold: float = 0) -> dict[int, int]:
+    """Scores a normalized query against normalized keys in one batched call.
+
+    Returns:
+        {index into keys: similarity (0-100)} for every key at or above `threshold`.
+    """
+    if not query_key or not keys:
+        return {}
+    matches = process.extract(
+        query_key, keys, scorer=fuzz.ratio, limit=None, score_cutoff=threshold or None
+    )
+    return {index: round(similarity) for _, similarity, index in matches}
+
+def best_name_matches(title: str, names_per_candidate: list[list[str]],
+                      threshold: float = 0) -> dict[int, tuple[int, str]]:
+    """Finds, per candidate, its name most similar to `title`.
+
+    Every name of every candidate is scored in a single batched call.
+
+    Args:
+        title: The title shown in the game.
+        names_per_candidate: For each candidate, the names it goes by (see entry_names()).
+        threshold: Minimum similarity (0-100) for a candidate to be returned.
+
+    Returns:
+        {candidate index: (similarity, matched name)} for candidates with a name at or above `threshold`.
+    """
+    owners, keys, names = [], [], []
+    for candidate_index, candidate_names in enumerate(names_per_candidate):
+        for name in candidate_names:
+            key = normalize_title(name)
+            if key:
+                owners.append(candidate_index)
+                keys.append(key)
+                names.append(name)
+
+    best: dict[int, tuple[int, str]] = {}
+    for index, similarity in score_keys(normalize_title(title), keys, threshold).items():
+        owner = owners[index]
+        if owner not in best or similarity > best[owner][0]:
+            best[owner] = (similarity, names[index])
+    return best
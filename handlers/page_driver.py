@@ -0,0 +1,116 @@
+# page_driver.py - Browser backend interface used by game_logic, and its Selenium implementation
+
+import time
+
+from handlers.lazy_import import lazy_import
+
+support_ui = lazy_import("selenium.webdriver.support.ui")
+EC = lazy_import("selenium.webdriver.support.expected_conditions")
+exceptions = lazy_import("selenium.common.exceptions")
+
+class PageDriver:
+    """The browser operations the bot needs, independent of how the browser is driven.
+
+    Backends: SeleniumPageDriver (WebDriver through chromedriver) and
+    cdp_driver.CdpPageDriver (DevTools protocol over one websocket). The method
+    names follow Selenium's WebDriver so existing helpers keep working.
+    """
+
+    def get(self, url: str):
+        """Navigates to `url` and waits for the page to load (bounded by the page load timeout)."""
+        raise NotImplementedError
+
+    def refresh(self):
+        """Reloads the current page."""
+        raise NotImplementedError
+
+    def set_page_load_timeout(self, seconds: float):
+        """Sets the upper bound for get() and refresh()."""
+        raise NotImplementedError
+
+    def execute_script(self, script: str, *args):
+        """Runs `script` as a function body in the page, with `arguments` bound to args; returns its result."""
+        raise NotImplementedError
+
+    def execute_cdp_cmd(self, cmd: str, params: dict) -> dict:
+        """Sends a DevTools protocol command and returns its result."""
+        raise NotImplementedError
+
+    def get_log(self, log_type: str) -> list[dict]:
+        """Returns and drains buffered log entries (only "performance" is used), in Selenium's format."""
+        raise NotImplementedError
+
+    def click_xpath(self, xpath: str, timeout: float) -> bool:
+        """Waits up to `timeout` seconds for the element at `xpath` and clicks it.
+
+        Returns:
+            True if it was clicked, False if it never appeared.
+        """
+        raise NotImplementedError
+
+    def wait_for_dom_change(self, timeout: float) -> bool:
+        """Waits until the page's DOM may have changed, for at most `timeout` seconds.
+
+        Returns:
+            True if a change was signalled; backends that cannot observe the page just
+            sleep and return False, so callers should re-read the page either way.
+        """
+        raise NotImplementedError
+
+    def owner_pid(self) -> int:
+        """PID of the process whose descendants are this browser's processes."""
+        raise NotImplementedError
+
+    def quit(self):
+        """Closes the browser."""
+        raise NotImplementedError
+
+class SeleniumPageDriver(PageDriver):
+    """PageDriver on top of a Selenium WebDriver; anything not defined here goes to the WebDriver."""
+
+    def __init__(self, webdriver):
+        self.webdriver = webdriver
+
+    def __getattr__(self, name: str):
+        # get, refresh, execute_script, execute_cdp_cmd, get_log, quit, find_element, ...
+        return getattr(self.webdriver, name)
+
+    # The base class defines these, so forward them explicitly rather than via __getattr__
+    def get(self, url: str):
+        self.webdriver.get(url)
+
+    def refresh(self):
+        self.webdriver.refresh()
+
+    def set_page_load_timeout(self, seconds: float):
+        self.webdriver.set_page_load_timeout(seconds)
+
+    def execute_script(self, script: str, *args):
+        return self.webdriver.execute_script(script, *args)
+
+    def execute_cdp_cmd(self, cmd: str, params: dict) -> dict:
+        return self.webdriver.execute_cdp_cmd(cmd, params)
+
+    def get_log(self, log_type: str) -> list[dict]:
+        return self.webdriver.get_log(log_type)
+
+    def click_xpath(self, xpath: str, timeout: float) -> bool:
+        try:
+            element = support_ui.WebDriverWait(self.webdriver, timeout).until(
+                EC.presence_of_element_located(("xpath", xpath))
+            )
+        except exceptions.TimeoutException:
+            return False
+        element.click()
+        return True
+
+    def wait_for_dom_change(self, timeout: float) -> bool:
+        # WebDriver has no DOM events, so this is a plain poll interval
+        time.sleep(timeout)
+        return False
+
+    def owner_pid(self) -> int:
+        return self.webdriver.service.process.pid
+
+    def quit(self):
+        self.webdriver.quit()
@@ -0,0 +1,84 @@
+# score_refresh.py - Keeps cached scores current by re-fetching stale entries by MAL ID
+
+import threading
+
+import handlers.database_handler as database_handler
+import handlers.jikan_async as jikan_async
+
+REFRESH_BATCH_SIZE = 20 # Stale entries fetched (and written back in one transaction) at a time
+# Pause in seconds between by-ID requests of the background job, so it only uses a
+# small share of the API budget (rounds and warm-up lookups keep the rest)
+BACKGROUND_INTERVAL = 5.0
+
+_thread: threading.Thread | None = None
+_stop = threading.Event()
+
+def refresh_stale_scores(max_entries: int | None = None, interval: float = 0.0,
+                         stop: threading.Event | None = None, on_refreshed=None) -> int:
+    """Re-fetches entries older than database_handler.REFRESH_AGE by MAL ID, oldest first.
+
+    Fetching by ID is one exact request per entry instead of a title search, and every
+    alias of the entry sees the new score at once.
+
+    Args:
+        max_entries: Stop after this many entries (None = until nothing is stale).
+        interval: Seconds to wait between requests (on top of the rate limiter).
+        stop: Event that ends the refresh early when set.
+        on_refreshed: Called with the (anime_id, score, anime_type) rows of every stored
+            batch (see database_handler.save_refreshed_scores()), e.g. TitleIndex.set_scores.
+
+    Returns:
+        The number of entries refreshed.
+    """
+    stop = stop or threading.Event()
+    refreshed = 0
+    while not stop.is_set() and (max_entries is None or refreshed < max_entries):
+        limit = REFRESH_BATCH_SIZE if max_entries is None else min(REFRESH_BATCH_SIZE, max_entries - refreshed)
+        stale = database_handler.get_stale_anime(limit)
+        if not stale:
+            break
+        updates = []
+        failed = False
+        for mal_id, title in stale:
+            try:
+                entry = jikan_async.get_anime_by_id(mal_id)
+            except Exception as e:
+                print(f"Score refresh: Error fetching MAL ID {mal_id} ('{title}'): {e}")
+                failed = True
+                break
+            if entry is None:
+                print(f"Score refresh: MAL ID {mal_id} ('{title}') no longer exists; keeping its score.")
+                updates.append((mal_id, None, None))
+            else:
+                updates.append((mal_id, entry.get("score"), entry.get("type")))
+            if interval and stop.wait(interval):
+                break
+        stored = database_handler.save_refreshed_scores(updates)
+        if on_refreshed is not None and stored:
+            on_refreshed(stored)
+        refreshed += len(updates)
+        if failed:
+            break # Transient API trouble; the rest stays stale until the next run
+    if refreshed:
+        print(f"Score refresh: Refreshed {refreshed} stale entries by MAL ID.")
+    return refreshed
+
+def start_background(interval: float = BACKGROUND_INTERVAL, on_refreshed=None):
+    """Starts refreshing stale entries on a daemon thread (one request every `interval` seconds).
+
+    `on_refreshed` is passed to refresh_stale_scores().
+    """
+    global _thread
+    if _thread is not None and _thread.is_alive():
+        return
+    _stop.clear()
+    _thread = threading.Thread(
+        target=refresh_stale_scores,
+        kwargs={"interval": interval, "stop": _stop, "on_refreshed": on_refreshed},
+        name="score-refresh", daemon=True,
+    )
+    _thread.start()
+
+def stop_background():
+    """Stops the background refresh after its current request."""
+    _stop.set()
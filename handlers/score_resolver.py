@@ -0,0 +1,171 @@
+# score_resolver.py - Resolves anime scores in the background so lookups overlap with page transitions
+
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable
+import threading
+import time
+
+from handlers import jikan_async
+
+RESOLVER_WORKERS = 4 # Threads used for DB lookups / Jikan fetches
+RESOLVE_TIMEOUT = 30 # Upper bound in seconds when waiting for a single title
+BACKGROUND_WORKERS = 1 # Threads for low-priority warm-up lookups (see queue_background)
+# Pause in seconds after each warm-up lookup. Warm-up shares the Jikan rate limiter
+# with the rounds, so unpaced it would take the whole 60/min budget; at this pace it
+# uses a third of it, score_refresh another fifth, and rounds keep the rest
+BACKGROUND_INTERVAL = 3.0
+
+
+class ScoreResolver:
+    """Starts score lookups as soon as a title is seen and hands back the result when it is needed.
+
+    The right-hand title of round N is the left-hand title of round N+1, so a title
+    prefetched while the round animates is usually resolved by the time it is asked for.
+    Results are remembered per (title, type) until cancel_pending() is called.
+
+    Warm-up lookups (e.g. the game's whole title pool) go through queue_background()
+    on a separate, smaller pool, paced by BACKGROUND_INTERVAL, so they never delay the
+    titles of the current round or use up its API budget.
+    """
+
+    def __init__(self, resolve_fn: Callable[[str, str | None], float | None],
+                 max_workers: int = RESOLVER_WORKERS):
+        """
+        Args:
+            resolve_fn: Function taking (title, expected_type) and returning a score or None,
+                e.g. main.get_or_fetch_score.
+            max_workers: Number of lookups that may run at the same time.
+        """
+        self._resolve_fn = resolve_fn
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="resolver")
+        self._background = ThreadPoolExecutor(
+            max_workers=BACKGROUND_WORKERS, thread_name_prefix="resolver-bg"
+        )
+        self._futures: dict[tuple[str, str | None], Future] = {}
+        # API calls made by round lookups join this scope, so cancel_pending() can stop them
+        self._scope = jikan_async.CancelScope()
+        self._background_futures: dict[tuple[str, str | None], Future] = {}
+        # Reentrant: cancelling a future runs its done-callbacks in the cancelling thread
+        self._lock = threading.RLock()
+        self._closed = threading.Event() # Ends the warm-up pause early at shutdown
+        self._pausing: set[tuple[str, str | None]] = set() # Warm-up lookups waiting out their pause
+        self._next_background_at = 0.0 # monotonic() time the next warm-up lookup may start
+
+    def prefetch(self, title: str | None, expected_type: str | None = None) -> Future | None:
+        """Starts resolving a title in the background, unless it is already resolved or in flight."""
+        if not title:
+            return None
+        key = (title, expected_type)
+        with self._lock:
+            future = self._futures.get(key)
+            if future is None or future.cancelled():
+                # Reuse a warm-up lookup that is already running; one still queued is
+                # taken out of the background queue and started right away instead.
+                # One still pausing (see _resolve_paced) is left to give up by itself.
+                background = self._background_futures.pop(key, None)
+                if background is not None and key not in self._pausing and not background.cancel():
+                    future = background
+                else:
+                    future = self._executor.submit(self._resolve_in_scope, self._scope, title, expected_type)
+                self._futures[key] = future
+            return future
+
+    def _resolve_in_scope(self, scope: jikan_async.CancelScope, title: str,
+                          expected_type: str | None) -> float | None:
+        with jikan_async.cancel_scope(scope):
+            return self._resolve_fn(title, expected_type)
+
+    def queue_background(self, items) -> int:
+        """Queues (title, type) pairs for low-priority resolution, e.g. to warm the cache before play.
+
+        Warm-up lookups are kept across games; they are only dropped by shutdown().
+
+        Returns:
+            The number of lookups queued (titles already resolved or queued are skipped).
+        """
+        queued = 0
+        with self._lock:
+            for title, expected_type in items:
+                key = (title, expected_type)
+                if not title or key in self._futures or key in self._background_futures:
+                    continue
+                future = self._background.submit(self._resolve_paced, title, expected_type)
+                self._background_futures[key] = future
+                future.add_done_callback(lambda _, key=key: self._forget_background(key))
+                queued += 1
+        return queued
+
+    def _resolve_paced(self, title: str, expected_type: str | None) -> float | None:
+        key = (title, expected_type)
+        with self._lock:
+            self._pausing.add(key)
+        delay = self._next_background_at - time.monotonic()
+        closed = delay > 0 and self._closed.wait(delay)
+        with self._lock:
+            self._pausing.discard(key)
+            # A round asked for this title during the pause and looks it up itself
+            if closed or key in self._futures:
+                return None
+        try:
+            return self._resolve_fn(title, expected_type)
+        finally:
+            self._next_background_at = time.monotonic() + BACKGROUND_INTERVAL
+
+    def _forget_background(self, key: tuple[str, str | None]):
+        with self._lock:
+            future = self._background_futures.get(key)
+            if future is not None and future.done():
+                del self._background_futures[key]
+
+    def background_pending(self) -> int:
+        """Number of warm-up lookups not finished yet."""
+        with self._lock:
+            return len(self._background_futures)
+
+    def prefetch_state(self, state):
+        """Prefetches both titles of a game_logic.GameState snapshot."""
+        self.prefetch(state.left_title, state.left_type)
+        self.prefetch(state.right_title, state.right_type)
+
+    def resolve(self, title: str, expected_type: str | None = None) -> float | None:
+        """Returns the score for a title, waiting for (or starting) its background lookup."""
+        future = self.prefetch(title, expected_type)
+        if future is None:
+            return None
+        try:
+            return future.result(timeout=RESOLVE_TIMEOUT)
+        except Exception as e:
+            print(f"Background score lookup failed for '{title}': {e}")
+            return None
+
+    def resolve_pair(self, left_title: str, left_type: str | None,
+                     right_title: str, right_type: str | None) -> tuple[float | None, float | None]:
+        """Resolves both sides of a round at the same time."""
+        left = self.prefetch(left_title, left_type)
+        right = self.prefetch(right_title, right_type)
+        wait([f for f in (left, right) if f is not None], timeout=RESOLVE_TIMEOUT)
+        return self.resolve(left_title, left_type), self.resolve(right_title, right_type)
+
+    def cancel_pending(self):
+        """Cancels the game's lookups and forgets all results (call when a game ends).
+
+        Queued lookups never start. Running ones have their API calls cancelled through
+        the game's jikan_async.CancelScope: they return without a score and cache no
+        miss. A call shared with a warm-up lookup keeps going for the warm-up.
+        """
+        with self._lock:
+            cancelled = sum(1 for future in self._futures.values() if future.cancel())
+            self._futures.clear()
+            scope, self._scope = self._scope, jikan_async.CancelScope()
+        interrupted = scope.cancel()
+        if cancelled or interrupted:
+            print(f"Cancelled {cancelled} pending and {interrupted} running score lookup(s).")
+
+    def shutdown(self):
+        """Cancels pending lookups and stops the worker threads."""
+        self._closed.set()
+        self.cancel_pending()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._background.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._background_futures.clear()
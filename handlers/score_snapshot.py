@@ -0,0 +1,158 @@
+# score_snapshot.py - Compact, memory-mapped, read-only score snapshot for fast startup and shipping caches
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from handlers.matching import normalize_title
+
+MAGIC = b"HOLSNAP\0"
+VERSION = 1
+# magic, version, entry count, type-name table length, then the byte offset of each section
+HEADER = struct.Struct("<8sIIIQQQQQ")
+# Sections, in file order:
+#   type names    UTF-8, "\n"-separated (index 0 = unknown type)
+#   key offsets   (count + 1) little-endian uint32, start of each key in the key blob
+#   keys          normalized titles, UTF-8, concatenated in sorted (bytewise) order
+#   scores        count little-endian float32
+#   types         count uint8, index into the type names
+# Every section starts on an ALIGNMENT boundary so the numeric arrays can be viewed in place.
+ALIGNMENT = 8
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is missing, truncated or of an unsupported version."""
+
+def write_snapshot(path: str, rows) -> int:
+    """Writes (title, score, anime_type) rows as a snapshot, replacing `path` atomically.
+
+    Titles are stored by their normalized key; when several titles share a key, the
+    first one wins.
+
+    Returns:
+        The number of entries written.
+    """
+    entries: dict[bytes, tuple[float, str | None]] = {}
+    for title, score, anime_type in rows:
+        key = normalize_title(title).encode("utf-8")
+        if key and key not in entries:
+            entries[key] = (float(score), anime_type.upper() if anime_type else None)
+    keys = sorted(entries)
+
+    type_names = [""] + sorted({t for _, t in entries.values() if t})
+    type_codes = {name: code for code, name in enumerate(type_names)}
+    offsets, scores, types = array("I", [0]), array("f"), array("B")
+    for key in keys:
+        offsets.append(offsets[-1] + len(key))
+        score, anime_type = entries[key]
+        scores.append(score)
+        types.append(type_codes[anime_type or ""])
+    if sys.byteorder != "little":
+        offsets.byteswap()
+        scores.byteswap()
+
+    type_blob = "\n".join(type_names).encode("utf-8")
+    sections = [type_blob, offsets.tobytes(), b"".join(keys), scores.tobytes(), types.tobytes()]
+    positions, position = [], HEADER.size
+    for section in sections:
+        position += -position % ALIGNMENT
+        positions.append(position)
+        position += len(section)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    # A unique temp file, so concurrent exports never write into each other's
+    fd, temp_path = tempfile.mkstemp(dir=directory or None, prefix=".snapshot-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(keys), len(type_blob), *positions))
+            for section, section_pos in zip(sections, positions):
+                f.write(b"\0" * (section_pos - f.tell()))
+                f.write(section)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return len(keys)
+
+class ScoreSnapshot:
+    """Read-only view of a snapshot file.
+
+    The file is memory-mapped and searched in place (binary search over the sorted
+    keys), so opening it costs the same for ten or a hundred thousand titles and
+    nothing is copied into Python objects until it is looked up.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            with open(path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            raise SnapshotError(f"Cannot open snapshot '{path}': {e}") from e
+        try:
+            self._read_header()
+        except SnapshotError:
+            self._map.close()
+            raise
+
+    def _read_header(self):
+        if len(self._map) < HEADER.size:
+            raise SnapshotError(f"Snapshot '{self.path}' is truncated.")
+        (magic, version, count, type_length, types_pos, offsets_pos, keys_pos, scores_pos,
+         codes_pos) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise SnapshotError(f"'{self.path}' is not a score snapshot.")
+        if version != VERSION:
+            raise SnapshotError(f"Snapshot '{self.path}' has version {version}, expected {VERSION}.")
+        if codes_pos + count > len(self._map):
+            raise SnapshotError(f"Snapshot '{self.path}' is truncated.")
+        self._count = count
+        self._type_names = self._map[types_pos:types_pos + type_length].decode("utf-8").split("\n")
+        self._view = memoryview(self._map)
+        self._offsets = self._view[offsets_pos:offsets_pos + 4 * (count + 1)].cast("I")
+        self._scores = self._view[scores_pos:scores_pos + 4 * count].cast("f")
+        self._keys_pos = keys_pos
+        self._codes_pos = codes_pos
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _key(self, index: int) -> bytes:
+        start = self._keys_pos + self._offsets[index]
+        return self._map[start:self._keys_pos + self._offsets[index + 1]]
+
+    def _entry(self, index: int) -> tuple[float, str | None]:
+        # Scores are stored as float32; MAL scores have two decimals
+        score = round(self._scores[index], 2)
+        return score, self._type_names[self._map[self._codes_pos + index]] or None
+
+    def lookup(self, title: str) -> tuple[float, str | None] | None:
+        """Returns (score, anime_type) for a title (compared by normalized key), or None."""
+        key = normalize_title(title).encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._key(low) == key:
+            return self._entry(low)
+        return None
+
+    def rows(self):
+        """Yields every (normalized title, score, anime_type) entry in key order."""
+        for index in range(self._count):
+            score, anime_type = self._entry(index)
+            yield self._key(index).decode("utf-8"), score, anime_type
+
+    def close(self):
+        """Unmaps the file."""
+        self._offsets.release()
+        self._scores.release()
+        self._view.release()
+        self._map.close()
@@ -0,0 +1,170 @@
+# title_index.py - In-memory fuzzy index over cached titles, so near-miss titles resolve without the API
+
+import re
+import threading
+from collections import Counter, defaultdict
+from itertools import chain
+
+from handlers import matching
+from handlers.jikan_api import SIMILARITY_THRESHOLD, type_matches
+from handlers.matching import normalize_title
+
+# Locally there is no search engine ranking the right entry first, so a near miss
+# like "Season 2" vs "Season 3" must not win: require a higher similarity than the
+# API path and identical numbers in both titles.
+LOCAL_SIMILARITY_THRESHOLD = max(SIMILARITY_THRESHOLD, 90)
+MAX_CANDIDATES = 20 # Candidates (by shared n-grams) that get a full similarity check
+MIN_SHARED_NGRAMS = 0.5 # Fraction of the query's n-grams a candidate must share
+RARE_NGRAMS = 6 # Only this many of the query's rarest n-grams are counted...
+MAX_POSTING_LENGTH = 2000 # ...and only if at most this many titles contain them
+NGRAM_SIZE = 3
+
+_NUMBERS = re.compile(r"\d+")
+
+def _ngrams(key: str) -> set[str]:
+    """Character n-grams of a normalized key, padded so short titles still get a few."""
+    padded = f" {key} "
+    return {padded[i:i + NGRAM_SIZE] for i in range(max(len(padded) - NGRAM_SIZE + 1, 1))}
+
+class TitleIndex:
+    """Fuzzy lookup of cached titles using an n-gram inverted index.
+
+    Candidates are the titles sharing most of the query's RARE_NGRAMS rarest
+    n-grams; n-grams found in more than MAX_POSTING_LENGTH titles are never counted.
+    A lookup therefore touches at most RARE_NGRAMS * MAX_POSTING_LENGTH entries
+    however large the index grows, and a query made only of very common n-grams
+    finds nothing (exact normalized matches are still found). The shortlisted
+    candidates are then scored in one batch by the shared matching engine and
+    ranked with jikan_api's type rules.
+
+    A title shared by several anime (one's synonym is another's own title) has an
+    entry per anime, ranked like database_handler: type match first, then the anime
+    whose own title it is.
+    """
+
+    def __init__(self):
+        self._titles: list[str] = []
+        self._keys: list[str] = []
+        self._scores: list[float] = []
+        self._types: list[str | None] = []
+        self._numbers: list[tuple[str, ...]] = []
+        self._anime_ids: list[int | None] = []
+        self._canonical: list[bool] = []
+        self._by_key: dict[str, list[int]] = defaultdict(list) # normalized key -> entry ids
+        self._by_anime: dict[int, list[int]] = defaultdict(list) # anime row id -> entry ids
+        self._postings: dict[str, list[int]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._titles)
+
+    def add(self, title: str, score: float, anime_type: str | None = None,
+            anime_id: int | None = None, canonical: bool = False):
+        """Adds a title, or updates its entry if it is already indexed for the same anime.
+
+        Args:
+            title: The title (any alias of the anime).
+            score: The anime's score.
+            anime_type: The anime's type, if known.
+            anime_id: The anime's database row id, if known; entries of other anime
+                with the same normalized title are kept next to this one.
+            canonical: Whether the title is the anime's own (MAL) title.
+        """
+        key = normalize_title(title)
+        if not key:
+            return
+        with self._lock:
+            for entry_id in self._by_key.get(key, ()):
+                if self._anime_ids[entry_id] == anime_id:
+                    self._scores[entry_id] = score
+                    self._types[entry_id] = anime_type or self._types[entry_id]
+                    self._canonical[entry_id] = canonical
+                    return
+            entry_id = len(self._titles)
+            self._titles.append(title)
+            self._keys.append(key)
+            self._scores.append(score)
+            self._types.append(anime_type)
+            self._numbers.append(tuple(_NUMBERS.findall(key)))
+            self._anime_ids.append(anime_id)
+            self._canonical.append(canonical)
+            self._by_key[key].append(entry_id)
+            if anime_id is not None:
+                self._by_anime[anime_id].append(entry_id)
+            for gram in _ngrams(key):
+                self._postings[gram].append(entry_id)
+
+    def add_many(self, rows):
+        """Adds rows of add()'s arguments, e.g. from database_handler.get_all_scores()."""
+        for row in rows:
+            self.add(*row)
+
+    def set_scores(self, rows):
+        """Updates every title of the given anime from (anime_id, score, anime_type) rows.
+
+        Anime that are not indexed are ignored (e.g. from database_handler.save_refreshed_scores()).
+        """
+        with self._lock:
+            for anime_id, score, anime_type in rows:
+                for entry_id in self._by_anime.get(anime_id, ()):
+                    self._scores[entry_id] = score
+                    self._types[entry_id] = anime_type or self._types[entry_id]
+
+    def _counted_postings(self, key: str) -> list[list[int]]:
+        """The posting lists a fuzzy lookup of `key` counts shared n-grams over. Caller holds the lock."""
+        # Rare n-grams tell the most and cost the least; common ones ("the", " no")
+        # would make every lookup walk a share of the whole index
+        postings = sorted((self._postings[g] for g in _ngrams(key) if g in self._postings), key=len)
+        return [p for p in postings[:RARE_NGRAMS] if len(p) <= MAX_POSTING_LENGTH]
+
+    def lookup(self, title: str, expected_type: str | None = None) -> tuple[str, float, float] | None:
+        """Finds the best cached match for a title.
+
+        Args:
+            title: The title shown in the game.
+            expected_type: The type shown in the game, if any.
+
+        Returns:
+            (matched_title, score, similarity) for the best match above
+            LOCAL_SIMILARITY_THRESHOLD, or None if nothing is close enough.
+        """
+        key = normalize_title(title)
+        if not key:
+            return None
+        with self._lock:
+            exact = max(
+                self._by_key.get(key, ()), default=None,
+                key=lambda e: (type_matches(self._types[e], expected_type), self._canonical[e]),
+            )
+            if exact is not None and type_matches(self._types[exact], expected_type):
+                return self._titles[exact], self._scores[exact], 100
+
+            postings = self._counted_postings(key)
+            if not postings:
+                return None
+
+            shared = Counter(chain.from_iterable(postings))
+            needed = len(postings) * MIN_SHARED_NGRAMS
+            shortlist = [
+                candidate_id for candidate_id, count in shared.most_common(MAX_CANDIDATES) if count >= needed
+            ]
+
+            numbers = tuple(_NUMBERS.findall(key))
+            shortlist = [c for c in shortlist if self._numbers[c] == numbers]
+            similarities = matching.score_keys(
+                key, [self._keys[c] for c in shortlist], LOCAL_SIMILARITY_THRESHOLD
+            )
+            best = None
+            for position, similarity in similarities.items():
+                candidate_id = shortlist[position]
+                # Same ranking as jikan_api: type match first, then similarity
+                rank = (
+                    type_matches(self._types[candidate_id], expected_type), similarity,
+                    self._canonical[candidate_id],
+                )
+                if best is None or rank > best[0]:
+                    best = (rank, candidate_id)
+            if best is None:
+                return None
+            (_, similarity, _), candidate_id = best
+            return self._titles[candidate_id], self._scores[candidate_id], similarity
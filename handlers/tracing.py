@@ -0,0 +1,144 @@
+# tracing.py - Lightweight per-round span timing and counters, written as JSON lines
+
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+TRACE_ENV_VAR = "HOL_TRACE" # Set to a file path to enable tracing without code changes
+DEFAULT_TRACE_FILE = os.path.join("data", "trace.jsonl")
+FLUSH_EVERY = 200 # Buffered span records written to the file at a time
+
+# Checked first by every hook; while False, span() returns a shared no-op and count() returns at once
+ENABLED = False
+
+_lock = threading.Lock()
+_buffer: list[str] = []
+_trace_path: str | None = None
+_durations: dict[str, list[float]] = defaultdict(list) # phase -> span durations in ms
+_counters: Counter = Counter()
+_current_round = 0
+
+
+class _NoopSpan:
+    """Context manager used while tracing is off; does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    """Times the enclosed block and records it under a phase name."""
+    __slots__ = ("name", "attrs", "start")
+
+    def __init__(self, name: str, attrs: dict):
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed_ms = (time.perf_counter() - self.start) * 1000
+        record = {"ts": time.time(), "round": _current_round, "phase": self.name, "ms": round(elapsed_ms, 3)}
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        record.update(self.attrs)
+        _record(self.name, elapsed_ms, record)
+        return False
+
+
+def enable(path: str = DEFAULT_TRACE_FILE):
+    """Turns tracing on; spans are appended to `path` as JSON lines."""
+    global ENABLED, _trace_path
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    _trace_path = path
+    ENABLED = True
+    print(f"Tracing enabled, writing spans to '{path}'.")
+
+def enable_from_env(suffix: str = ""):
+    """Enables tracing if the HOL_TRACE environment variable names a file.
+
+    Args:
+        suffix: Appended to the file name before its extension (e.g. "-worker2"),
+            so parallel processes do not write to the same file.
+    """
+    path = os.environ.get(TRACE_ENV_VAR)
+    if path:
+        root, ext = os.path.splitext(path)
+        enable(f"{root}{suffix}{ext}")
+
+def set_round(round_number: int):
+    """Sets the round number attached to subsequent spans."""
+    global _current_round
+    _current_round = round_number
+
+def span(name: str, **attrs):
+    """Returns a context manager timing one phase, e.g. `with tracing.span("db.lookup"):`."""
+    if not ENABLED:
+        return _NOOP_SPAN
+    return _Span(name, attrs)
+
+def count(name: str, amount: int = 1):
+    """Increments a named counter (cache hits, API calls, ...)."""
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] += amount
+
+def _record(name: str, elapsed_ms: float, record: dict):
+    with _lock:
+        _durations[name].append(elapsed_ms)
+        _buffer.append(json.dumps(record))
+        if len(_buffer) >= FLUSH_EVERY:
+            _flush_locked()
+
+def _flush_locked():
+    if not _buffer or not _trace_path:
+        return
+    try:
+        with open(_trace_path, "a") as f:
+            f.write("\n".join(_buffer) + "\n")
+    except OSError as e:
+        print(f"Error writing trace file '{_trace_path}': {e}")
+    _buffer.clear()
+
+def flush():
+    """Writes buffered span records to the trace file."""
+    with _lock:
+        _flush_locked()
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+def print_summary():
+    """Prints p50/p95/p99 per phase and all counters, then flushes the trace file."""
+    if not ENABLED:
+        return
+    flush()
+    with _lock:
+        durations = {name: sorted(values) for name, values in _durations.items()}
+        counters = dict(_counters)
+    print("\n=== Trace summary (ms) ===")
+    print(f"{'phase':<24}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for name in sorted(durations):
+        values = durations[name]
+        print(
+            f"{name:<24}{len(values):>8}{_percentile(values, 0.50):>10.1f}"
+            f"{_percentile(values, 0.95):>10.1f}{_percentile(values, 0.99):>10.1f}{values[-1]:>10.1f}"
+        )
+    if counters:
+        print("Counters: " + ", ".join(f"{name}={value}" for name, value in sorted(counters.items())))
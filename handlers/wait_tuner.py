@@ -0,0 +1,220 @@
+# wait_tuner.py - Learns how long each page phase takes and sets wait timeouts and poll intervals from it
+
+import contextlib
+import json
+import os
+import tempfile
+import threading
+from collections import deque
+
+try:
+    import fcntl
+except ImportError: # Windows: saves still merge, but two processes saving at once can race
+    fcntl = None
+
+from handlers import database_handler
+
+TIMINGS_PATH = os.path.join(database_handler.DATABASE_DIR, "wait_timings.json") # Learned timings, kept between runs
+TIMINGS_VERSION = 1
+
+# Phases timed by main.play_game()
+PHASE_PLAY_BUTTON = "play_button" # Page ready -> play button clicked
+PHASE_FIRST_ROUND = "first_round" # Play clicked -> first round on screen
+PHASE_NEXT_ROUND = "next_round" # Choice clicked -> next round on screen
+PHASE_GAME_OVER = "game_over" # Choice clicked -> game over screen detected
+
+WINDOW = 200 # Most recent samples kept per phase
+MIN_SAMPLES = 20 # Below this, the hand-tuned defaults are used
+PERCENTILE = 0.99 # Timeouts cover this share of observed durations...
+SAFETY_FACTOR = 1.5 # ...times this factor...
+SAFETY_MARGIN = 0.5 # ...plus this many seconds
+MIN_TIMEOUT = 1.0 # Never wait less than this for a phase
+POLLS_PER_PHASE = 20 # Poll about this often during a typical (median) phase
+MIN_POLL_INTERVAL = 0.02 # Seconds; faster polling only costs browser round trips
+# After a timeout, waits grow by BACKOFF_FACTOR (up to MAX_BACKOFF times the default);
+# every phase that completes in time shrinks the extra by BACKOFF_DECAY
+BACKOFF_FACTOR = 2.0
+BACKOFF_DECAY = 0.9
+MAX_BACKOFF = 4.0
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = min(int(fraction * len(sorted_values)), len(sorted_values) - 1)
+    return sorted_values[index]
+
+@contextlib.contextmanager
+def _file_lock(path: str):
+    """Holds an exclusive lock on `path`.lock, so saves from several processes do not interleave."""
+    if fcntl is None:
+        yield
+        return
+    with open(f"{path}.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class WaitTuner:
+    """Rolling per-phase timing statistics that replace hand-tuned wait constants.
+
+    Every completed phase adds a sample. Once a phase has MIN_SAMPLES, its timeout
+    is a high percentile of the recent samples with a safety factor. That is never
+    more than the hand-tuned default, so a fast site fails fast. Its poll interval
+    is a fraction of the median duration. When a wait times out, the phase backs
+    off: its timeouts multiply by BACKOFF_FACTOR, up to MAX_BACKOFF times the
+    default, and relax again as phases complete in time. The samples and backoff
+    are saved to a JSON file, so a new run starts from what earlier runs learned.
+    Supervisor workers share that file: each save merges its new samples into what
+    the others saved, instead of overwriting them.
+    """
+
+    def __init__(self, path: str = TIMINGS_PATH):
+        self.path = path
+        self._samples: dict[str, deque[float]] = {}
+        self._unsaved: dict[str, list[float]] = {} # Samples observed since the last load/save
+        self._backoff: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def _phase_samples(self, phase: str) -> deque[float]:
+        samples = self._samples.get(phase)
+        if samples is None:
+            samples = self._samples[phase] = deque(maxlen=WINDOW)
+        return samples
+
+    def observe(self, phase: str, seconds: float):
+        """Records how long a phase took when it completed before its timeout."""
+        with self._lock:
+            self._phase_samples(phase).append(seconds)
+            self._unsaved.setdefault(phase, []).append(seconds)
+            backoff = self._backoff.get(phase, 1.0)
+            if backoff > 1.0:
+                self._backoff[phase] = max(1.0, backoff * BACKOFF_DECAY)
+
+    def record_timeout(self, phase: str, waited: float):
+        """Records that a phase did not complete within `waited` seconds and backs its waits off."""
+        with self._lock:
+            # The real duration is unknown but at least `waited`; counting it keeps the percentile honest
+            self._phase_samples(phase).append(waited)
+            self._unsaved.setdefault(phase, []).append(waited)
+            backoff = self._backoff[phase] = min(self._backoff.get(phase, 1.0) * BACKOFF_FACTOR, MAX_BACKOFF)
+        print(f"Wait tuner: '{phase}' timed out after {waited:.2f}s; backing off to x{backoff:.1f}.")
+
+    def _sorted_samples(self, phase: str) -> list[float] | None:
+        samples = self._samples.get(phase)
+        if samples is None or len(samples) < MIN_SAMPLES:
+            return None
+        return sorted(samples)
+
+    def timeout(self, phase: str, default: float) -> float:
+        """Seconds to wait at most for a phase; `default` is the hand-tuned value it replaces."""
+        with self._lock:
+            samples = self._sorted_samples(phase)
+            backoff = self._backoff.get(phase, 1.0)
+        if samples is None:
+            learned = default
+        else:
+            learned = min(max(_percentile(samples, PERCENTILE) * SAFETY_FACTOR + SAFETY_MARGIN, MIN_TIMEOUT), default)
+        return min(learned * backoff, default * MAX_BACKOFF)
+
+    def poll_interval(self, phase: str, default: float) -> float:
+        """Seconds between page checks while waiting for a phase (never slower than `default`)."""
+        with self._lock:
+            samples = self._sorted_samples(phase)
+        if samples is None:
+            return default
+        return min(max(_percentile(samples, 0.5) / POLLS_PER_PHASE, MIN_POLL_INTERVAL), default)
+
+    def summary(self) -> str:
+        """One line per phase: sample count, p50/p99 and backoff."""
+        lines = []
+        with self._lock:
+            for phase, samples in sorted(self._samples.items()):
+                ordered = sorted(samples)
+                if not ordered:
+                    continue
+                lines.append(
+                    f"  {phase:<12} n={len(ordered):<4} p50={_percentile(ordered, 0.5):.2f}s "
+                    f"p99={_percentile(ordered, 0.99):.2f}s backoff=x{self._backoff.get(phase, 1.0):.1f}"
+                )
+        return "\n".join(lines)
+
+    def _read(self) -> dict[str, tuple[list[float], float]] | None:
+        """Reads `path` as {phase: (samples, backoff)}; None if it is missing or unreadable."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Wait tuner: Could not read '{self.path}': {e}")
+            return None
+        if not isinstance(data, dict) or data.get("version") != TIMINGS_VERSION:
+            print(f"Wait tuner: Ignoring '{self.path}' (unknown format).")
+            return None
+        phases = {}
+        for phase, entry in (data.get("phases") or {}).items():
+            samples = [float(s) for s in entry.get("samples", []) if isinstance(s, (int, float)) and s >= 0]
+            phases[phase] = (samples[-WINDOW:], min(max(float(entry.get("backoff", 1.0)), 1.0), MAX_BACKOFF))
+        return phases
+
+    def load(self):
+        """Restores what earlier runs learned from `path` (a missing or unreadable file starts fresh)."""
+        phases = self._read()
+        if phases is None:
+            return
+        with self._lock:
+            for phase, (samples, backoff) in phases.items():
+                self._samples[phase] = deque(samples, maxlen=WINDOW)
+                self._backoff[phase] = backoff
+            self._unsaved.clear()
+        print(f"Wait tuner: Loaded timings for {len(self._samples)} phases from '{self.path}'.")
+
+    def save(self):
+        """Merges the samples observed since the last save into `path`, replacing it atomically.
+
+        Samples other processes saved in the meantime are kept, the newest WINDOW per
+        phase. This tuner's backoff wins for the phases it has seen. The merged samples
+        are also adopted here, so each worker learns from the others.
+        """
+        directory = os.path.dirname(self.path)
+        try:
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with _file_lock(self.path):
+                saved = self._read() or {}
+                with self._lock:
+                    unsaved = {phase: list(samples) for phase, samples in self._unsaved.items()}
+                    backoff = dict(self._backoff)
+                merged = {}
+                for phase in saved.keys() | unsaved.keys() | backoff.keys():
+                    samples, saved_backoff = saved.get(phase, ([], 1.0))
+                    merged[phase] = ((samples + unsaved.get(phase, []))[-WINDOW:], backoff.get(phase, saved_backoff))
+                data = {
+                    "version": TIMINGS_VERSION,
+                    "phases": {
+                        phase: {"samples": [round(s, 4) for s in samples], "backoff": phase_backoff}
+                        for phase, (samples, phase_backoff) in merged.items()
+                    },
+                }
+                # A unique temp file, so concurrent saves never write into each other's
+                fd, temp_path = tempfile.mkstemp(dir=directory or None, prefix=".wait_timings-", suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "w") as f:
+                        json.dump(data, f)
+                    os.replace(temp_path, self.path)
+                except BaseException:
+                    os.unlink(temp_path)
+                    raise
+        except OSError as e:
+            print(f"Wait tuner: Could not save '{self.path}': {e}")
+            return
+        with self._lock:
+            for phase, (samples, _) in merged.items():
+                # Keep what was observed while saving for the next save
+                newer = self._unsaved.get(phase, [])[len(unsaved.get(phase, [])):]
+                if newer:
+                    self._unsaved[phase] = newer
+                else:
+                    self._unsaved.pop(phase, None)
+                self._samples[phase] = deque(samples + newer, maxlen=WINDOW)
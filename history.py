@@ -0,0 +1,96 @@
+# history.py - Queries the session/round history recorded by the bot
+
+import argparse
+import datetime
+
+import handlers.history_store as history_store
+
+
+def _format_time(timestamp: float | None) -> str:
+    if timestamp is None:
+        return "-"
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def show_sessions(limit: int):
+    """Prints the most recent sessions, newest first."""
+    rows = history_store.query(
+        f"SELECT id, started_at, rounds, high_score, duration_s, worker_id, error "
+        f"FROM {history_store.SESSIONS_TABLE} ORDER BY id DESC LIMIT ?",
+        (limit,),
+    )
+    print(f"{'id':>6}  {'started':19}  {'rounds':>6}  {'high':>5}  {'secs':>7}  {'worker':>6}  error")
+    for session_id, started_at, rounds, high_score, duration_s, worker_id, error in rows:
+        print(
+            f"{session_id:>6}  {_format_time(started_at):19}  {rounds if rounds is not None else '-':>6}  "
+            f"{high_score if high_score is not None else '-':>5}  "
+            f"{f'{duration_s:.0f}' if duration_s is not None else '-':>7}  "
+            f"{worker_id if worker_id is not None else '-':>6}  {error or ''}"
+        )
+
+
+def show_throughput(days: int):
+    """Prints games, rounds and rounds/hour of play time per day."""
+    rows = history_store.query(
+        f"SELECT date(started_at, 'unixepoch', 'localtime') AS day, COUNT(*), "
+        f"SUM(rounds), SUM(duration_s), MAX(high_score) "
+        f"FROM {history_store.SESSIONS_TABLE} WHERE ended_at IS NOT NULL "
+        f"GROUP BY day ORDER BY day DESC LIMIT ?",
+        (days,),
+    )
+    print(f"{'day':10}  {'games':>5}  {'rounds':>6}  {'rounds/h':>8}  {'high':>5}")
+    for day, games, rounds, play_time, high_score in rows:
+        rounds = rounds or 0
+        per_hour = rounds / play_time * 3600 if play_time else 0.0
+        print(f"{day:10}  {games:>5}  {rounds:>6}  {per_hour:>8.0f}  {high_score or 0:>5}")
+
+
+def show_failing(limit: int):
+    """Prints the titles most often involved in lost or unresolved rounds."""
+    rows = history_store.query(
+        f"""
+        SELECT title, anime_type, COUNT(*) AS failures,
+               SUM(outcome = ?) AS wrong, SUM(outcome = ?) AS unresolved
+        FROM (
+            SELECT left_title AS title, left_type AS anime_type, outcome FROM {history_store.ROUNDS_TABLE}
+            UNION ALL
+            SELECT right_title, right_type, outcome FROM {history_store.ROUNDS_TABLE}
+        )
+        WHERE outcome IN (?, ?)
+        GROUP BY title, anime_type ORDER BY failures DESC LIMIT ?
+        """,
+        (history_store.OUTCOME_WRONG, history_store.OUTCOME_UNRESOLVED,
+         history_store.OUTCOME_WRONG, history_store.OUTCOME_UNRESOLVED, limit),
+    )
+    print(f"{'failures':>8}  {'wrong':>5}  {'unres.':>6}  title")
+    for title, anime_type, failures, wrong, unresolved in rows:
+        print(f"{failures:>8}  {wrong:>5}  {unresolved:>6}  {title} ({anime_type})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the bot's session and round history.")
+    parser.add_argument("--db", default=history_store.HISTORY_PATH, help="History database file.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sessions = commands.add_parser("sessions", help="Most recent sessions.")
+    sessions.add_argument("--limit", type=int, default=20)
+    throughput = commands.add_parser("throughput", help="Rounds per hour of play, by day.")
+    throughput.add_argument("--days", type=int, default=14)
+    failing = commands.add_parser("failing", help="Titles most often in lost or unresolved rounds.")
+    failing.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    history_store.HISTORY_PATH = args.db
+    history_store.setup_history()
+    try:
+        if args.command == "sessions":
+            show_sessions(args.limit)
+        elif args.command == "throughput":
+            show_throughput(args.days)
+        else:
+            show_failing(args.limit)
+    finally:
+        history_store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,56 @@ import handlers.browser_handler as browser_handler
 import handlers.database_handler as database_handler
 import handlers.game_logic as game_logic
 import handlers.jikan_api as jikan_api
+import handlers.jikan_async as jikan_async
+from handlers import history_store, score_refresh, tracing
+from handlers.matching import normalize_title
+from handlers.score_resolver import ScoreResolver
+from handlers.title_index import TitleIndex
+from handlers.wait_tuner import (
+    PHASE_FIRST_ROUND, PHASE_GAME_OVER, PHASE_NEXT_ROUND, PHASE_PLAY_BUTTON, WaitTuner,
+)
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import sys
 import time
 import datetime  # Added for timestamping and duration
-import os  # Added for file path operations
 
 GAME_URL = "https://www.higherorlowergame.com/anime/score/"
-ROUND_DELAY = 8  # Seconds to wait between rounds for page to update
+ROUND_DELAY = 8  # Seconds to wait between rounds for page to update (fixed wait mode)
+# Learn wait timeouts and poll intervals from observed page timings (see WaitTuner);
+# the constants here and in game_logic then only act as upper bounds / starting values
+ADAPTIVE_WAITS = True
+# "transition" waits only until the next round is on screen (bounded by
+# game_logic.TRANSITION_TIMEOUT); "fixed" always sleeps ROUND_DELAY seconds.
+WAIT_MODE = "transition"
+MAX_TIMEOUTS_IN_A_ROW = 2  # Unchanged rounds retried before giving up
+# Continuous mode: after game over, click play again in the same browser
+CONTINUOUS_MODE = False  # Also enabled with --continuous
+MAX_GAMES = None  # Stop after this many games (None = until interrupted); --games
+GAMES_PER_BROWSER = 50  # Restart the browser after this many games (None = never)
+MAX_BROWSER_MEMORY_MB = 1500  # Restart the browser when it grows beyond this (None = never)
 RESULTS_FILE = "testsResults.txt"
+# "default" opens a full browser window; "performance" runs headless with images,
+# media, fonts and ads blocked (see browser_handler.PERFORMANCE_PROFILE)
+BROWSER_PROFILE = browser_handler.DEFAULT_PROFILE
+# "selenium" drives the browser through chromedriver; "cdp" talks to it directly over
+# one DevTools websocket (lower per-command latency, event-driven round waits)
+DRIVER_BACKEND = browser_handler.SELENIUM_BACKEND
+# Read the game's title pool from its network responses at page load and resolve the
+# uncached titles in the background before (and while) playing; also --harvest-pool
+HARVEST_TITLE_POOL = False
+# Re-fetch scores older than database_handler.REFRESH_AGE by MAL ID on a background
+# thread while playing (at most one request every score_refresh.BACKGROUND_INTERVAL seconds)
+REFRESH_STALE_SCORES = True
+
+# Aliases loaded into the title index at startup, most recently fetched first. A full
+# offline dump has around a million; loading them all would be slow and memory-heavy
+TITLE_INDEX_LIMIT = 100_000
+
+# Fuzzy index over the cached titles, filled from the DB at startup
+title_index = TitleIndex()
+# Per-phase page timings, loaded at startup and saved at shutdown
+wait_tuner = WaitTuner()
 
 
 def get_or_fetch_score(title: str, expected_type: str | None) -> float | None:
@@ -20,96 +63,236 @@ def get_or_fetch_score(title: str, expected_type: str | None) -> float | None:
         return None
 
     # Check database first
-    score = database_handler.get_score_from_db(title)
+    score = database_handler.get_score_from_db(title, expected_type)
     if score is not None:
         print(f"Found '{title}' in DB with score: {score}")  # Restored original print
         return score
 
+    # Near-miss titles (punctuation, casing, season wording) resolve from the local index
+    with tracing.span("index.lookup"):
+        local_match = title_index.lookup(title, expected_type)
+    if local_match is not None:
+        tracing.count("index.hit")
+        matched_title, score, similarity = local_match
+        print(
+            f"Matched '{title}' to cached '{matched_title}' (Similarity: {similarity}) with score: {score}"
+        )
+        # Same anime as the cached title: link it, so the next lookup is a plain DB hit
+        if not database_handler.link_alias(title, matched_title, expected_type):
+            database_handler.save_score_to_db(title, score, expected_type)
+        return score
+
+    # Titles the API recently failed to resolve are not searched for again until their TTL expires
+    miss_reason = database_handler.get_miss_from_db(title)
+    if miss_reason is not None:
+        tracing.count("miss_cache.hit")
+        print(f"'{title}' is a known miss ({miss_reason}), skipping API lookup.")
+        return None
+
     # If not in DB, fetch from Jikan API, providing the expected type
     print(
         f"'{title}' not in DB, fetching from Jikan API (Expected Type: {expected_type or 'Any'})..."
     )
-    # Pass the expected_type to the API handler
-    score = jikan_api.get_anime_score(title, expected_type)
+    # Pass the expected_type to the API handler. Concurrent lookups of the same title
+    # (round prefetch, pool warm-up) share one request through the async client.
+    with tracing.span("api.search"):
+        match, miss_reason = jikan_async.search_anime_score(title, expected_type)
 
     # If successfully fetched, save to DB for future use
-    # Note: We save using the *original* title from the game, even if the
-    # Jikan API found a score for a slightly different title string.
-    # This ensures our DB is keyed by the exact titles encountered in the game.
-    if score is not None:
-        database_handler.save_score_to_db(title, score)
-        print(f"Saved '{title}' with score {score} to DB.")
+    # Note: The entry is stored under its MAL ID, with the *original* title from the
+    # game and every name of the entry as aliases, so any of them is a DB hit next time
+    # and the score can later be refreshed by ID.
+    if match is not None:
+        score = match["score"]
+        anime_id = database_handler.save_anime(
+            match["mal_id"], match["api_title"], score, match["api_type"], [title, *match["names"]]
+        )
+        if anime_id is not None:
+            # Indexed per anime, so a synonym shared with another entry does not replace it
+            canonical_key = normalize_title(match["api_title"])
+            for name in (title, *match["names"]):
+                title_index.add(
+                    name, score, match["api_type"], anime_id, normalize_title(name) == canonical_key
+                )
+        print(f"Saved '{title}' (MAL ID {match['mal_id']}) with score {score} to DB.")
         return score
     else:
         print(f"Could not fetch score for '{title}' from API.")
+        # Request errors and timeouts are transient, so only genuine "not found" answers are cached
+        if miss_reason not in jikan_api.TRANSIENT_MISSES:
+            database_handler.save_miss_to_db(title, miss_reason)
         return None
 
 
-def main():
-    start_time = datetime.datetime.now()  # Record start time
-    print(f"Starting Anime Game Bot at {start_time.strftime('%Y-%m-%d %H:%M:%S')}...")
-    database_handler.setup_database()
-    driver = browser_handler.initialize_driver()
+def wait_for_next_round(
+    driver,
+    previous_title: str | None,
+    previous_score: int | None,
+    resolver: ScoreResolver | None = None,
+    phase: str = PHASE_NEXT_ROUND,
+):
+    """Waits for the next round or the game over screen, according to WAIT_MODE.
+
+    When a resolver is given, titles are handed to it the moment they appear so their
+    scores are looked up while the round is still animating. With ADAPTIVE_WAITS the
+    timeout and poll interval come from wait_tuner, and the wait is fed back into it.
+
+    Args:
+        phase: PHASE_FIRST_ROUND after clicking play, PHASE_NEXT_ROUND after a choice.
+
+    Returns:
+        The (outcome, state, elapsed_seconds) tuple from game_logic.wait_for_next_state().
+        In fixed mode the elapsed time includes the fixed delay.
+    """
+    if WAIT_MODE == "fixed":
+        # Fixed mode learns nothing itself, but uses what transition mode has learned
+        delay = wait_tuner.timeout(phase, ROUND_DELAY) if ADAPTIVE_WAITS else ROUND_DELAY
+        print(f"Waiting {delay:.1f} seconds for next round...")
+        time.sleep(delay)
+        # A new round is classified on the first read; GAME_OVER_TIMEOUT leaves room to
+        # tell the game over screen apart from the stale round still drawn behind it
+        outcome, state, elapsed = game_logic.wait_for_next_state(
+            driver, previous_title, previous_score, timeout=game_logic.GAME_OVER_TIMEOUT,
+            on_state=resolver.prefetch_state if resolver else None,
+        )
+        return outcome, state, delay + elapsed
+
+    timeout = poll_interval = None
+    if ADAPTIVE_WAITS:
+        timeout = wait_tuner.timeout(phase, game_logic.TRANSITION_TIMEOUT)
+        if phase == PHASE_NEXT_ROUND:
+            # A choice ends in the next round or in game over; wait long enough for either
+            timeout = max(timeout, wait_tuner.timeout(PHASE_GAME_OVER, game_logic.TRANSITION_TIMEOUT))
+        # Leave room for the game over / error checks, which need their own time windows
+        timeout = max(timeout, game_logic.ERROR_TIMEOUT, game_logic.GAME_OVER_TIMEOUT)
+        poll_interval = wait_tuner.poll_interval(phase, game_logic.TRANSITION_POLL_INTERVAL)
+    with tracing.span("round.transition_wait"):
+        outcome, state, elapsed = game_logic.wait_for_next_state(
+            driver, previous_title, previous_score, timeout=timeout,
+            on_state=resolver.prefetch_state if resolver else None,
+            poll_interval=poll_interval,
+        )
+    if ADAPTIVE_WAITS:
+        if outcome == game_logic.ROUND_READY:
+            wait_tuner.observe(phase, elapsed)
+        elif outcome == game_logic.GAME_OVER and phase == PHASE_NEXT_ROUND:
+            wait_tuner.observe(PHASE_GAME_OVER, elapsed)
+        elif outcome == game_logic.TIMED_OUT:
+            wait_tuner.record_timeout(phase, elapsed)
+    print(f"Round transition: {outcome} after {elapsed:.2f}s")
+    return outcome, state, elapsed
+
+
+def round_outcome(outcome: str) -> str:
+    """Maps a wait_for_next_state() outcome after a choice to a history_store round outcome."""
+    if outcome == game_logic.ROUND_READY:
+        return history_store.OUTCOME_CORRECT
+    if outcome == game_logic.GAME_OVER:
+        return history_store.OUTCOME_WRONG
+    return history_store.OUTCOME_ERROR
+
+
+def click_play(driver) -> bool:
+    """Clicks the play button, with a learned timeout when ADAPTIVE_WAITS is on."""
+    if not ADAPTIVE_WAITS:
+        return game_logic.click_play_button(driver)
+    timeout = wait_tuner.timeout(PHASE_PLAY_BUTTON, game_logic.WAIT_TIMEOUT)
+    started = time.monotonic()
+    clicked = game_logic.click_play_button(driver, timeout)
+    if clicked:
+        wait_tuner.observe(PHASE_PLAY_BUTTON, time.monotonic() - started)
+    else:
+        wait_tuner.record_timeout(PHASE_PLAY_BUTTON, time.monotonic() - started)
+    return clicked
 
-    if not driver:
-        print("Failed to initialize browser. Exiting.")
-        return
 
+def play_game(driver, resolver: ScoreResolver, session_id: int | None = None,
+              previous_title: str | None = None) -> dict:
+    """Plays one game, from clicking the play button until game over.
+
+    Every round is recorded in the history store under `session_id` (if given).
+
+    Args:
+        previous_title: The "last_title" of the previous game in this browser, if any.
+            Its last round can still be drawn after play is clicked again, and must not
+            be taken for the first round of this game.
+
+    Returns:
+        A dict with "rounds" (successful choices), "high_score", "round_times" (seconds
+        from the start of each completed round to the start of the next), "transition_times"
+        (seconds spent in each wait_for_next_round() call), "first_choice_at"
+        (time.monotonic() of the first click, or None), "last_title" (right-hand title of
+        the last round on screen, or None) and "error" (the message of an unexpected
+        exception, or None if the game ended normally).
+    """
     high_score_session = 0
     rounds_played = 0
+    last_score = 0  # Score shown when the current round started
+    error = None
+    round_times = []
+    transition_times = []
+    round_started = None
+    first_choice_at = None
+    last_title = previous_title
 
     try:
-        browser_handler.navigate_to_url(driver, GAME_URL)
-        time.sleep(2)  # Increased initial wait time for page load
-
-        game_logic.click_play_button(driver)
-        time.sleep(ROUND_DELAY)  # Wait for the first round to load
+        if not click_play(driver):
+            # Without a new game every later step would fail too; the error makes
+            # run_bot() restart the browser instead of logging empty games
+            raise RuntimeError("Play button could not be clicked.")
+        warm_title_pool(driver, resolver)
+        # Wait for the first round to load
+        outcome, state, elapsed = wait_for_next_round(driver, previous_title, None, resolver, PHASE_FIRST_ROUND)
+        transition_times.append(elapsed)
+        timeouts_in_a_row = 0
 
         while True:  # Loop indefinitely until game over
+            if state and state.has_titles:
+                last_title = state.right_title
+            if outcome == game_logic.GAME_OVER:
+                print("Game over screen detected.")
+                break
+            if outcome == game_logic.ERROR:
+                print("Game page could not be read. Stopping.")
+                break
+            if outcome == game_logic.TIMED_OUT:
+                timeouts_in_a_row += 1
+                if not (state and state.has_titles) or timeouts_in_a_row > MAX_TIMEOUTS_IN_A_ROW:
+                    print("Next round never appeared. Assuming game over.")
+                    break
+                print("Round did not advance; retrying the round still on screen.")
+            else:
+                timeouts_in_a_row = 0
+
             rounds_played += 1
+            tracing.set_round(rounds_played)
+            now = time.monotonic()
+            if round_started is not None:
+                round_times.append(now - round_started)
+            round_started = now
             print(f"\n--- Round {rounds_played} ---")
 
-            # Check if game elements are still present (basic game over check)
-            left_title_element = game_logic._find_element(
-                driver, game_logic.By.XPATH, game_logic.LEFT_TITLE_XPATH
-            )
-            right_title_element = game_logic._find_element(
-                driver, game_logic.By.XPATH, game_logic.RIGHT_TITLE_XPATH
-            )
-            if not left_title_element or not right_title_element:
-                print("Game title elements not found. Assuming game over.")
-                break  # Exit the loop
-
-            # Get titles AND types
-            left_title, left_type, right_title, right_type = (
-                game_logic.get_anime_titles(driver)
-            )
+            left_title, left_type = state.left_title, state.left_type
+            right_title, right_type = state.right_title, state.right_type
             print(
                 f"Left: {left_title} (Type: {left_type}) | Right: {right_title} (Type: {right_type})"
             )
 
-            if not left_title or not right_title:
-                print(
-                    "Could not read titles. Attempting to wait and retry or stopping."
+            # Fetch scores using the titles and their expected types. Both sides are
+            # resolved concurrently, and usually were already prefetched during the wait.
+            with tracing.span("round.resolve_scores"):
+                left_score, right_score = resolver.resolve_pair(
+                    left_title, left_type, right_title, right_type
                 )
-                # You might want more robust handling here, e.g., wait longer, check score
-                if game_logic.get_current_score(
-                    driver
-                ) is None and game_logic._find_element(
-                    driver, game_logic.By.XPATH, game_logic.PLAY_BUTTON_XPATH
-                ):
-                    print("Titles missing and play button found. Assuming game over.")
-                    break
-                else:
-                    print("Continuing after short delay, but titles were missing.")
-                    time.sleep(ROUND_DELAY)
-                    continue  # Try next loop iteration
-
-            # Fetch scores using the titles and their expected types
-            left_score = get_or_fetch_score(left_title, left_type)
-            right_score = get_or_fetch_score(right_title, right_type)
+            resolved_at = time.monotonic()
 
             if left_score is None or right_score is None:
+                history_store.record_round(
+                    session_id, rounds_played, left_title, left_type, left_score,
+                    right_title, right_type, right_score, None,
+                    history_store.OUTCOME_UNRESOLVED,
+                    resolve_ms=(resolved_at - round_started) * 1000,
+                )
                 print("Could not determine scores for both titles.")
                 print("Assuming game over due to missing score data.")
                 break  # Exit loop if scores can't be found
@@ -117,93 +300,308 @@ def main():
             print(f"Scores -> Left: {left_score}, Right: {right_score}")
 
             # Determine which has the higher score and click
-            if right_score >= left_score:
-                print("Choosing RIGHT")
-                game_logic.make_choice(driver, "right")
-            else:
-                print("Choosing LEFT")
-                game_logic.make_choice(driver, "left")
-
-            print(f"Waiting {ROUND_DELAY} seconds for next round...")
-            time.sleep(ROUND_DELAY)
+            choice = "right" if right_score >= left_score else "left"
+            with tracing.span("round.choice"):
+                print(f"Choosing {choice.upper()}")
+                game_logic.make_choice(driver, choice)
+            clicked_at = time.monotonic()
+            first_choice_at = first_choice_at or clicked_at
+
+            # Returns as soon as the next round, the game over screen or an error shows up
+            outcome, state, elapsed = wait_for_next_round(
+                driver, right_title, last_score, resolver
+            )
+            transition_times.append(elapsed)
+            finished_at = time.monotonic()
+            history_store.record_round(
+                session_id, rounds_played, left_title, left_type, left_score,
+                right_title, right_type, right_score, choice, round_outcome(outcome),
+                resolve_ms=(resolved_at - round_started) * 1000,
+                choice_ms=(clicked_at - resolved_at) * 1000,
+                transition_ms=(finished_at - clicked_at) * 1000,
+                round_ms=(finished_at - round_started) * 1000,
+            )
 
-            # Get and print the current score after the choice
-            current_score = game_logic.get_current_score(driver)
-            if current_score is not None:
-                print(f"Current score: {current_score}")
-                high_score_session = max(high_score_session, current_score)
+            if state and state.score is not None:
+                print(f"Current score: {state.score}")
+                last_score = state.score
+                high_score_session = max(high_score_session, state.score)
                 print(f"Highest score this session: {high_score_session}")
-            else:
+
+    except Exception as e:
+        print(f"\nAn unexpected error occurred in the main loop: {e}")
+        error = str(e)
+    finally:
+        # Drop lookups for rounds that will never be played
+        resolver.cancel_pending()
+
+    final_rounds = rounds_played - 1 if rounds_played > 0 else 0
+    return {
+        "rounds": final_rounds,
+        "high_score": high_score_session,
+        "round_times": round_times,
+        "transition_times": transition_times,
+        "first_choice_at": first_choice_at,
+        "last_title": last_title,
+        "error": error,
+    }
+
+
+def log_result(session_id: int | None, final_rounds: int, high_score: int, duration_str: str):
+    """Appends one result line to RESULTS_FILE.
+
+    Lines are labelled "SESSION <history session id>", so nothing has to be read back
+    from the file and they never clash with the older hand-numbered "TEST n" lines.
+    The full per-round record lives in the history store (see history.py).
+    """
+    label = session_id if session_id is not None else "-"
+    result_line = f"SESSION {label}: played {final_rounds} rounds, highscore {high_score}, ran for {duration_str}\n"
+    try:
+        with open(RESULTS_FILE, "a") as f:
+            f.write(result_line)
+        print(f"Results logged to {RESULTS_FILE}")
+    except IOError as e:
+        print(f"Error writing results to {RESULTS_FILE}: {e}")
+
+
+def start_browser():
+    """Starts a browser and opens the game page. Returns the driver, or None on failure."""
+    driver = browser_handler.initialize_driver(
+        BROWSER_PROFILE, capture_network=HARVEST_TITLE_POOL, backend=DRIVER_BACKEND
+    )
+    if driver:
+        browser_handler.navigate_to_url(driver, GAME_URL)
+    return driver
+
+
+def prepare_cache():
+    """Opens the score DB (and snapshot) and the history store, and fills the title index."""
+    database_handler.setup_database()
+    history_store.setup_history()
+    if ADAPTIVE_WAITS:
+        wait_tuner.load()
+    title_index.add_many(database_handler.get_all_scores(TITLE_INDEX_LIMIT))
+    print(f"Indexed {len(title_index)} cached titles for local fuzzy matching.")
+
+
+def start_up():
+    """Launches the browser while the cache warms up and the Jikan session is built.
+
+    Returns:
+        The driver from start_browser(), or None if the browser could not be started.
+    """
+    with tracing.span("startup"), ThreadPoolExecutor(max_workers=3, thread_name_prefix="startup") as pool:
+        browser = pool.submit(start_browser)
+        cache = pool.submit(prepare_cache)
+        session = pool.submit(jikan_api.warm_session)
+        for future in (cache, session):
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Startup step failed: {e}")
+        return browser.result()
+
+
+def warm_title_pool(driver, resolver: ScoreResolver):
+    """Queues the uncached titles of the game's own pool for background resolution (HARVEST_TITLE_POOL)."""
+    if not HARVEST_TITLE_POOL:
+        return
+    with tracing.span("startup.harvest_pool"):
+        pool = browser_handler.harvest_title_pool(driver)
+    uncached = [
+        (title, anime_type) for title, anime_type in pool
+        if database_handler.get_score_from_db(title, anime_type) is None
+        and database_handler.get_miss_from_db(title) is None
+    ]
+    queued = resolver.queue_background(uncached)
+    print(f"Title pool: harvested {len(pool)} titles, queued {queued} uncached for background lookup.")
+
+
+def browser_needs_recycling(driver, games_in_browser: int) -> bool:
+    """Decides whether the browser should be restarted before the next game."""
+    if not browser_handler.is_driver_alive(driver):
+        print("Browser is no longer responding.")
+        return True
+    if GAMES_PER_BROWSER and games_in_browser >= GAMES_PER_BROWSER:
+        print(f"Browser has played {games_in_browser} games; recycling it.")
+        return True
+    memory_mb = browser_handler.get_browser_memory_mb(driver)
+    if memory_mb is not None:
+        print(f"Browser memory: {memory_mb:.0f} MB")
+        if MAX_BROWSER_MEMORY_MB and memory_mb > MAX_BROWSER_MEMORY_MB:
+            print(f"Browser memory above {MAX_BROWSER_MEMORY_MB} MB; recycling it.")
+            return True
+    return False
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Anime Higher or Lower bot.")
+    parser.add_argument(
+        "--continuous",
+        action="store_true",
+        default=CONTINUOUS_MODE,
+        help="Keep playing new games in the same browser until stopped.",
+    )
+    parser.add_argument(
+        "--games",
+        type=int,
+        default=MAX_GAMES,
+        help="Stop after this many games in continuous mode (default: no limit).",
+    )
+    parser.add_argument(
+        "--trace",
+        nargs="?",
+        const=tracing.DEFAULT_TRACE_FILE,
+        help=f"Record per-round phase timings as JSON lines (default file: {tracing.DEFAULT_TRACE_FILE}) "
+        f"and print latency percentiles at the end. Also enabled by ${tracing.TRACE_ENV_VAR}.",
+    )
+    parser.add_argument(
+        "--harvest-pool",
+        action="store_true",
+        default=HARVEST_TITLE_POOL,
+        help="Read the game's title pool from its network traffic and resolve uncached titles before play.",
+    )
+    return parser.parse_args()
+
+
+def run_bot(continuous: bool, max_games: int | None, report_result=None,
+            worker_id: int | None = None) -> int:
+    """Sets up the DB, index and browser, then plays one game (or many in continuous mode).
+
+    Args:
+        continuous: Keep starting new games in the same browser after game over.
+        max_games: Stop after this many games in continuous mode (None = no limit).
+        report_result: Called with each game's result dict ("rounds", "high_score",
+            "round_times", "transition_times", "first_choice_at", "last_title", "duration_s", "duration_str", "error",
+            "session_id", and for the first game "time_to_first_decision_s"). Defaults to
+            appending to RESULTS_FILE.
+        worker_id: Supervisor worker id, stored with each history session.
+
+    Returns:
+        The number of games played.
+    """
+    start_time = datetime.datetime.now()  # Record start time
+    started = time.monotonic()
+    print(f"Starting Anime Game Bot at {start_time.strftime('%Y-%m-%d %H:%M:%S')}...")
+    driver = start_up()
+    print(f"Startup took {time.monotonic() - started:.2f}s.")
+
+    if not driver:
+        print("Failed to initialize browser. Exiting.")
+        return 0
+
+    # Background lookups: titles are resolved as soon as they appear on screen.
+    # The resolver, DB connections and caches stay warm across games.
+    resolver = ScoreResolver(get_or_fetch_score)
+    # Under the supervisor only the first worker refreshes, so entries are not fetched twice
+    if REFRESH_STALE_SCORES and worker_id in (None, 1):
+        score_refresh.start_background(on_refreshed=title_index.set_scores)
+    games_played = 0
+    games_in_browser = 0
+    last_title = None # Last round of the previous game, possibly still drawn when play is clicked
+
+    try:
+        while True:
+            game_start = datetime.datetime.now()
+            session_id = history_store.start_session(worker_id)
+            result = play_game(driver, resolver, session_id, last_title)
+            last_title = result["last_title"]
+            games_played += 1
+            games_in_browser += 1
+
+            duration = datetime.datetime.now() - game_start
+            duration_str = str(duration).split(".")[0]  # Format duration nicely (HH:MM:SS)
+            result["duration_s"] = duration.total_seconds()
+            result["duration_str"] = duration_str
+            result["session_id"] = session_id
+            if games_played == 1 and result["first_choice_at"] is not None:
+                result["time_to_first_decision_s"] = result["first_choice_at"] - started
+                print(f"Time to first decision: {result['time_to_first_decision_s']:.2f}s after start.")
+            history_store.end_session(
+                session_id, result["rounds"], result["high_score"], result["duration_s"], result["error"]
+            )
+            if ADAPTIVE_WAITS:
+                wait_tuner.save()
+            print(f"\nGame finished after {result['rounds']} successful choices.")
+            print(f"Highest score achieved this session: {result['high_score']}")
+            print(f"Total runtime: {duration_str}")
+            timings = result["transition_times"]
+            if timings:
                 print(
-                    "Could not read current score. Checking for game over condition..."
+                    f"Round transitions: {len(timings)} waited, "
+                    f"avg {sum(timings) / len(timings):.2f}s, max {max(timings):.2f}s"
                 )
-                # Check if the play button reappeared, indicating game over
-                time.sleep(
-                    1
-                )  # Short wait for elements to potentially update after score read fails
-                if game_logic._find_element(
-                    driver, game_logic.By.XPATH, game_logic.PLAY_BUTTON_XPATH
-                ):
-                    print("Play button detected after score read failure. Game over.")
-                    break  # Exit the loop
-                else:
-                    print(
-                        "Score read failed, but play button not found. Potential issue or brief transition."
-                    )
-                    # Decide whether to break or continue cautiously
-                    # For now, let's break to be safe
-                    print("Stopping due to score read failure.")
+            if report_result:
+                report_result(result)
+            else:
+                log_result(session_id, result["rounds"], result["high_score"], duration_str)
+
+            if not continuous or (max_games and games_played >= max_games):
+                break
+            if result["error"] or browser_needs_recycling(driver, games_in_browser):
+                print("\nRestarting browser...")
+                browser_handler.close_driver(driver)
+                driver = start_browser()
+                games_in_browser = 0
+                last_title = None
+                if not driver:
+                    print("Failed to restart browser. Exiting.")
                     break
+            print(f"\nStarting game {games_played + 1}...")
 
-    except Exception as e:
-        print(f"\nAn unexpected error occurred in the main loop: {e}")
+    except KeyboardInterrupt:
+        print("\nInterrupted; stopping.")
     finally:
-        end_time = datetime.datetime.now()  # Record end time
-        duration = end_time - start_time
-        duration_str = str(duration).split(".")[0]  # Format duration nicely (HH:MM:SS)
-
-        final_rounds = rounds_played - 1 if rounds_played > 0 else 0
-        print(f"\nGame finished after {final_rounds} successful choices.")
-        print(f"Highest score achieved this session: {high_score_session}")
-        print(f"Total runtime: {duration_str}")
-
-        # Log results to file
-        try:
-            # Determine the next test number
-            test_num = 1
-            if os.path.exists(RESULTS_FILE):
-                with open(RESULTS_FILE, "r") as f:
-                    lines = f.readlines()
-                    if lines:
-                        last_line = lines[-1].strip()
-                        if last_line.startswith("TEST"):
-                            try:
-                                test_num = (
-                                    int(last_line.split(":")[0].split(" ")[1]) + 1
-                                )
-                            except (IndexError, ValueError):
-                                print(
-                                    f"Warning: Could not parse last test number from '{RESULTS_FILE}'. Starting from 1."
-                                )
-                                test_num = len(lines) + 1  # Fallback if parsing fails
-
-            # Format the result string
-            result_line = f"TEST {test_num}: played {final_rounds} rounds, highscore {high_score_session}, ran for {duration_str}\n"
-
-            # Append to the file
-            with open(RESULTS_FILE, "a") as f:
-                f.write(result_line)
-            print(f"Results logged to {RESULTS_FILE}")
-
-        except IOError as e:
-            print(f"Error writing results to {RESULTS_FILE}: {e}")
-        except Exception as e:
-            print(f"An unexpected error occurred during results logging: {e}")
+        score_refresh.stop_background()
+        resolver.shutdown()
+        jikan_async.close()
+        total = datetime.datetime.now() - start_time
+        print(f"\nPlayed {games_played} game(s) in {str(total).split('.')[0]}.")
+        tracing.print_summary()
+        if ADAPTIVE_WAITS:
+            wait_tuner.save()
+            print(f"Learned page timings:\n{wait_tuner.summary()}")
 
         # Close browser gracefully
         print("\nClosing browser...")
         browser_handler.close_driver(driver)
+        database_handler.close_connections()
+        history_store.close()
+
+    return games_played
 
+
+def run_worker(worker_id: int, rate_limiter, results_queue, max_games: int | None):
+    """Entry point of a supervisor worker process (see supervisor.py).
+
+    Plays continuously with its own browser, shares the Jikan rate budget of every
+    other worker through `rate_limiter`, and sends each game's result to the supervisor.
+    Exits with status 1 if it stopped before playing `max_games` (e.g. the browser
+    could not be started), so the supervisor restarts it.
+    """
+    jikan_api.rate_limiter = rate_limiter
+    tracing.enable_from_env(suffix=f"-worker{worker_id}")
+
+    def report_result(result: dict):
+        result["worker_id"] = worker_id
+        results_queue.put(result)
+
+    games_played = run_bot(
+        continuous=True, max_games=max_games, report_result=report_result, worker_id=worker_id
+    )
+    if max_games is None or games_played < max_games:
+        sys.exit(1)
+
+
+def main():
+    global HARVEST_TITLE_POOL
+    args = parse_args()
+    HARVEST_TITLE_POOL = args.harvest_pool
+    if args.trace:
+        tracing.enable(args.trace)
+    else:
+        tracing.enable_from_env()
+    run_bot(args.continuous, args.games)
     print("\nBot finished.")
 
 
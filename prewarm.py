@@ -0,0 +1,141 @@
+# prewarm.py - Fills the score database from Jikan's listing endpoints ahead of play
+
+import argparse
+import time
+
+import handlers.database_handler as database_handler
+import handlers.jikan_api as jikan_api
+import handlers.jikan_async as jikan_async
+from handlers import matching, score_refresh
+
+# Listing endpoints that can be crawled, by source name
+SOURCES = {
+    "top": "/top/anime",  # All ranked anime, most popular entries first
+    "season": "/seasons/now",  # The current season
+}
+DEFAULT_SOURCES = ["top", "season"]
+PAGES_PER_BATCH = 4  # Pages written (and checkpointed) per DB transaction
+
+
+def entry_to_rows(entry: dict) -> list[tuple[str, float, str | None, int | None]]:
+    """Turns one Jikan anime entry into (title, score, type, mal_id) rows for the DB.
+
+    The English title and synonyms are stored as aliases as well, since the game
+    sometimes shows those. Entries without a score are skipped.
+    """
+    score = entry.get("score")
+    if score is None:
+        return []
+    anime_type = entry.get("type")
+    mal_id = entry.get("mal_id")
+    return [(title, float(score), anime_type, mal_id) for title in matching.entry_names(entry)]
+
+
+def crawl_source(source: str, max_pages: int | None = None) -> int:
+    """Crawls one listing endpoint page by page, resuming from its checkpoint.
+
+    Args:
+        source: A key of SOURCES.
+        max_pages: Stop after this many pages in this run (None = until the last page).
+
+    Returns:
+        The number of rows written.
+    """
+    path = SOURCES[source]
+    checkpoint = database_handler.get_prewarm_checkpoint(source)
+    if checkpoint and checkpoint[1]:
+        print(f"Prewarm: '{source}' already fully crawled (use --restart to crawl again).")
+        return 0
+    page = checkpoint[0] if checkpoint else 1
+    if page > 1:
+        print(f"Prewarm: Resuming '{source}' at page {page}.")
+
+    written = 0
+    pages_this_run = 0
+    pending_rows = []
+    finished = False
+    while max_pages is None or pages_this_run < max_pages:
+        try:
+            data = jikan_async.get_json(path, {"page": page})
+        except Exception as e:
+            print(f"Prewarm: Error fetching '{source}' page {page}: {e}")
+            break
+
+        for entry in data.get("data") or []:
+            pending_rows.extend(entry_to_rows(entry))
+        pages_this_run += 1
+        page += 1
+        finished = not (data.get("pagination") or {}).get("has_next_page")
+
+        if finished or pages_this_run % PAGES_PER_BATCH == 0:
+            database_handler.save_scores_batch(
+                pending_rows, checkpoint=(source, page, finished)
+            )
+            written += len(pending_rows)
+            print(f"Prewarm: '{source}' saved {written} rows, next page {page}.")
+            pending_rows = []
+        if finished:
+            break
+
+    if pending_rows:
+        # Stopped mid-batch (page limit or error): keep what was fetched
+        database_handler.save_scores_batch(
+            pending_rows, checkpoint=(source, page, finished)
+        )
+        written += len(pending_rows)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Prewarm the anime score database from Jikan listings."
+    )
+    parser.add_argument(
+        "--source",
+        action="append",
+        choices=sorted(SOURCES),
+        help="Listing to crawl (repeatable). Default: top and season.",
+    )
+    parser.add_argument(
+        "--max-pages", type=int, help="Maximum pages to fetch per source this run."
+    )
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="Ignore saved checkpoints and crawl from page 1.",
+    )
+    parser.add_argument(
+        "--refresh-stale",
+        action="store_true",
+        help="Instead of crawling, re-fetch scores older than the refresh age by MAL ID.",
+    )
+    parser.add_argument(
+        "--base-url",
+        help="Jikan API base URL (e.g. a local stand-in server).",
+    )
+    args = parser.parse_args()
+
+    if args.base_url:
+        jikan_api.JIKAN_API_BASE_URL = args.base_url.rstrip("/")
+
+    database_handler.setup_database()
+    start = time.monotonic()
+    total = 0
+    try:
+        if args.refresh_stale:
+            total = score_refresh.refresh_stale_scores()
+        else:
+            for source in args.source or DEFAULT_SOURCES:
+                if args.restart:
+                    database_handler.clear_prewarm_checkpoint(source)
+                total += crawl_source(source, args.max_pages)
+    except KeyboardInterrupt:
+        print("\nPrewarm interrupted; progress up to the last checkpoint is kept.")
+    finally:
+        jikan_async.close()
+        database_handler.close_connections()
+    print(f"Prewarm finished: {total} rows in {time.monotonic() - start:.1f}s.")
+
+
+if __name__ == "__main__":
+    main()
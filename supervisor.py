@@ -0,0 +1,153 @@
+# supervisor.py - Runs several bot instances in parallel and combines their results
+
+import argparse
+import datetime
+import multiprocessing
+import queue
+import time
+
+import handlers.database_handler as database_handler
+import handlers.jikan_api as jikan_api
+import main
+
+DEFAULT_WORKERS = max(multiprocessing.cpu_count() // 2, 1)  # Each worker runs its own browser
+MAX_RESTARTS = 5  # Restarts allowed per worker before it is given up on
+RESTART_BACKOFF = 5  # Seconds to wait before restarting a crashed worker (doubles each time)
+POLL_INTERVAL = 1  # Seconds between checks on the workers
+
+
+def start_worker(context, worker_id: int, rate_limiter, results_queue, max_games):
+    """Starts one worker process running main.run_worker."""
+    process = context.Process(
+        target=main.run_worker,
+        args=(worker_id, rate_limiter, results_queue, max_games),
+        name=f"bot-worker-{worker_id}",
+    )
+    process.start()
+    print(f"Supervisor: Started worker {worker_id} (pid {process.pid}).")
+    return process
+
+
+def record_result(stats: dict, result: dict):
+    """Adds one game's result to the per-worker stats and logs it."""
+    worker = stats.setdefault(
+        result["worker_id"], {"games": 0, "rounds": 0, "high_score": 0, "play_time_s": 0.0}
+    )
+    worker["games"] += 1
+    worker["rounds"] += result["rounds"]
+    worker["high_score"] = max(worker["high_score"], result["high_score"])
+    worker["play_time_s"] += result["duration_s"]
+    print(
+        f"Supervisor: Worker {result['worker_id']} finished a game: "
+        f"{result['rounds']} rounds, highscore {result['high_score']} in {result['duration_str']}."
+    )
+    # Only the supervisor writes the results file, so lines from different workers never collide
+    main.log_result(result["session_id"], result["rounds"], result["high_score"], result["duration_str"])
+
+
+def print_summary(stats: dict, started: float, restarts: dict):
+    """Prints per-worker and combined session stats."""
+    elapsed = time.monotonic() - started
+    print("\n=== Supervisor summary ===")
+    for worker_id in sorted(stats):
+        worker = stats[worker_id]
+        print(
+            f"Worker {worker_id}: {worker['games']} games, {worker['rounds']} rounds, "
+            f"highscore {worker['high_score']}, {restarts.get(worker_id, 0)} restarts"
+        )
+    total_games = sum(worker["games"] for worker in stats.values())
+    total_rounds = sum(worker["rounds"] for worker in stats.values())
+    best = max((worker["high_score"] for worker in stats.values()), default=0)
+    rounds_per_hour = total_rounds / elapsed * 3600 if elapsed > 0 else 0
+    print(
+        f"Total: {total_games} games, {total_rounds} rounds, highscore {best}, "
+        f"{rounds_per_hour:.0f} rounds/hour over {str(datetime.timedelta(seconds=int(elapsed)))}"
+    )
+
+
+def main_supervisor():
+    parser = argparse.ArgumentParser(
+        description="Run several bot workers in parallel with a shared score cache and API budget."
+    )
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_WORKERS, help="Number of worker processes."
+    )
+    parser.add_argument(
+        "--games",
+        type=int,
+        help="Games per worker before it stops (default: run until interrupted).",
+    )
+    args = parser.parse_args()
+
+    # "spawn" gives every worker a clean interpreter (no threads or sockets inherited)
+    context = multiprocessing.get_context("spawn")
+    # One Jikan budget for all workers together, not one per process
+    rate_limiter = jikan_api.SharedRateLimiter(context=context)
+    results_queue = context.Queue()
+
+    # The schema must exist before the workers start reading and writing concurrently
+    database_handler.setup_database()
+    database_handler.close_connections()
+
+    started = time.monotonic()
+    stats: dict = {}
+    restarts: dict[int, int] = {}
+    workers = {
+        worker_id: start_worker(context, worker_id, rate_limiter, results_queue, args.games)
+        for worker_id in range(1, args.workers + 1)
+    }
+    restart_at: dict[int, float] = {}  # worker id -> when a crashed worker may be restarted
+
+    try:
+        while workers or restart_at:
+            try:
+                record_result(stats, results_queue.get(timeout=POLL_INTERVAL))
+                continue
+            except queue.Empty:
+                pass
+
+            for worker_id, process in list(workers.items()):
+                if process.is_alive():
+                    continue
+                process.join()
+                del workers[worker_id]
+                if process.exitcode == 0:
+                    print(f"Supervisor: Worker {worker_id} finished.")
+                elif restarts.get(worker_id, 0) >= MAX_RESTARTS:
+                    print(
+                        f"Supervisor: Worker {worker_id} crashed (exit code {process.exitcode}) "
+                        f"too often; not restarting it."
+                    )
+                else:
+                    delay = RESTART_BACKOFF * 2 ** restarts.get(worker_id, 0)
+                    restarts[worker_id] = restarts.get(worker_id, 0) + 1
+                    print(
+                        f"Supervisor: Worker {worker_id} crashed (exit code {process.exitcode}); "
+                        f"restarting in {delay}s."
+                    )
+                    restart_at[worker_id] = time.monotonic() + delay
+
+            for worker_id, when in list(restart_at.items()):
+                if time.monotonic() >= when:
+                    del restart_at[worker_id]
+                    workers[worker_id] = start_worker(
+                        context, worker_id, rate_limiter, results_queue, args.games
+                    )
+    except KeyboardInterrupt:
+        print("\nSupervisor: Interrupted; stopping workers...")
+        for process in workers.values():
+            process.terminate()
+        for process in workers.values():
+            process.join()
+    finally:
+        # Collect results that arrived while shutting down
+        while True:
+            try:
+                record_result(stats, results_queue.get_nowait())
+            except queue.Empty:
+                break
+        print_summary(stats, started, restarts)
+
+
+if __name__ == "__main__":
+    main_supervisor()
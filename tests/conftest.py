@@ -0,0 +1,50 @@
+# conftest.py - Shared fixtures: a throwaway score DB and the bench's mock Jikan API
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (ROOT, os.path.join(ROOT, "bench")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+from handlers import database_handler, jikan_api, jikan_async
+from mock_jikan import MockJikan, start_server
+from title_pool import build_pool
+
+MOCK_POOL_SIZE = 130 # Six /top/anime pages of mock_jikan.PAGE_SIZE entries
+
+
+@pytest.fixture
+def score_db(tmp_path, monkeypatch):
+    """A fresh score database in a temporary directory."""
+    data_dir = str(tmp_path / "data")
+    monkeypatch.setattr(database_handler, "DATABASE_DIR", data_dir)
+    monkeypatch.setattr(database_handler, "DATABASE_PATH", os.path.join(data_dir, "anime_scores.db"))
+    monkeypatch.setattr(database_handler, "SNAPSHOT_PATH", os.path.join(data_dir, "anime_scores.snap"))
+    database_handler.clear_cache()
+    database_handler.setup_database()
+    yield database_handler
+    database_handler.close_connections()
+    database_handler.clear_cache()
+
+
+@pytest.fixture
+def catalog():
+    """The synthetic anime catalog served by mock_jikan (and the stand-in game page)."""
+    return build_pool(MOCK_POOL_SIZE)
+
+
+@pytest.fixture
+def mock_jikan(catalog, monkeypatch):
+    """The bench's mock Jikan API on a local port, with the bot pointed at it."""
+    api = MockJikan(catalog, rate_limits=((1000, 1.0),))
+    server = start_server(api)
+    monkeypatch.setattr(jikan_api, "JIKAN_API_BASE_URL", f"http://127.0.0.1:{server.server_port}/v4")
+    monkeypatch.setattr(jikan_api, "rate_limiter", jikan_api.RateLimiter(((1000, 1.0),)))
+    yield api
+    jikan_async.close()
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,111 @@
+# test_database_handler.py - Anime/alias storage: shared names, orphan cleanup and migrations
+
+import os
+import sqlite3
+
+import pytest
+
+from handlers import database_handler
+
+
+@pytest.fixture
+def db_paths(tmp_path, monkeypatch):
+    """Points the database at a temporary directory without setting it up (for pre-existing files)."""
+    data_dir = str(tmp_path / "data")
+    os.makedirs(data_dir)
+    monkeypatch.setattr(database_handler, "DATABASE_DIR", data_dir)
+    monkeypatch.setattr(database_handler, "DATABASE_PATH", os.path.join(data_dir, "anime_scores.db"))
+    monkeypatch.setattr(database_handler, "SNAPSHOT_PATH", os.path.join(data_dir, "anime_scores.snap"))
+    database_handler.clear_cache()
+    yield database_handler.DATABASE_PATH
+    database_handler.close_connections()
+    database_handler.clear_cache()
+
+
+def anime_count(db) -> int:
+    return db._get_connection().execute(f"SELECT COUNT(*) FROM {db.ANIME_TABLE_NAME}").fetchone()[0]
+
+
+def test_synonym_does_not_take_over_another_anime_title(score_db):
+    score_db.save_anime(136, "Hunter x Hunter", 8.41, "TV", [])
+    score_db.save_anime(11061, "Hunter x Hunter (2011)", 9.04, "TV", ["Hunter x Hunter"])
+
+    # The 1999 series keeps its own title; the 2011 one still owns its canonical title
+    assert score_db.get_score_from_db("Hunter x Hunter") == 8.41
+    assert score_db.get_score_from_db("Hunter x Hunter (2011)") == 9.04
+    # Saving in the other order gives the same answer
+    score_db.save_anime(136, "Hunter x Hunter", 8.41, "TV", [])
+    assert score_db.get_score_from_db("Hunter x Hunter") == 8.41
+
+
+def test_shared_name_resolves_by_expected_type(score_db):
+    score_db.save_anime(1, "Kara no Kyoukai", 8.0, "Movie", ["The Garden of Sinners"])
+    score_db.save_anime(2, "Kara no Kyoukai Recap", 6.5, "Special", ["The Garden of Sinners"])
+
+    assert score_db.get_score_from_db("The Garden of Sinners", "Special") == 6.5
+    assert score_db.get_score_from_db("The Garden of Sinners", "Movie") == 8.0
+    # The cached candidates are ranked per call, not per first lookup
+    assert score_db.get_score_from_db("The Garden of Sinners", "Special") == 6.5
+
+
+def test_provisional_anime_is_dropped_once_its_title_resolves(score_db):
+    score_db.save_score_to_db("Some Show", 7.0, "TV")
+    assert anime_count(score_db) == 1
+
+    score_db.save_anime(42, "Some Show: Official", 7.5, "TV", ["Some Show"])
+
+    # The stand-in lost its only alias, so the orphan trigger removed it
+    assert anime_count(score_db) == 1
+    assert score_db.get_score_from_db("Some Show") == 7.5
+    assert score_db.get_score_from_db("Some Show", "TV") == 7.5
+
+
+def test_anime_keeps_row_while_it_has_aliases(score_db):
+    score_db.save_score_to_db("Show A", 7.0)
+    assert score_db.link_alias("Show A Alt", "Show A")
+    score_db.save_anime(7, "Show A Alt", 8.0, "TV", [])
+
+    # "Show A" still reaches the stand-in; only its "Show A Alt" link was replaced
+    assert anime_count(score_db) == 2
+    assert score_db.get_score_from_db("Show A") == 7.0
+    assert score_db.get_score_from_db("Show A Alt") == 8.0
+
+
+def test_legacy_scores_table_is_migrated(db_paths):
+    with sqlite3.connect(db_paths) as conn:
+        conn.execute("CREATE TABLE anime_scores (title TEXT PRIMARY KEY, score REAL NOT NULL, anime_type TEXT)")
+        conn.executemany("INSERT INTO anime_scores VALUES (?, ?, ?)", [
+            ("Cowboy Bebop", 8.75, "tv"),
+            ("Cowboy Bebop!", 1.0, "tv"), # Same key as the first row; dropped
+            ("Perfect Blue", 8.3, None),
+            ("!!!", 5.0, None), # Empty key; dropped
+        ])
+    conn.close()
+
+    database_handler.setup_database()
+
+    conn = database_handler._get_connection()
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'anime_scores'").fetchone() is None
+    assert anime_count(database_handler) == 2
+    assert database_handler.get_score_from_db("cowboy bebop") == 8.75
+    assert database_handler.get_score_from_db("Perfect Blue") == 8.3
+    assert conn.execute("SELECT anime_type FROM anime WHERE title = 'Cowboy Bebop'").fetchone() == ("TV",)
+
+
+def test_single_anime_alias_table_is_migrated(db_paths):
+    with sqlite3.connect(db_paths) as conn:
+        conn.execute("""CREATE TABLE anime (id INTEGER PRIMARY KEY, mal_id INTEGER UNIQUE, title TEXT NOT NULL,
+                        anime_type TEXT, score REAL NOT NULL, fetched_at REAL NOT NULL)""")
+        conn.execute("CREATE TABLE anime_aliases (alias TEXT PRIMARY KEY, title TEXT NOT NULL, anime_id INTEGER NOT NULL)")
+        conn.execute("INSERT INTO anime VALUES (1, 136, 'Hunter x Hunter', 'TV', 8.41, 1.0)")
+        conn.execute("INSERT INTO anime_aliases VALUES ('hunter x hunter', 'Hunter x Hunter', 1)")
+    conn.close()
+
+    database_handler.setup_database()
+    database_handler.save_anime(11061, "Hunter x Hunter (2011)", 9.04, "TV", ["Hunter x Hunter"])
+
+    conn = database_handler._get_connection()
+    assert conn.execute(
+        "SELECT anime_id, canonical FROM anime_aliases WHERE alias = 'hunter x hunter' ORDER BY anime_id"
+    ).fetchall() == [(1, 1), (2, 0)]
+    assert database_handler.get_score_from_db("Hunter x Hunter") == 8.41
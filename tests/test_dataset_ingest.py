@@ -0,0 +1,93 @@
+# test_dataset_ingest.py - Streaming CSV / JSON / JSON Lines dumps into score rows and the database
+
+import json
+
+import pytest
+
+from handlers import dataset_ingest
+
+RECORDS = [
+    {"mal_id": 1, "title": "Cowboy Bebop", "title_english": "Cowboy Bebop", "type": "TV", "score": 8.75,
+     "title_synonyms": ["Kaubooi Bibappu"]},
+    {"mal_id": 5114, "title": "Fullmetal Alchemist: Brotherhood", "title_english": None, "type": "TV",
+     "score": 9.1, "title_synonyms": []},
+    {"mal_id": 99, "title": "Unaired Show", "title_english": None, "type": "TV", "score": None,
+     "title_synonyms": []}, # No score yet; skipped
+]
+CSV_WITH_IDS = """anime_id,Name,English name,Other name,Score,Type
+1,Cowboy Bebop,Cowboy Bebop,Kaubooi Bibappu,8.75,TV
+5114,Fullmetal Alchemist: Brotherhood,UNKNOWN,,9.1,TV
+99,Unaired Show,UNKNOWN,,UNKNOWN,TV
+"""
+CSV_WITHOUT_IDS = """name,score,type
+Cowboy Bebop,8.75,tv
+Fullmetal Alchemist: Brotherhood,9.1,TV
+"""
+EXPECTED_ROWS = [
+    ("Cowboy Bebop", 8.75, "TV", 1),
+    ("Kaubooi Bibappu", 8.75, "TV", 1),
+    ("Fullmetal Alchemist: Brotherhood", 9.1, "TV", 5114),
+]
+
+
+def write(tmp_path, name: str, text: str) -> str:
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture(params=["list", "data", "data_after_other_keys"])
+def json_dump(request, tmp_path):
+    if request.param == "list":
+        document = RECORDS
+    elif request.param == "data":
+        document = {"data": RECORDS}
+    else: # The array before "data" must not be taken for the records
+        document = {"pagination": {"pages": [1, 2]}, "count": 1234567, "data": RECORDS}
+    return write(tmp_path, "anime.json", json.dumps(document, indent=1))
+
+
+def test_csv_with_mal_ids(tmp_path):
+    path = write(tmp_path, "anime.csv", CSV_WITH_IDS)
+    assert list(dataset_ingest.iter_rows(path)) == EXPECTED_ROWS
+
+
+def test_csv_without_mal_ids(tmp_path):
+    path = write(tmp_path, "anime.csv", CSV_WITHOUT_IDS)
+    assert list(dataset_ingest.iter_rows(path)) == [
+        ("Cowboy Bebop", 8.75, "TV", None), ("Fullmetal Alchemist: Brotherhood", 9.1, "TV", None),
+    ]
+
+
+def test_json_dump(json_dump, monkeypatch):
+    monkeypatch.setattr(dataset_ingest, "READ_CHUNK_SIZE", 7) # Values split across chunks
+    assert list(dataset_ingest.iter_rows(json_dump)) == EXPECTED_ROWS
+
+
+def test_jsonl_dump(tmp_path):
+    path = write(tmp_path, "anime.jsonl", "\n".join(json.dumps(record) for record in RECORDS) + "\n\n")
+    assert list(dataset_ingest.iter_rows(path)) == EXPECTED_ROWS
+
+
+@pytest.mark.parametrize("text", [
+    "42",
+    '"Cowboy Bebop"',
+    '{"items": [{"title": "Cowboy Bebop", "score": 8.75}]}',
+    '{"data": {"title": "Cowboy Bebop", "score": 8.75}}',
+    '[{"title": "Cowboy Bebop", "score": 8.75},',
+])
+def test_unsupported_or_truncated_json_is_rejected(tmp_path, text):
+    path = write(tmp_path, "anime.json", text)
+    with pytest.raises(ValueError):
+        list(dataset_ingest.iter_rows(path))
+
+
+def test_ingest_with_and_without_mal_ids(tmp_path, score_db):
+    assert score_db.ingest_dataset(write(tmp_path, "plain.csv", CSV_WITHOUT_IDS)) == 2
+    assert score_db.ingest_dataset(write(tmp_path, "anime.jsonl", "\n".join(map(json.dumps, RECORDS)))) == 3
+
+    assert score_db.get_score_from_db("Kaubooi Bibappu") == 8.75
+    assert score_db.get_score_from_db("Fullmetal Alchemist Brotherhood") == 9.1
+    # The MAL entries replaced the stand-ins created by the ID-less dump
+    conn = score_db._get_connection()
+    assert conn.execute("SELECT mal_id FROM anime ORDER BY mal_id").fetchall() == [(1,), (5114,)]
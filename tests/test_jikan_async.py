@@ -0,0 +1,87 @@
+# test_jikan_async.py - Single-flight lookups and cancellation of the async client against the mock Jikan API
+
+import asyncio
+import threading
+import time
+
+from handlers import jikan_api, jikan_async
+from handlers.jikan_async import AsyncJikanClient, CancelScope, cancel_scope
+
+LATENCY_MS = 300 # Long enough for concurrent callers to overlap on one request
+
+
+def test_concurrent_searches_share_one_request(mock_jikan):
+    mock_jikan.latency_ms = LATENCY_MS
+    entry = mock_jikan.pool[0]
+    spellings = [entry["api_title"], entry["api_title"].upper(), f"{entry['api_title']}!"] * 2
+    results = [None] * len(spellings)
+
+    def look_up(position, title):
+        results[position] = jikan_async.search_anime_score(title, entry["type"])
+
+    threads = [threading.Thread(target=look_up, args=item) for item in enumerate(spellings)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert mock_jikan.stats["search"] == 1
+    for match, miss_reason in results:
+        assert miss_reason is None and match["mal_id"] == entry["mal_id"]
+
+
+def test_shared_request_survives_until_its_last_waiter_cancels(mock_jikan):
+    mock_jikan.latency_ms = LATENCY_MS
+    title = mock_jikan.pool[0]["api_title"]
+
+    async def scenario():
+        client = AsyncJikanClient()
+        first = asyncio.ensure_future(client.search_anime_score(title))
+        second = asyncio.ensure_future(client.search_anime_score(title))
+        await asyncio.sleep(0.05)
+        (shared, waiters), = client._in_flight.values()
+        assert waiters == 2
+
+        first.cancel() # The other caller still waits, so the request keeps going
+        await asyncio.sleep(0.05)
+        assert not shared.cancelled() and client._in_flight
+
+        second.cancel() # Nobody waits any more: the request is abandoned
+        await asyncio.gather(first, second, return_exceptions=True)
+        await asyncio.sleep(0)
+        return shared.cancelled(), client._in_flight
+
+    cancelled, in_flight = asyncio.run(scenario())
+    assert cancelled and not in_flight
+
+
+def test_cancel_scope_cancels_running_lookup(mock_jikan):
+    mock_jikan.latency_ms = 2000
+    scope = CancelScope()
+    results = []
+
+    def look_up():
+        with cancel_scope(scope):
+            started = time.monotonic()
+            results.append(jikan_async.search_anime_score(mock_jikan.pool[0]["api_title"]))
+            results.append(time.monotonic() - started)
+            # Joining a scope that was already cancelled cancels at once
+            results.append(jikan_async.search_anime_score(mock_jikan.pool[1]["api_title"]))
+
+    thread = threading.Thread(target=look_up)
+    thread.start()
+    time.sleep(0.2)
+    assert scope.cancel() == 1
+    thread.join()
+
+    assert results[0] == (None, jikan_api.MISS_CANCELLED)
+    assert results[1] < 1.0
+    assert results[2] == (None, jikan_api.MISS_CANCELLED)
+
+
+def test_unexpected_error_is_a_request_error_miss(mock_jikan, monkeypatch):
+    def broken_match(title, expected_type, data):
+        raise KeyError("score")
+
+    monkeypatch.setattr(jikan_api, "pick_best_match", broken_match)
+    assert jikan_async.search_anime_score(mock_jikan.pool[0]["api_title"]) == (None, jikan_api.MISS_REQUEST_ERROR)
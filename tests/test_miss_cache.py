@@ -0,0 +1,71 @@
+# test_miss_cache.py - Negative cache of unresolved titles: doubling TTL, expiry and transient failures
+
+import pytest
+
+import main
+from handlers import database_handler, jikan_api
+from handlers.title_index import TitleIndex
+
+MISSING_TITLE = "Qwzx Vbnm Plkj" # Shares no word with the mock catalog
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(database_handler.time, "time", clock.time)
+    return clock
+
+
+def is_miss(db, title: str) -> bool:
+    return db.get_miss_from_db(title) is not None
+
+
+def test_miss_ttl_doubles_per_repeat_and_expires(score_db, clock):
+    ttl = score_db.MISS_TTL
+    for attempt in range(1, 4):
+        score_db.save_miss_to_db(MISSING_TITLE, jikan_api.MISS_NO_RESULTS)
+        assert score_db.get_miss_from_db(MISSING_TITLE) == jikan_api.MISS_NO_RESULTS
+        clock.now += ttl - 1
+        assert is_miss(score_db, MISSING_TITLE)
+        score_db.clear_cache() # Read back from SQLite, as a fresh process would
+        assert is_miss(score_db, MISSING_TITLE)
+        clock.now += 1
+        assert not is_miss(score_db, MISSING_TITLE) # Expired: looked up again
+        ttl *= 2
+
+
+def test_miss_ttl_is_capped(score_db, clock):
+    for _ in range(20):
+        score_db.save_miss_to_db(MISSING_TITLE, jikan_api.MISS_BELOW_THRESHOLD)
+    clock.now += score_db.MISS_TTL_MAX - 1
+    assert is_miss(score_db, MISSING_TITLE)
+    clock.now += 1
+    assert not is_miss(score_db, MISSING_TITLE)
+
+
+def test_not_found_is_cached_and_skips_the_api(mock_jikan, score_db, monkeypatch):
+    monkeypatch.setattr(main, "title_index", TitleIndex())
+    assert main.get_or_fetch_score(MISSING_TITLE, "TV") is None
+    assert score_db.get_miss_from_db(MISSING_TITLE) in (jikan_api.MISS_NO_RESULTS, jikan_api.MISS_BELOW_THRESHOLD)
+
+    assert main.get_or_fetch_score(MISSING_TITLE, "TV") is None
+    assert mock_jikan.stats["search"] == 1
+
+
+@pytest.mark.parametrize("reason", jikan_api.TRANSIENT_MISSES)
+def test_transient_misses_are_not_cached(score_db, monkeypatch, reason):
+    monkeypatch.setattr(main, "title_index", TitleIndex())
+    monkeypatch.setattr(main.jikan_async, "search_anime_score", lambda title, expected_type: (None, reason))
+
+    assert main.get_or_fetch_score(MISSING_TITLE, "TV") is None
+    assert not is_miss(score_db, MISSING_TITLE)
+    score_db.clear_cache()
+    assert not is_miss(score_db, MISSING_TITLE)
@@ -0,0 +1,55 @@
+# test_prewarm.py - Catalog crawl against the mock Jikan API: resume, checkpoints and --restart
+
+import sys
+
+import prewarm
+from handlers import jikan_api
+
+TOP_PAGES = 6 # conftest.MOCK_POOL_SIZE entries at mock_jikan.PAGE_SIZE per page
+
+
+def run_prewarm(monkeypatch, mock_jikan, *args):
+    """Runs prewarm.py's command line against the mock API; returns the listing pages it fetched."""
+    before = mock_jikan.stats["listing"]
+    monkeypatch.setattr(
+        sys, "argv", ["prewarm.py", "--source", "top", "--base-url", jikan_api.JIKAN_API_BASE_URL, *args]
+    )
+    prewarm.main()
+    return mock_jikan.stats["listing"] - before
+
+
+def test_crawl_stores_every_entry(monkeypatch, mock_jikan, score_db):
+    assert run_prewarm(monkeypatch, mock_jikan) == TOP_PAGES
+
+    assert score_db.get_prewarm_checkpoint("top") == (TOP_PAGES + 1, True)
+    for entry in mock_jikan.pool:
+        assert score_db.get_score_from_db(entry["api_title"]) == entry["score"]
+        assert score_db.get_score_from_db(entry["title_english"]) == entry["score"]
+
+
+def test_interrupted_crawl_resumes_from_checkpoint(monkeypatch, mock_jikan, score_db):
+    # --max-pages stops mid-batch; the fetched pages are kept and checkpointed
+    assert run_prewarm(monkeypatch, mock_jikan, "--max-pages", "2") == 2
+    assert score_db.get_prewarm_checkpoint("top") == (3, False)
+    ranked = sorted(mock_jikan.pool, key=lambda e: e["score"], reverse=True)
+    assert score_db.get_score_from_db(ranked[0]["api_title"]) == ranked[0]["score"]
+    assert score_db.get_score_from_db(ranked[-1]["api_title"]) is None
+
+    # The next run fetches only the remaining pages
+    assert run_prewarm(monkeypatch, mock_jikan) == TOP_PAGES - 2
+    assert score_db.get_prewarm_checkpoint("top") == (TOP_PAGES + 1, True)
+    assert score_db.get_score_from_db(ranked[-1]["api_title"]) == ranked[-1]["score"]
+
+
+def test_finished_source_is_not_crawled_again(monkeypatch, mock_jikan, score_db):
+    run_prewarm(monkeypatch, mock_jikan)
+
+    assert run_prewarm(monkeypatch, mock_jikan) == 0
+    assert score_db.get_prewarm_checkpoint("top") == (TOP_PAGES + 1, True)
+
+
+def test_restart_crawls_from_first_page(monkeypatch, mock_jikan, score_db):
+    run_prewarm(monkeypatch, mock_jikan, "--max-pages", "3")
+
+    assert run_prewarm(monkeypatch, mock_jikan, "--restart") == TOP_PAGES
+    assert score_db.get_prewarm_checkpoint("top") == (TOP_PAGES + 1, True)
@@ -0,0 +1,73 @@
+# test_rate_limiter.py - Sliding-window budget of the Jikan rate limiters, in one process and across processes
+
+import multiprocessing
+
+import pytest
+
+from handlers import jikan_api
+from handlers.jikan_api import RateLimiter, SharedRateLimiter
+
+LIMITS = ((3, 1.0), (5, 10.0))
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(jikan_api.time, "monotonic", clock.monotonic)
+    return clock
+
+
+@pytest.fixture(params=[RateLimiter, SharedRateLimiter])
+def limiter(request):
+    return request.param(LIMITS)
+
+
+def test_reserve_returns_delay_of_tightest_window(limiter, clock):
+    assert [limiter.reserve() for _ in range(3)] == [0, 0, 0]
+    clock.now += 0.25
+    assert limiter.reserve() == pytest.approx(0.75) # 3/s: the first request must leave the window
+    assert limiter.reserve() == pytest.approx(0.75) # Refused reservations claim nothing
+
+    clock.now += 0.75
+    assert [limiter.reserve() for _ in range(2)] == [0, 0]
+    clock.now += 1.0
+    assert limiter.reserve() == pytest.approx(8.0) # 5 per 10s: until the first of the five is 10s old
+
+
+def test_block_for_pauses_every_request(limiter, clock):
+    limiter.block_for(5.0)
+    limiter.block_for(1.0) # A shorter block does not shorten the longer one
+    assert limiter.reserve() == pytest.approx(5.0)
+    clock.now += 5.0
+    assert limiter.reserve() == 0
+
+
+def _claim_slots(limiter: SharedRateLimiter, count: int):
+    for _ in range(count):
+        limiter.acquire()
+
+
+def test_spawned_processes_share_one_budget():
+    # Wide enough that the second limit never blocks, but the ring keeps all ten request times
+    limits, requests_per_worker = ((2, 0.3), (10, 60.0)), 5
+    context = multiprocessing.get_context("spawn")
+    limiter = SharedRateLimiter(limits, context=context)
+    workers = [context.Process(target=_claim_slots, args=(limiter, requests_per_worker)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+        assert worker.exitcode == 0
+
+    times = sorted(limiter._request_time(back) for back in range(1, 11))
+    assert float("-inf") not in times # Both workers' requests landed in the shared ring
+    for earlier, later in zip(times, times[2:]):
+        assert later - earlier >= 0.3 - 1e-6 # Never more than 2 requests in any 0.3s window
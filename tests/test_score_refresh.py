@@ -0,0 +1,28 @@
+# test_score_refresh.py - Refreshing stale entries by MAL ID against the mock Jikan API
+
+from handlers import score_refresh
+from handlers.matching import normalize_title
+from handlers.title_index import TitleIndex
+
+
+def test_refresh_updates_db_cache_and_title_index(mock_jikan, score_db):
+    entry, other = mock_jikan.pool[:2]
+    anime_id = score_db.save_anime(entry["mal_id"], entry["api_title"], 1.0, entry["type"], [entry["title"]])
+    other_id = score_db.save_anime(other["mal_id"], other["api_title"], 2.0, other["type"], [])
+    score_db._get_connection().execute("UPDATE anime SET fetched_at = 0 WHERE id = ?", (anime_id,))
+    score_db._get_connection().commit()
+    index = TitleIndex()
+    index.add(entry["title"], 1.0, entry["type"], anime_id)
+    index.add(other["api_title"], 2.0, other["type"], other_id, True)
+    assert score_db.get_score_from_db(entry["title"]) == 1.0 # Cached before the refresh
+    assert score_db.get_score_from_db(other["api_title"]) == 2.0
+
+    assert score_refresh.refresh_stale_scores(on_refreshed=index.set_scores) == 1
+
+    assert mock_jikan.stats["by_id"] == 1
+    # Only the refreshed entry's aliases were evicted from the LRU cache
+    assert normalize_title(entry["title"]) not in score_db._score_cache
+    assert normalize_title(other["api_title"]) in score_db._score_cache
+    assert score_db.get_score_from_db(entry["title"]) == entry["score"]
+    assert index.lookup(entry["title"])[1] == entry["score"]
+    assert index.lookup(other["api_title"])[1] == 2.0
@@ -0,0 +1,67 @@
+# test_score_snapshot.py - HOLSNAP round trip: write, map and binary-search lookups
+
+import os
+
+import pytest
+
+from handlers.score_snapshot import ScoreSnapshot, SnapshotError, write_snapshot
+
+ROWS = [
+    ("Cowboy Bebop", 8.75, "TV"),
+    ("Akira", 8.16, "Movie"),
+    ("Zoku Natsume Yuujinchou", 8.64, "TV"),
+    ("Mob Psycho 100", 8.48, None),
+    ("akira!", 1.0, "TV"), # Same key as "Akira"; the first row wins
+]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = str(tmp_path / "scores.snap")
+    assert write_snapshot(path, ROWS) == 4
+    snapshot = ScoreSnapshot(path)
+    yield snapshot
+    snapshot.close()
+
+
+def test_lookup_finds_first_and_last_key(snapshot):
+    keys = [key for key, _, _ in snapshot.rows()]
+    assert keys == sorted(keys)
+    assert keys[0] == "akira" and keys[-1] == "zoku natsume yuujinchou"
+
+    assert snapshot.lookup("AKIRA") == (8.16, "MOVIE")
+    assert snapshot.lookup("Zoku Natsume Yuujinchou") == (8.64, "TV")
+    assert snapshot.lookup("Cowboy Bebop!") == (8.75, "TV")
+    assert snapshot.lookup("Mob Psycho 100") == (8.48, None)
+
+
+def test_lookup_of_missing_keys(snapshot):
+    assert snapshot.lookup("Aaa") is None # Before the first key
+    assert snapshot.lookup("Cowboy") is None # Between keys
+    assert snapshot.lookup("Zzz") is None # After the last key
+    assert snapshot.lookup("!!!") is None
+
+
+def test_failed_write_keeps_old_file_and_leaves_no_temp_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "scores.snap")
+    write_snapshot(path, ROWS)
+
+    def fail_replace(source, target):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail_replace)
+    with pytest.raises(OSError):
+        write_snapshot(path, ROWS[:1])
+    monkeypatch.undo()
+
+    assert os.listdir(tmp_path) == ["scores.snap"]
+    snapshot = ScoreSnapshot(path)
+    assert len(snapshot) == 4
+    snapshot.close()
+
+
+def test_non_snapshot_is_rejected(tmp_path):
+    path = tmp_path / "scores.snap"
+    path.write_bytes(b"not a snapshot" * 10)
+    with pytest.raises(SnapshotError):
+        ScoreSnapshot(str(path))
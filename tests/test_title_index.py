@@ -0,0 +1,87 @@
+# test_title_index.py - Near-miss matching and lookup cost of the in-memory title index
+
+import random
+
+import pytest
+
+from handlers.matching import normalize_title
+from handlers.title_index import MAX_POSTING_LENGTH, RARE_NGRAMS, TitleIndex
+from title_pool import build_pool
+
+LARGE_INDEX_SIZE = 50_000
+
+
+def _with_typo(rng: random.Random, title: str) -> str:
+    position = rng.randrange(len(title))
+    return title[:position] + "x" + title[position + 1:]
+
+
+@pytest.fixture(scope="module")
+def large_index():
+    pool = build_pool(LARGE_INDEX_SIZE, seed=3)
+    index = TitleIndex()
+    index.add_many((entry["title"], entry["score"], entry["type"]) for entry in pool)
+    return index, pool
+
+
+def test_near_miss_resolves_to_cached_title():
+    index = TitleIndex()
+    index.add("Shingeki no Kyojin: The Final Season", 8.8, "TV")
+    index.add("Kimetsu no Yaiba", 8.5, "TV")
+
+    title, score, similarity = index.lookup("Shingeki no Kyojin The Final Season!", "TV")
+    assert (title, score) == ("Shingeki no Kyojin: The Final Season", 8.8)
+    assert similarity >= 90
+
+
+def test_different_season_number_is_not_a_match():
+    index = TitleIndex()
+    index.add("Kaguya-sama wa Kokurasetai Season 2", 8.6, "TV")
+
+    assert index.lookup("Kaguya-sama wa Kokurasetai Season 3", "TV") is None
+
+
+def test_shared_title_keeps_an_entry_per_anime():
+    index = TitleIndex()
+    index.add("Hunter x Hunter", 8.41, "TV", anime_id=1, canonical=True)
+    index.add("Hunter x Hunter (2011)", 9.04, "TV", anime_id=2, canonical=True)
+    index.add("Hunter x Hunter", 9.04, "TV", anime_id=2) # Synonym of the 2011 series
+
+    assert index.lookup("Hunter x Hunter", "TV")[1] == 8.41
+    assert index.lookup("Hunter x Hunter!", "TV")[1] == 8.41
+
+
+def test_set_scores_updates_every_title_of_an_anime():
+    index = TitleIndex()
+    index.add("Sousou no Frieren", 9.3, "TV", anime_id=5, canonical=True)
+    index.add("Frieren: Beyond Journey's End", 9.3, "TV", anime_id=5)
+
+    index.set_scores([(5, 9.1, "TV"), (99, 1.0, None)])
+
+    assert index.lookup("Sousou no Frieren")[1] == 9.1
+    assert index.lookup("Frieren: Beyond Journey's End")[1] == 9.1
+
+
+def test_lookup_cost_does_not_grow_with_index(large_index):
+    # Counted, not timed (timings live in bench/bench_title_index.py): however large the
+    # index, a lookup counts at most RARE_NGRAMS posting lists of MAX_POSTING_LENGTH ids
+    index, pool = large_index
+    assert max(len(p) for p in index._postings.values()) > MAX_POSTING_LENGTH # The cap is exercised
+    rng = random.Random(1)
+    for entry in rng.sample(pool, 200):
+        key = normalize_title(_with_typo(rng, entry["title"]))
+        postings = index._counted_postings(key)
+        assert len(postings) <= RARE_NGRAMS
+        assert all(len(p) <= MAX_POSTING_LENGTH for p in postings)
+        assert sum(map(len, postings)) <= RARE_NGRAMS * MAX_POSTING_LENGTH
+
+
+def test_near_misses_still_found_in_large_index(large_index):
+    index, pool = large_index
+    rng = random.Random(2)
+    entries = rng.sample(pool, 200)
+    found = sum(
+        1 for entry in entries
+        if (match := index.lookup(_with_typo(rng, entry["title"]))) and match[0] == entry["title"]
+    )
+    assert found >= 0.7 * len(entries)
@@ -0,0 +1,143 @@
+# test_title_pool_warmup.py - Title pool harvest from the stand-in game page and paced warm-up lookups
+
+import json
+import os
+import shutil
+import threading
+import time
+import urllib.request
+
+import pytest
+
+import main
+from handlers import browser_handler, score_resolver
+from handlers.score_resolver import ScoreResolver
+from handlers.title_index import TitleIndex
+from run_bench import BENCH_DIR, serve_directory
+from title_pool import write_pool_json
+
+UNCACHED = 4 # Titles of the pool left for the warm-up to look up
+
+
+@pytest.fixture
+def stand_in_page(tmp_path, catalog):
+    """Serves bench/game_page.html with the mock API's catalog as pool.json; yields (page URL, pool)."""
+    pool = catalog
+    shutil.copy(os.path.join(BENCH_DIR, "game_page.html"), tmp_path)
+    write_pool_json(str(tmp_path / "pool.json"), pool)
+    server = serve_directory(str(tmp_path))
+    yield f"http://127.0.0.1:{server.server_port}/game_page.html", pool
+    server.shutdown()
+    server.server_close()
+
+
+class RecordingDriver:
+    """Loads a page and its pool.json over HTTP and reports them like chromedriver's performance log."""
+
+    def __init__(self, page_url: str):
+        self._bodies = {}
+        self._log = []
+        base = page_url.rsplit("/", 1)[0]
+        for request_id, (url, mime_type) in enumerate(
+            [(page_url, "text/html"), (f"{base}/pool.json", "application/json")]
+        ):
+            with urllib.request.urlopen(url) as response:
+                self._bodies[str(request_id)] = response.read().decode()
+            message = {"message": {"method": "Network.responseReceived", "params": {
+                "requestId": str(request_id), "response": {"url": url, "mimeType": mime_type},
+            }}}
+            self._log.append({"message": json.dumps(message)})
+
+    def get_log(self, log_type: str) -> list[dict]:
+        log, self._log = self._log, []
+        return log
+
+    def execute_cdp_cmd(self, cmd: str, params: dict) -> dict:
+        return {"body": self._bodies[params["requestId"]], "base64Encoded": False}
+
+
+def expected_pool(pool: list[dict]) -> set[tuple[str, str]]:
+    return {(entry["title"], entry["type"].upper()) for entry in pool}
+
+
+def test_harvest_reads_the_pool_the_page_loads(stand_in_page):
+    page_url, pool = stand_in_page
+    driver = RecordingDriver(page_url)
+
+    assert set(browser_handler.harvest_title_pool(driver)) == expected_pool(pool)
+    assert browser_handler.harvest_title_pool(driver) == [] # The log was drained
+
+
+@pytest.mark.skipif(
+    not os.environ.get("HOL_TEST_BROWSER"), reason="set HOL_TEST_BROWSER to a Chromium-based browser"
+)
+def test_harvest_from_a_real_browser(stand_in_page, monkeypatch):
+    page_url, pool = stand_in_page
+    monkeypatch.setattr(browser_handler, "BRAVE_PATH", os.environ["HOL_TEST_BROWSER"])
+    driver = browser_handler.initialize_driver(
+        browser_handler.PERFORMANCE_PROFILE, capture_network=True, backend=browser_handler.CDP_BACKEND
+    )
+    assert driver is not None
+    try:
+        browser_handler.navigate_to_url(driver, page_url)
+        harvested = []
+        deadline = time.monotonic() + 10
+        while not harvested and time.monotonic() < deadline:
+            harvested = browser_handler.harvest_title_pool(driver)
+            time.sleep(0.2)
+        assert set(harvested) == expected_pool(pool)
+    finally:
+        browser_handler.close_driver(driver)
+
+
+def test_warm_up_queues_uncached_titles_and_paces_them(stand_in_page, mock_jikan, score_db, monkeypatch):
+    page_url, pool = stand_in_page
+    monkeypatch.setattr(main, "HARVEST_TITLE_POOL", True)
+    monkeypatch.setattr(main, "title_index", TitleIndex())
+    monkeypatch.setattr(score_resolver, "BACKGROUND_INTERVAL", 0.3)
+    cached = pool[:-UNCACHED]
+    score_db.save_scores_batch([(e["title"], e["score"], e["type"], e["mal_id"]) for e in cached])
+
+    started = []
+    def resolve(title, expected_type):
+        started.append(time.monotonic())
+        return main.get_or_fetch_score(title, expected_type)
+
+    resolver = ScoreResolver(resolve)
+    try:
+        main.warm_title_pool(RecordingDriver(page_url), resolver)
+        assert resolver.background_pending() == UNCACHED
+        deadline = time.monotonic() + 10
+        while resolver.background_pending() and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        resolver.shutdown()
+
+    assert len(started) == UNCACHED
+    assert all(later - earlier >= 0.3 for earlier, later in zip(started, started[1:]))
+    for entry in pool[-UNCACHED:]:
+        assert score_db.get_score_from_db(entry["title"]) == entry["score"]
+
+
+def test_round_lookup_does_not_wait_for_warm_up_pacing(monkeypatch):
+    monkeypatch.setattr(score_resolver, "BACKGROUND_INTERVAL", 5.0)
+    first_done = threading.Event()
+    calls = []
+    def resolve(title, expected_type):
+        calls.append(title)
+        first_done.set()
+        return 7.0
+
+    resolver = ScoreResolver(resolve)
+    try:
+        resolver.queue_background([("A", "TV"), ("B", "TV"), ("C", "TV")])
+        assert first_done.wait(2)
+        time.sleep(0.1) # "B" is now waiting out its pause, "C" is still queued
+
+        start = time.monotonic()
+        assert resolver.resolve("B", "TV") == 7.0
+        assert resolver.resolve("C", "TV") == 7.0
+        assert time.monotonic() - start < 1.0
+    finally:
+        resolver.shutdown()
+    assert sorted(calls) == ["A", "B", "C"] # Taken over, not looked up twice
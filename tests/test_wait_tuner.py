@@ -0,0 +1,51 @@
+# test_wait_tuner.py - Learned timeouts and the shared timings file of supervisor workers
+
+import os
+import threading
+
+from handlers.wait_tuner import MIN_SAMPLES, PHASE_NEXT_ROUND, PHASE_PLAY_BUTTON, WaitTuner
+
+
+def test_timeout_is_learned_from_samples(tmp_path):
+    tuner = WaitTuner(str(tmp_path / "timings.json"))
+    assert tuner.timeout(PHASE_NEXT_ROUND, 8.0) == 8.0 # Too few samples: the default
+
+    for _ in range(MIN_SAMPLES):
+        tuner.observe(PHASE_NEXT_ROUND, 1.0)
+    assert 1.0 < tuner.timeout(PHASE_NEXT_ROUND, 8.0) < 8.0
+
+
+def test_saves_of_several_workers_are_merged(tmp_path):
+    path = str(tmp_path / "timings.json")
+    workers = [WaitTuner(path) for _ in range(2)]
+    for tuner in workers:
+        tuner.load()
+    workers[0].observe(PHASE_NEXT_ROUND, 1.0)
+    workers[1].observe(PHASE_NEXT_ROUND, 2.0)
+    workers[1].observe(PHASE_PLAY_BUTTON, 0.5)
+    for tuner in workers:
+        tuner.save()
+    workers[0].save() # Nothing new: must not count its samples twice
+
+    restored = WaitTuner(path)
+    restored.load()
+    assert sorted(restored._samples[PHASE_NEXT_ROUND]) == [1.0, 2.0]
+    assert list(restored._samples[PHASE_PLAY_BUTTON]) == [0.5]
+    assert sorted(workers[0]._samples[PHASE_NEXT_ROUND]) == [1.0, 2.0] # Learned from the other worker
+
+
+def test_concurrent_saves_keep_every_sample(tmp_path):
+    path = str(tmp_path / "timings.json")
+    workers = [WaitTuner(path) for _ in range(8)]
+    for number, tuner in enumerate(workers):
+        tuner.observe(PHASE_NEXT_ROUND, float(number))
+    threads = [threading.Thread(target=tuner.save) for tuner in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    restored = WaitTuner(path)
+    restored.load()
+    assert sorted(restored._samples[PHASE_NEXT_ROUND]) == [float(n) for n in range(8)]
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]